@@ -1,22 +1,33 @@
 # auth/auth_controller.py (CÓDIGO CORRECTO - FINAL)
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import jwt
 import streamlit as st
-from database.supabase_client import supabase_client
+from auth.jwt_validation import verify_access_token
+from database.supabase_client import HTTP_TIMEOUT, create_supabase_client, get_session_client
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REFRESH_MARGIN = 300 # Segundos antes de la expiración en que se renueva el token en segundo plano
+CLAIMS_CACHE_MARGIN = 30 # Segundos antes de la expiración en que se vuelven a verificar los datos del usuario
 
 def login(email, password):
     """
     Intenta iniciar sesión con email y contraseña usando Supabase Auth.
-    Guarda la sesión en st.session_state si es exitoso.
+    Guarda la sesión en st.session_state si es exitoso, junto con un cliente Supabase
+    propio de esta sesión de navegador (nunca se inicia sesión sobre el cliente compartido).
     """
     try:
-        response = supabase_client.auth.sign_in_with_password({"email": email, "password": password})
-        print("DEBUG - Response Object:", response)
-        print("DEBUG - Response Dictionary:", response.__dict__)
+        client = create_supabase_client()
+        response = client.auth.sign_in_with_password({"email": email, "password": password})
 
         if hasattr(response, 'error') and response.error:
             st.error(f"Error de login: {response.error.message}")
             return False
         else:
             st.session_state.supabase_session = response.session  # *** ACCESO CORRECTO: response.session ***
+            st.session_state.supabase_session_client = client # Cliente ligado al JWT de este usuario
             return True
     except Exception as e:
         st.error(f"Error inesperado durante el login: {e}")
@@ -26,8 +37,13 @@ def logout():
     """
     Cierra la sesión del usuario y limpia st.session_state.
     """
-    supabase_client.auth.sign_out() # Cierra sesión en Supabase (opcional, pero buena práctica)
+    client = st.session_state.get("supabase_session_client")
+    if client is not None:
+        client.auth.sign_out() # Cierra sesión en Supabase (opcional, pero buena práctica)
     st.session_state.supabase_session = None
+    st.session_state.supabase_session_client = None
+    st.session_state.auth_user = None
+    st.session_state.token_refresh_future = None
     st.session_state.logged_in = False # Asegura que la variable de estado también se actualice
 
 def is_logged_in():
@@ -36,19 +52,96 @@ def is_logged_in():
     """
     return st.session_state.get("supabase_session") is not None
 
+@st.cache_resource # Un único pool de hilos por proceso para las renovaciones de token
+def get_refresh_executor():
+    """Ejecutor en segundo plano para renovar tokens antes de que expiren."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="token-refresh")
+
+def _apply_finished_refresh():
+    """Si terminó una renovación en segundo plano, guarda la nueva sesión en st.session_state."""
+    future = st.session_state.get("token_refresh_future")
+    if future is None or not future.done():
+        return
+    st.session_state.token_refresh_future = None
+    try:
+        st.session_state.supabase_session = future.result().session
+    except Exception as e:
+        logger.warning("Error al renovar el token en segundo plano: %s", e) # Se reintenta en el siguiente rerun
+
+def _schedule_refresh(session):
+    """Lanza la renovación del token en segundo plano, si no hay ya una en curso."""
+    if st.session_state.get("token_refresh_future") is None:
+        client = get_session_client()
+        st.session_state.token_refresh_future = get_refresh_executor().submit(client.auth.refresh_session, session.refresh_token)
+
+def _refresh_now(session):
+    """
+    Renueva el token de forma síncrona (solo si ya ha expirado) y retorna la nueva sesión.
+    El refresh token es de un solo uso: si hay una renovación en segundo plano en curso, se
+    espera a su resultado en lugar de lanzar otra con el mismo token.
+    """
+    future = st.session_state.get("token_refresh_future")
+    new_session = None
+    if future is not None:
+        try:
+            new_session = future.result(timeout=HTTP_TIMEOUT).session
+        except FutureTimeoutError:
+            raise # Sigue en curso: se conserva el future y se reintenta en el siguiente rerun
+        except Exception as e: # Falló sin renovar: se intenta ahora de forma síncrona
+            logger.warning("Error al renovar el token en segundo plano: %s", e)
+        st.session_state.token_refresh_future = None
+    if new_session is None:
+        new_session = get_session_client().auth.refresh_session(session.refresh_token).session
+    st.session_state.supabase_session = new_session
+    return new_session
+
 def get_current_user():
     """
-    Obtiene la información del usuario autenticado actual desde Supabase Auth.
+    Obtiene el usuario autenticado actual verificando localmente el JWT de la sesión.
+    Los datos del usuario se guardan en st.session_state hasta poco antes de que expire
+    el token, y el token se renueva en segundo plano antes de expirar, así que en el caso
+    normal un rerun no hace ninguna petición a Supabase Auth.
     Retorna None si no hay usuario autenticado o si hay un error.
     """
-    if is_logged_in():
+    if not is_logged_in():
+        return None
+    _apply_finished_refresh()
+    session = st.session_state.supabase_session
+    now = time.time()
+
+    cached = st.session_state.get("auth_user")
+    if cached is not None and cached[0] == session.access_token and now < cached[1].expires_at - CLAIMS_CACHE_MARGIN:
+        user = cached[1]
+    else:
         try:
-            user_response = supabase_client.auth.get_user()
-            if user_response.error:
-                st.error(f"Error al obtener información del usuario: {user_response.error.message}")
-                return None
-            return user_response.data.user # Aquí sí usamos .data porque get_user() parece tener una estructura diferente
+            try:
+                user = verify_access_token(session.access_token)
+            except jwt.ExpiredSignatureError:
+                session = _refresh_now(session) # La renovación en segundo plano no llegó a tiempo
+                user = verify_access_token(session.access_token)
         except Exception as e:
             st.error(f"Error al obtener información del usuario: {e}")
+            st.session_state.auth_user = None
             return None
-    return None
+        st.session_state.auth_user = (session.access_token, user)
+
+    if user.expires_at - now < TOKEN_REFRESH_MARGIN:
+        _schedule_refresh(session)
+    return user
+
+def require_login():
+    """
+    Guarda común de las páginas: detiene la página si no hay sesión y, si la hay, verifica el
+    token y lo renueva antes de que expire (get_current_user). En la estructura pages/ solo se
+    ejecuta el script de la página, así que cada página debe llamarla antes de cualquier
+    consulta; si no, al caducar el token (una hora) todas las peticiones fallan con 401.
+    Retorna el usuario autenticado.
+    """
+    if not is_logged_in():
+        st.error("Debes iniciar sesión para acceder a esta página.")
+        st.stop()
+    user = get_current_user()
+    if user is None: # get_current_user ya ha mostrado el error
+        st.warning("Vuelve a iniciar sesión desde la página principal.")
+        st.stop()
+    return user
@@ -0,0 +1,50 @@
+# auth/jwt_validation.py
+from dataclasses import dataclass
+import jwt
+import streamlit as st
+
+JWT_AUDIENCE = "authenticated" # Audiencia de los tokens de usuario de Supabase Auth
+JWT_LEEWAY = 10 # Segundos de tolerancia por desfase de reloj
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Datos del usuario extraídos de un JWT verificado localmente."""
+    id: str
+    email: str
+    role: str
+    expires_at: int # Marca de tiempo UNIX de expiración del token
+
+@st.cache_resource # Las claves públicas se descargan una vez por proceso
+def get_jwks_client() -> jwt.PyJWKClient:
+    """Cliente JWKS del proyecto Supabase, para tokens firmados con claves asimétricas."""
+    return jwt.PyJWKClient(f"{st.secrets['supabase_url']}/auth/v1/.well-known/jwks.json", cache_keys=True)
+
+def verify_access_token(access_token) -> AuthenticatedUser:
+    """
+    Verifica localmente la firma y la expiración de un access token de Supabase.
+    Requiere en secrets una de estas dos configuraciones, según cómo firme los tokens el proyecto:
+    - `supabase_jwt_secret` (Project Settings → API → JWT Secret) si usa el secreto compartido (HS256);
+    - nada más si usa claves asimétricas (ES256/RS256): se leen de su endpoint JWKS.
+    Lanza jwt.InvalidTokenError si el token no es válido.
+    """
+    jwt_secret = st.secrets.get("supabase_jwt_secret")
+    if jwt_secret:
+        key, algorithms = jwt_secret, ["HS256"]
+    elif jwt.get_unverified_header(access_token).get("alg") == "HS256": # El JWKS no publica el secreto compartido
+        raise jwt.InvalidTokenError("El proyecto firma los tokens con HS256: configura `supabase_jwt_secret` en secrets")
+    else:
+        key, algorithms = get_jwks_client().get_signing_key_from_jwt(access_token).key, ["ES256", "RS256"]
+    claims = jwt.decode(
+        access_token,
+        key,
+        algorithms=algorithms,
+        audience=JWT_AUDIENCE,
+        leeway=JWT_LEEWAY,
+        options={"require": ["exp", "sub"]},
+    )
+    return AuthenticatedUser(
+        id=claims["sub"],
+        email=claims.get("email"),
+        role=claims.get("role"),
+        expires_at=claims["exp"],
+    )
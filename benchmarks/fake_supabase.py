@@ -0,0 +1,654 @@
+# benchmarks/fake_supabase.py
+"""
+Backend Supabase falso en memoria, con la misma API de query builder que usa la app
+(table/select/eq/gte/or_/order/limit/insert/upsert/delete/execute y rpc).
+Sirve para medir el coste de las páginas sin red.
+"""
+import datetime
+import re
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from utils.constants import ARCHIVE_AFTER_MONTHS
+from utils.reservations_frame import archive_cutoff
+
+FAKE_JWT_SECRET = "benchmark-jwt-secret-not-for-production" # Firma los tokens de fake_session
+# Secrets con los que los benchmarks ejecutan las páginas (app.secrets de AppTest)
+FAKE_SECRETS = {
+    "supabase_url": "http://localhost:54321",
+    "supabase_anon_key": "fake-anon-key",
+    "supabase_jwt_secret": FAKE_JWT_SECRET,
+}
+
+# Relaciones entre tablas para resolver recursos embebidos: (tabla, embebida) -> (tipo, clave foránea)
+RELATIONS = {
+    ("gym_reservations", "activities"): ("many_to_one", "activity_id"),
+    ("gym_reservations", "agents"): ("many_to_one", "monitor_id"),
+    ("gym_reservations", "agent_activities"): ("one_to_many", "gym_reservation_id"),
+    ("agents", "agent_activities"): ("one_to_many", "agent_id"),
+    ("agent_activities", "agents"): ("many_to_one", "agent_id"),
+    ("agent_activities", "gym_reservations"): ("many_to_one", "gym_reservation_id"),
+}
+
+# Restricciones UNIQUE del esquema, comprobadas en insert/upsert
+UNIQUE_CONSTRAINTS = {
+    "agents": [("nip",), ("email",)],
+    "activities": [("name",)],
+    "gym_reservations": [("reservation_date", "time_slot", "monitor_id")],
+    "agent_activities": [("agent_id", "gym_reservation_id")],
+    "gym_reservations_archive": [("reservation_date", "time_slot", "monitor_id")],
+    "agent_activities_archive": [("agent_id", "gym_reservation_id")],
+}
+# Claves que además no pueden repetir una fila archivada (disparador reject_archived_duplicate de la migración 0008)
+ARCHIVED_UNIQUE = {"gym_reservations": "gym_reservations_archive"}
+
+
+class FakeResponse:
+    """Como postgrest.APIResponse: `data` y `count`. Los errores se lanzan al ejecutar (ver _api_error)."""
+
+    def __init__(self, data=None, count=None):
+        self.data = data
+        self.count = count
+
+
+def _api_error(message, code=None):
+    """El postgrest.APIError que lanzaría el SDK real para una respuesta de error del servidor."""
+    from postgrest import APIError # Importar aquí: como en la app, el SDK no se carga al importar el módulo
+    return APIError({"message": message, "code": code, "hint": None, "details": None})
+
+
+def _split_top_level(text, separator=","):
+    """Divide `text` por `separator` ignorando los separadores entre paréntesis o comillas."""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == separator and depth == 0 and not quoted:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _coerce(row_value, value):
+    """Adapta un valor de filtro (a menudo texto) al tipo del valor almacenado."""
+    if isinstance(value, str):
+        value = value.strip('"')
+        if isinstance(row_value, bool):
+            return value.lower() == "true"
+        if isinstance(row_value, int) and not isinstance(row_value, bool):
+            try:
+                return int(value)
+            except ValueError:
+                return value
+        if value == "null":
+            return None
+    return value
+
+
+def _compare(op, row_value, value):
+    if op == "is":
+        return row_value is None if value in (None, "null") else row_value == _coerce(row_value, value)
+    if op == "in":
+        return row_value in [_coerce(row_value, v) for v in value]
+    value = _coerce(row_value, value)
+    if op == "eq":
+        return row_value == value
+    if op == "neq":
+        return row_value != value
+    if row_value is None or value is None:
+        return False
+    if op == "gt":
+        return row_value > value
+    if op == "gte":
+        return row_value >= value
+    if op == "lt":
+        return row_value < value
+    if op == "lte":
+        return row_value <= value
+    if op in ("like", "ilike"):
+        pattern = "^" + re.escape(str(value)).replace("%", ".*").replace(r"\*", ".*") + "$"
+        return re.match(pattern, str(row_value), re.IGNORECASE if op == "ilike" else 0) is not None
+    raise ValueError(f"Operador no soportado: {op}")
+
+
+def _parse_logic(expression):
+    """Convierte un filtro lógico de PostgREST ("a.eq.1,and(b.gt.2,c.lt.3)") en un predicado."""
+    predicates = []
+    for item in _split_top_level(expression):
+        match = re.match(r"^(and|or)\((.*)\)$", item)
+        if match:
+            inner = _parse_logic(match.group(2))
+            predicates.append(inner if match.group(1) == "or" else _all_of(inner.parts))
+            continue
+        column, op, value = item.split(".", 2)
+        if op == "in":
+            value = [v.strip('"') for v in _split_top_level(value.strip("()"))]
+        predicates.append(lambda row, c=column, o=op, v=value: _compare(o, row.get(c), v))
+    return _any_of(predicates)
+
+
+def _any_of(predicates):
+    predicate = lambda row: any(p(row) for p in predicates)
+    predicate.parts = predicates
+    return predicate
+
+
+def _all_of(predicates):
+    return lambda row: all(p(row) for p in predicates)
+
+
+def _parse_select(columns):
+    """Retorna (columnas_propias, {nombre_embebido: columnas_embebidas})."""
+    own, embedded = [], {}
+    for item in _split_top_level(columns):
+        match = re.match(r"^(?:(\w+):)?(\w+)(?:!\w+)?\((.*)\)$", item)
+        if match:
+            embedded[match.group(2)] = match.group(3)
+        else:
+            own.append(item)
+    return own, embedded
+
+
+class FakeQuery:
+    """Query builder encadenable sobre una tabla de FakeSupabase."""
+
+    def __init__(self, backend, table):
+        self._backend = backend
+        self._table = table
+        self._operation = "select"
+        self._columns = "*"
+        self._count = None
+        self._filters = [] # (tabla_embebida o None, predicado)
+        self._order = []
+        self._limit = None
+        self._offset = 0
+        self._payload = None
+        self._on_conflict = None
+
+    # --- Operaciones ---
+    def select(self, columns="*", count=None, **kwargs):
+        self._operation, self._columns, self._count = "select", columns, count
+        return self
+
+    def insert(self, payload, **kwargs):
+        self._operation, self._payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, **kwargs):
+        self._operation, self._payload, self._on_conflict = "upsert", payload, on_conflict
+        return self
+
+    def update(self, payload, **kwargs):
+        self._operation, self._payload = "update", payload
+        return self
+
+    def delete(self, **kwargs):
+        self._operation = "delete"
+        return self
+
+    # --- Filtros ---
+    def _add_filter(self, op, column, value):
+        embedded, _, column = column.rpartition(".")
+        self._filters.append((embedded or None, lambda row: _compare(op, row.get(column), value)))
+        return self
+
+    def eq(self, column, value):
+        return self._add_filter("eq", column, value)
+
+    def neq(self, column, value):
+        return self._add_filter("neq", column, value)
+
+    def gt(self, column, value):
+        return self._add_filter("gt", column, value)
+
+    def gte(self, column, value):
+        return self._add_filter("gte", column, value)
+
+    def lt(self, column, value):
+        return self._add_filter("lt", column, value)
+
+    def lte(self, column, value):
+        return self._add_filter("lte", column, value)
+
+    def like(self, column, value):
+        return self._add_filter("like", column, value)
+
+    def ilike(self, column, value):
+        return self._add_filter("ilike", column, value)
+
+    def is_(self, column, value):
+        return self._add_filter("is", column, value)
+
+    def in_(self, column, values):
+        return self._add_filter("in", column, list(values))
+
+    def or_(self, filters, reference_table=None, **kwargs):
+        self._filters.append((reference_table, _parse_logic(filters)))
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size, **kwargs):
+        self._limit = size
+        return self
+
+    def range(self, start, end, **kwargs):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    # --- Ejecución ---
+    def _matches(self, row):
+        return all(predicate(row) for embedded, predicate in self._filters if embedded is None)
+
+    def execute(self):
+        self._backend.simulate_round_trip()
+        with self._backend.lock:
+            self._backend.request_count += 1
+            try:
+                return getattr(self, f"_execute_{self._operation}")()
+            except _ConstraintViolation as e:
+                raise _api_error(str(e), code="23505") from None
+
+    def _execute_select(self):
+        rows = [row for row in self._backend.rows_for(self._table) if self._matches(row)]
+        for column, desc in reversed(self._order):
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        count = len(rows) if self._count else None
+        end = self._offset + self._limit if self._limit is not None else None
+        rows = rows[self._offset:end]
+        return FakeResponse(data=self._backend.project(self._table, rows, self._columns, self._filters), count=count)
+
+    def _execute_insert(self):
+        payload = self._payload if isinstance(self._payload, list) else [self._payload]
+        return FakeResponse(data=self._backend.insert(self._table, payload))
+
+    def _execute_upsert(self):
+        payload = self._payload if isinstance(self._payload, list) else [self._payload]
+        key = tuple(c.strip() for c in self._on_conflict.split(",")) if self._on_conflict else ("id",)
+        return FakeResponse(data=self._backend.upsert(self._table, payload, key))
+
+    def _execute_update(self):
+        updated = []
+        for row in self._backend.tables[self._table]:
+            if self._matches(row):
+                row.update(self._payload)
+                updated.append(dict(row))
+                self._backend.emit(self._table, "UPDATE", new=dict(row), old={"id": row["id"]})
+        return FakeResponse(data=updated)
+
+    def _execute_delete(self):
+        kept, deleted = [], []
+        for row in self._backend.tables[self._table]:
+            (deleted if self._matches(row) else kept).append(row)
+        self._backend.tables[self._table] = kept
+        self._backend.rebuild_indexes(self._table)
+        for row in deleted:
+            self._backend.emit(self._table, "DELETE", old={"id": row["id"]})
+        return FakeResponse(data=deleted)
+
+
+class _ConstraintViolation(Exception):
+    pass
+
+
+class FakeRpc:
+    def __init__(self, backend, fn, params):
+        self._backend, self._fn, self._params = backend, fn, params or {}
+
+    def execute(self):
+        self._backend.simulate_round_trip()
+        with self._backend.lock:
+            self._backend.request_count += 1
+            handler = self._backend.rpc_handlers.get(self._fn)
+            if handler is None:
+                raise _api_error(f"Función desconocida: {self._fn}", code="PGRST202")
+            return FakeResponse(data=handler(self._backend, **self._params))
+
+
+class FakeAuth:
+    """Stub de Supabase Auth: los benchmarks inyectan la sesión directamente en st.session_state."""
+
+    def sign_out(self):
+        pass
+
+
+class FakeSupabase:
+    """Cliente Supabase falso con las tablas del esquema en listas de diccionarios."""
+
+    def __init__(self, latency_ms=0):
+        self.latency_ms = latency_ms # Latencia de red simulada por petición (fuera del lock: las peticiones concurrentes se solapan)
+        self.tables = {name: [] for name in (
+            "agents", "activities", "gym_reservations", "agent_activities", "sections", "groups",
+            "gym_reservations_archive", "agent_activities_archive",
+        )}
+        self.lock = threading.RLock()
+        self.request_count = 0
+        self.rpc_handlers = dict(RPC_HANDLERS)
+        self.auth = FakeAuth()
+        self.listeners = [] # Callbacks (tabla, tipo, nuevo, anterior) para simular Realtime
+        self._by_id = {}
+        self._unique = {}
+
+    def simulate_round_trip(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    # --- API del cliente ---
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, fn, params=None, **kwargs):
+        return FakeRpc(self, fn, params)
+
+    def rows_for(self, name):
+        """Filas de una tabla o de una vista (las vistas se calculan al consultarlas)."""
+        view = VIEWS.get(name)
+        return view(self) if view else self.tables[name]
+
+    # --- Índices ---
+    def rebuild_indexes(self, table):
+        rows = self.tables[table]
+        self._by_id[table] = {row["id"]: row for row in rows if "id" in row} # sections y groups usan el nombre como clave
+        for constraint in UNIQUE_CONSTRAINTS.get(table, []):
+            self._unique[(table, constraint)] = {
+                tuple(row.get(c) for c in constraint): row for row in rows if all(row.get(c) is not None for c in constraint)
+            }
+
+    def load(self, table, rows):
+        """Carga filas ya completas (con id y created_at) sin comprobar restricciones."""
+        self.tables[table].extend(rows)
+        self.rebuild_indexes(table)
+
+    # --- Escrituras ---
+    def emit(self, table, event_type, new=None, old=None):
+        """Notifica un cambio a los listeners, como haría Supabase Realtime."""
+        for listener in self.listeners:
+            listener(table, event_type, new, old)
+
+    def _complete(self, row):
+        row = dict(row)
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", datetime.datetime.now(datetime.timezone.utc).isoformat())
+        return row
+
+    def _check_unique(self, table, row, ignore=None):
+        for constraint in UNIQUE_CONSTRAINTS.get(table, []):
+            key = tuple(row.get(c) for c in constraint)
+            for checked_table in (table, ARCHIVED_UNIQUE.get(table)):
+                existing = self._unique.get((checked_table, constraint), {}).get(key)
+                if existing is not None and existing is not ignore and None not in key:
+                    raise _ConstraintViolation(f'duplicate key value violates unique constraint on {checked_table} {constraint}')
+
+    def _index_row(self, table, row):
+        self._by_id.setdefault(table, {})[row["id"]] = row
+        for constraint in UNIQUE_CONSTRAINTS.get(table, []):
+            key = tuple(row.get(c) for c in constraint)
+            if None not in key:
+                self._unique.setdefault((table, constraint), {})[key] = row
+
+    def insert(self, table, payload):
+        rows = [self._complete(row) for row in payload]
+        for row in rows:
+            self._check_unique(table, row)
+        for row in rows:
+            self.tables[table].append(row)
+            self._index_row(table, row)
+            self.emit(table, "INSERT", new=dict(row))
+        return [dict(row) for row in rows]
+
+    def upsert(self, table, payload, key):
+        index = self._unique.get((table, key)) if key != ("id",) else {(k,): v for k, v in self._by_id.get(table, {}).items()}
+        result, updated = [], False
+        for row in payload:
+            existing = (index or {}).get(tuple(row.get(c) for c in key))
+            if existing is not None:
+                self._check_unique(table, {**existing, **row}, ignore=existing)
+                existing.update(row)
+                updated = True
+                self.emit(table, "UPDATE", new=dict(existing), old={"id": existing["id"]})
+                result.append(dict(existing))
+            else:
+                inserted = self.insert(table, [row])
+                result.extend(inserted)
+                if index is not None:
+                    index[tuple(inserted[0].get(c) for c in key)] = self._by_id[table][inserted[0]["id"]]
+        if updated:
+            self.rebuild_indexes(table)
+        return result
+
+    # --- Proyección y recursos embebidos ---
+    def project(self, table, rows, columns, filters):
+        own, embedded = _parse_select(columns)
+        children = {}
+        for name, sub_columns in embedded.items():
+            kind, foreign_key = RELATIONS[(table, name)]
+            if kind == "one_to_many":
+                embedded_filters = [p for t, p in filters if t == name]
+                groups = {}
+                for child in self.tables[name]:
+                    if all(p(child) for p in embedded_filters):
+                        groups.setdefault(child[foreign_key], []).append(child)
+                children[name] = (kind, foreign_key, sub_columns, groups)
+            else:
+                children[name] = (kind, foreign_key, sub_columns, self._by_id.get(name, {}))
+
+        result = []
+        for row in rows:
+            item = dict(row) if "*" in own else {c: row.get(c) for c in own}
+            for name, (kind, foreign_key, sub_columns, lookup) in children.items():
+                if kind == "one_to_many":
+                    related = lookup.get(row["id"], [])
+                    if sub_columns.strip() == "count":
+                        item[name] = [{"count": len(related)}]
+                    else:
+                        item[name] = self.project(name, related, sub_columns, [])
+                else:
+                    parent = lookup.get(row.get(foreign_key))
+                    item[name] = self.project(name, [parent], sub_columns, [])[0] if parent else None
+            result.append(item)
+        return result
+
+
+# --- Funciones RPC equivalentes a las de la base de datos ---
+def _rpc_get_dashboard_stats(backend, latest_limit=5):
+    today = datetime.date.today()
+    week_start = today - datetime.timedelta(days=today.weekday())
+    week_end = week_start + datetime.timedelta(days=7)
+    occupancy = {}
+    for r in backend.tables["gym_reservations"]:
+        if week_start.isoformat() <= r["reservation_date"] < week_end.isoformat():
+            slot = occupancy.setdefault(r["time_slot"], {"time_slot": r["time_slot"], "reservations": 0, "days": set()})
+            slot["reservations"] += 1
+            slot["days"].add(r["reservation_date"])
+    activities = backend._by_id.get("activities", {})
+    agents = backend._by_id.get("agents", {})
+    latest = sorted(backend.tables["gym_reservations"], key=lambda r: r["created_at"], reverse=True)[:latest_limit]
+    return {
+        "activities_count": len(backend.tables["activities"]),
+        "agents_count": len(backend.tables["agents"]),
+        "week_start": week_start.isoformat(),
+        "week_occupancy": [
+            {"time_slot": s["time_slot"], "reservations": s["reservations"], "days_booked": len(s["days"])}
+            for s in occupancy.values()
+        ],
+        "latest_reservations": [
+            {
+                "reservation_date": r["reservation_date"],
+                "time_slot": r["time_slot"],
+                "activity": activities[r["activity_id"]]["name"],
+                "monitor": f"{agents[r['monitor_id']]['name']} {agents[r['monitor_id']]['surname']}",
+            }
+            for r in latest
+        ],
+    }
+
+
+def _rpc_search_agents(backend, search_query=None, agent_section=None, agent_grupo=None, only_monitors=False, page_size=25, page_offset=0):
+    needle = (search_query or "").lower()
+    found = [
+        a for a in backend.tables["agents"]
+        if (not needle or a["nip"].startswith(needle) or (len(needle) >= 3 and needle in f"{a['name']} {a['surname']}".lower()))
+        and (agent_section is None or a["section"] == agent_section)
+        and (agent_grupo is None or a["grupo"] == agent_grupo)
+        and (not only_monitors or a["is_monitor"])
+    ]
+    found.sort(key=lambda a: (a["surname"], a["name"], a["id"]))
+    columns = ("id", "nip", "name", "surname", "section", "grupo", "email", "is_monitor")
+    return [{**{c: a[c] for c in columns}, "total_count": len(found)} for a in found[page_offset:page_offset + page_size]]
+
+
+def _reservations(backend, include_history):
+    """Reservas de las tablas calientes y, si `include_history`, también del archivo."""
+    if include_history:
+        return backend.tables["gym_reservations"] + backend.tables["gym_reservations_archive"]
+    return backend.tables["gym_reservations"]
+
+
+def _attendance(backend, include_history):
+    """Asistencia de las tablas calientes y, si `include_history`, también del archivo."""
+    if include_history:
+        return backend.tables["agent_activities"] + backend.tables["agent_activities_archive"]
+    return backend.tables["agent_activities"]
+
+
+def _attendance_joined(backend, start_date, end_date, include_history=False):
+    reservations = {r["id"]: r for r in _reservations(backend, include_history) if start_date <= r["reservation_date"] <= end_date}
+    agents = backend._by_id.get("agents", {})
+    for aa in _attendance(backend, include_history):
+        reservation = reservations.get(aa["gym_reservation_id"])
+        if reservation is not None:
+            yield aa, reservation, agents[aa["agent_id"]]
+
+
+def _rpc_get_usage_by_month(backend, start_date, end_date, include_history=False):
+    activities = backend._by_id.get("activities", {})
+    groups = {}
+    for aa, reservation, agent in _attendance_joined(backend, start_date, end_date, include_history):
+        key = (reservation["reservation_date"][:7] + "-01", agent["section"], agent["grupo"], activities[reservation["activity_id"]]["name"])
+        group = groups.setdefault(key, {"sessions": set(), "enrolled": 0, "attended": 0})
+        group["sessions"].add(reservation["id"])
+        group["enrolled"] += 1
+        group["attended"] += aa["attended"]
+    return [
+        {"month": k[0], "section": k[1], "grupo": k[2], "activity": k[3], "sessions": len(g["sessions"]), "enrolled": g["enrolled"],
+         "attended": g["attended"], "attendance_rate": round(100 * g["attended"] / g["enrolled"], 1)}
+        for k, g in sorted(groups.items(), key=lambda item: tuple(str(v) for v in item[0]))
+    ]
+
+
+def _rpc_get_monitor_load(backend, start_date, end_date, include_history=False):
+    agents = backend._by_id.get("agents", {})
+    load = {}
+    for r in _reservations(backend, include_history):
+        if start_date <= r["reservation_date"] <= end_date:
+            monitor = agents[r["monitor_id"]]
+            load.setdefault(r["monitor_id"], {"monitor_id": r["monitor_id"], "monitor": f"{monitor['name']} {monitor['surname']}", "sessions": 0, "enrolled": 0, "attended": 0})["sessions"] += 1
+    for aa, reservation, _ in _attendance_joined(backend, start_date, end_date, include_history):
+        load[reservation["monitor_id"]]["enrolled"] += 1
+        load[reservation["monitor_id"]]["attended"] += aa["attended"]
+    return sorted(load.values(), key=lambda m: (-m["sessions"], m["monitor"]))
+
+
+def _rpc_get_slot_utilisation(backend, start_date, end_date, include_history=False):
+    slots = {}
+    for r in _reservations(backend, include_history):
+        if start_date <= r["reservation_date"] <= end_date:
+            weekday = datetime.date.fromisoformat(r["reservation_date"]).isoweekday()
+            slots.setdefault((weekday, r["time_slot"]), {"weekday": weekday, "time_slot": r["time_slot"], "sessions": 0, "attended": 0})["sessions"] += 1
+    for aa, reservation, _ in _attendance_joined(backend, start_date, end_date, include_history):
+        weekday = datetime.date.fromisoformat(reservation["reservation_date"]).isoweekday()
+        slots[(weekday, reservation["time_slot"])]["attended"] += aa["attended"]
+    return [{**s, "avg_attended": round(s["attended"] / s["sessions"], 1)} for _, s in sorted(slots.items())]
+
+
+def _rpc_get_reference_data(backend):
+    by_position = lambda rows: [r["name"] for r in sorted(rows, key=lambda r: (r["position"], r["name"]))]
+    return {
+        "activities": sorted(({"id": a["id"], "name": a["name"]} for a in backend.tables["activities"]), key=lambda a: a["name"]),
+        "monitors": sorted(
+            ({"id": a["id"], "nip": a["nip"], "name": a["name"], "surname": a["surname"]} for a in backend.tables["agents"] if a["is_monitor"]),
+            key=lambda a: (a["surname"], a["name"], a["id"]),
+        ),
+        "sections": by_position(backend.tables["sections"]),
+        "groups": by_position(backend.tables["groups"]),
+    }
+
+
+def _rpc_archive_old_reservations(backend, older_than_months=ARCHIVE_AFTER_MONTHS):
+    """Equivalente de archive_old_reservations(): mueve al archivo las reservas antiguas y su asistencia."""
+    cutoff = archive_cutoff(datetime.date.today(), older_than_months).isoformat()
+    old_ids = {r["id"] for r in backend.tables["gym_reservations"] if r["reservation_date"] < cutoff}
+    for table, archive, is_old in (
+        ("gym_reservations", "gym_reservations_archive", lambda row: row["id"] in old_ids),
+        ("agent_activities", "agent_activities_archive", lambda row: row["gym_reservation_id"] in old_ids),
+    ):
+        kept, moved = [], []
+        for row in backend.tables[table]:
+            (moved if is_old(row) else kept).append(row)
+        backend.tables[table] = kept
+        backend.rebuild_indexes(table)
+        backend.load(archive, moved)
+    return len(old_ids)
+
+
+def _view_attendance_export(backend, include_history=False):
+    activities = backend._by_id.get("activities", {})
+    agents = backend._by_id.get("agents", {})
+    reservations = backend._by_id.get("gym_reservations", {})
+    if include_history:
+        reservations = {**reservations, **backend._by_id.get("gym_reservations_archive", {})}
+    for aa in _attendance(backend, include_history):
+        r = reservations[aa["gym_reservation_id"]]
+        monitor, agent = agents[r["monitor_id"]], agents[aa["agent_id"]]
+        yield {
+            "attendance_id": aa["id"], "reservation_date": r["reservation_date"], "time_slot": r["time_slot"],
+            "activity": activities[r["activity_id"]]["name"], "monitor": f"{monitor['name']} {monitor['surname']}",
+            "nip": agent["nip"], "name": agent["name"], "surname": agent["surname"], "section": agent["section"],
+            "grupo": agent["grupo"], "attended": aa["attended"],
+        }
+
+
+VIEWS = {
+    "attendance_export": _view_attendance_export,
+    "attendance_export_all": lambda backend: _view_attendance_export(backend, include_history=True),
+}
+
+
+RPC_HANDLERS = {
+    "get_usage_by_month": _rpc_get_usage_by_month,
+    "get_monitor_load": _rpc_get_monitor_load,
+    "get_slot_utilisation": _rpc_get_slot_utilisation,
+    "get_dashboard_stats": _rpc_get_dashboard_stats,
+    "search_agents": _rpc_search_agents,
+    "get_reference_data": _rpc_get_reference_data,
+    "archive_old_reservations": _rpc_archive_old_reservations,
+}
+
+
+def fake_session(email="monitor@example.com"):
+    """
+    Sesión mínima con la forma de la de Supabase Auth, para st.session_state.supabase_session.
+    El access token está firmado con FAKE_JWT_SECRET, así que la guarda de login de las páginas lo verifica.
+    """
+    import jwt # Importar aquí: solo lo usan los benchmarks que ejecutan páginas
+    expires_at = int((datetime.datetime.now() + datetime.timedelta(hours=1)).timestamp())
+    user = SimpleNamespace(id=str(uuid.uuid4()), email=email)
+    access_token = jwt.encode(
+        {"sub": user.id, "email": email, "role": "authenticated", "aud": "authenticated", "exp": expires_at},
+        FAKE_JWT_SECRET,
+        algorithm="HS256",
+    )
+    return SimpleNamespace(user=user, access_token=access_token, refresh_token="fake-refresh", expires_at=expires_at)
@@ -0,0 +1,121 @@
+# benchmarks/live_store_check.py
+"""
+Comprobación del almacén en tiempo real (database/realtime.py) con QueueEventSource en lugar
+de Supabase Realtime y el backend falso:
+- si falla la instantánea inicial, la suscripción se detiene y el error llega al llamador;
+- los cambios recibidos se aplican en memoria e invalidan las consultas cacheadas;
+- mientras la fuente está viva se ignora el TTL de las consultas que solo leen LIVE_TABLES
+  (las que leen otras tablas siguen caducando), y al terminar su hilo vuelve a aplicarse;
+- un canal de Realtime que ya no está suscrito no cuenta como fuente viva aunque su hilo siga.
+Falla (código de salida 1) si alguna comprobación no se cumple.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.live_store_check
+"""
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from benchmarks.fake_supabase import FakeSupabase
+from benchmarks.seed import SCALES, seed
+from database.query_cache import query_cache
+from database.realtime import LiveStore, QueueEventSource, SupabaseRealtimeSource, start_live_store
+
+HOT_SINCE = "2000-01-01" # Toda la instantánea en memoria
+STOP_TIMEOUT = 5 # Segundos de espera a que termine el hilo de la fuente
+
+
+class FailingClient:
+    """Cliente cuyo acceso a tablas falla, como un Supabase inaccesible."""
+
+    def table(self, name):
+        raise RuntimeError("Supabase no responde")
+
+
+def wait_until_stopped(source):
+    deadline = time.monotonic() + STOP_TIMEOUT
+    while source.is_alive() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return not source.is_alive()
+
+
+def check_snapshot_failure():
+    source = QueueEventSource()
+    try:
+        start_live_store(LiveStore(HOT_SINCE), source, FailingClient())
+    except RuntimeError:
+        pass
+    else:
+        return "start_live_store no relanzó el error de la instantánea"
+    if not wait_until_stopped(source):
+        return "la fuente sigue viva tras fallar la instantánea"
+    return None
+
+
+def check_events_and_ttl(backend):
+    source = QueueEventSource()
+    store = start_live_store(LiveStore(HOT_SINCE), source, backend)
+    if not store.is_ready():
+        return "el almacén no está listo tras cargar la instantánea"
+
+    reservation = dict(backend.tables["gym_reservations"][0], id="00000000-0000-0000-0000-000000000001", notes="live-check")
+    source.push("gym_reservations", "INSERT", new=reservation)
+    source.join()
+    if not store.rows("gym_reservations", lambda r: r["id"] == reservation["id"]):
+        return "el INSERT recibido no se aplicó en memoria"
+
+    key, tables = ("live_store_check", None, (), ()), ("gym_reservations",)
+    query_cache.set(key, tables, "valor", ttl=0.01)
+    time.sleep(0.02)
+    if not query_cache.get(key, tables)[0]:
+        return "con la fuente viva, la entrada caducó por TTL"
+    other_key, other_tables = ("live_store_check", None, ("secciones",), ()), ("gym_reservations", "sections")
+    query_cache.set(other_key, other_tables, "valor", ttl=0.01)
+    time.sleep(0.02)
+    if query_cache.get(other_key, other_tables)[0]:
+        return "con la fuente viva, una entrada que lee una tabla sin eventos no caducó por TTL"
+
+    source.stop()
+    if not wait_until_stopped(source):
+        return "la fuente no terminó tras stop()"
+    if store.is_ready():
+        return "el almacén sigue listo con la fuente terminada"
+    query_cache.set(key, tables, "valor", ttl=0.01)
+    time.sleep(0.02)
+    if query_cache.get(key, tables)[0]:
+        return "con la fuente terminada, el TTL no se aplica"
+    return None
+
+
+def check_dropped_channel():
+    source = SupabaseRealtimeSource("http://localhost:54321", "fake-key")
+    source._thread = threading.current_thread() # Hilo vivo
+    source._channel = SimpleNamespace(is_joined=True, socket=SimpleNamespace(is_connected=True))
+    if not source.is_alive():
+        return "un canal suscrito no cuenta como fuente viva"
+    source._channel = SimpleNamespace(is_joined=True, socket=SimpleNamespace(is_connected=False))
+    if source.is_alive():
+        return "con el websocket caído, la fuente sigue contando como viva"
+    return None
+
+
+def main():
+    backend = seed(FakeSupabase(), **SCALES["small"])
+    failures = []
+    checks = (
+        ("snapshot_failure", check_snapshot_failure),
+        ("events_and_ttl", lambda: check_events_and_ttl(backend)),
+        ("dropped_channel", check_dropped_channel),
+    )
+    for name, check in checks:
+        error = check()
+        print(f"{name}: {'OK' if error is None else 'FALLO - ' + error}")
+        if error is not None:
+            failures.append(name)
+    query_cache.set_event_driven(None)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
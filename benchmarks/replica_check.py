@@ -0,0 +1,205 @@
+# benchmarks/replica_check.py
+"""
+Comprobación del reenvío de la cola de la réplica local (database/replica.py) con clientes que
+se comportan como postgrest: los errores del servidor se lanzan como postgrest.APIError al
+ejecutar, no se devuelven en la respuesta.
+- una inserción rechazada por UNIQUE sale de la cola como conflicto, sin relanzar el error;
+- si las filas ya estaban en el servidor (se perdió la respuesta), la escritura se da por aplicada;
+- cualquier otro rechazo sale de la cola como error y las siguientes escrituras se reenvían;
+- un fallo de conexión detiene el reenvío y deja la cola intacta;
+- cada usuario solo reenvía su cola, y la de otro no retiene sus escrituras directas;
+- un error del servidor al sincronizar se lanza como RuntimeError.
+Falla (código de salida 1) si alguna comprobación no se cumple.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.replica_check
+"""
+import sys
+import httpx
+from postgrest import APIError
+from database.replica import LocalReplica, WriteRejected, replay_pending_writes, write_or_queue
+from database import replica as replica_module
+
+USER, OTHER_USER = "monitor@example.com", "otro@example.com"
+
+
+class RaisingClient:
+    """
+    Cliente con la interfaz de postgrest que lanza APIError para las tablas de `rejected`
+    ({tabla: código}) y acepta el resto. `existing` son los ids que ya están en el servidor.
+    """
+
+    def __init__(self, rejected=None, existing=(), offline=False):
+        self.rejected = rejected or {}
+        self.existing = set(existing)
+        self.offline = offline
+        self.inserted = []
+
+    def table(self, name):
+        if self.offline:
+            raise httpx.ConnectError("Sin conexión")
+        return RaisingQuery(self, name)
+
+
+class RaisingQuery:
+    def __init__(self, client, table):
+        self._client, self._table = client, table
+        self._rows, self._ids = None, None
+
+    def insert(self, rows):
+        self._rows = rows
+        return self
+
+    def select(self, columns):
+        return self
+
+    def in_(self, column, values):
+        self._ids = values
+        return self
+
+    def execute(self):
+        if self._rows is None: # Comprobación de filas ya aplicadas
+            return _Response([{"id": i} for i in self._ids if i in self._client.existing])
+        code = self._client.rejected.get(self._table)
+        if code is not None:
+            raise APIError({"message": f"Rechazada ({code})", "code": code, "hint": None, "details": None})
+        self._client.inserted.extend(self._rows)
+        return _Response(self._rows)
+
+
+class _Response:
+    """Como postgrest.APIResponse: solo `data` (sin atributo `error`)."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class FailingReadClient:
+    """Cliente con la interfaz de postgrest cuyas lecturas fallan con APIError (p. ej. RLS)."""
+
+    def table(self, name):
+        return self
+
+    def __getattr__(self, name): # select, gte, in_, order, limit...
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        raise APIError({"message": "permission denied", "code": "42501", "hint": None, "details": None})
+
+
+def queued_replica(*tables, queued_by=USER):
+    replica = LocalReplica(":memory:")
+    for index, table in enumerate(tables):
+        replica.enqueue(table, [{"id": f"{table}-{index}", "name": f"Fila {index}"}], queued_by=queued_by)
+    return replica
+
+
+def statuses(replica):
+    return [(w["table_name"], w["status"]) for w in replica.pending_writes(("pending", "conflict", "error"))]
+
+
+def check_conflict_is_dropped():
+    replica = queued_replica("activities", "agents")
+    client = RaisingClient(rejected={"activities": "23505"})
+    applied = replay_pending_writes(replica, client)
+    if applied != 1 or statuses(replica) != [("activities", "conflict")]:
+        return f"se esperaba 1 aplicada y el conflicto fuera de la cola, hay {applied} y {statuses(replica)}"
+    return None
+
+
+def check_already_applied():
+    replica = queued_replica("activities")
+    client = RaisingClient(rejected={"activities": "23505"}, existing={"activities-0"})
+    if replay_pending_writes(replica, client) != 1 or statuses(replica):
+        return f"la escritura ya aplicada sigue en la cola: {statuses(replica)}"
+    return None
+
+
+def check_other_error_is_dropped():
+    replica = queued_replica("agents", "activities")
+    client = RaisingClient(rejected={"agents": "42501"}) # RLS
+    applied = replay_pending_writes(replica, client)
+    if applied != 1 or statuses(replica) != [("agents", "error")] or len(client.inserted) != 1:
+        return f"se esperaba el error fuera de la cola y la actividad enviada, hay {statuses(replica)}"
+    return None
+
+
+def check_offline_keeps_queue():
+    replica = queued_replica("activities", "agents")
+    if replay_pending_writes(replica, RaisingClient(offline=True)) != 0 or replica.online:
+        return "sin conexión se aplicó algo o la réplica sigue en línea"
+    if statuses(replica) != [("activities", "pending"), ("agents", "pending")]:
+        return f"sin conexión la cola cambió: {statuses(replica)}"
+    return None
+
+
+def check_direct_write_raises():
+    original_client, original_get_replica = replica_module.supabase_client, replica_module.get_replica
+    replica_module.supabase_client = RaisingClient(rejected={"activities": "23505"})
+    replica_module.get_replica = lambda: None
+    try:
+        write_or_queue("activities", {"name": "Zumba"})
+    except WriteRejected as e:
+        return None if e.code == "23505" else f"código inesperado: {e.code}"
+    finally:
+        replica_module.supabase_client, replica_module.get_replica = original_client, original_get_replica
+    return "write_or_queue no lanzó WriteRejected"
+
+
+def check_replays_only_own_writes():
+    replica = queued_replica("activities")
+    replica.enqueue("agents", [{"id": "agents-1", "name": "Fila 1"}], queued_by=OTHER_USER)
+    client = RaisingClient()
+    applied = replay_pending_writes(replica, client, queued_by=USER)
+    if applied != 1 or statuses(replica) != [("agents", "pending")]:
+        return f"se esperaba solo la escritura propia enviada, hay {applied} y {statuses(replica)}"
+    return None
+
+
+def check_other_queue_does_not_block():
+    replica = queued_replica("agents", queued_by=OTHER_USER)
+    client = RaisingClient()
+    originals = replica_module.supabase_client, replica_module.get_replica, replica_module._current_user_email
+    replica_module.supabase_client = client
+    replica_module.get_replica = lambda: replica
+    replica_module._current_user_email = lambda: USER
+    try:
+        _, queued = write_or_queue("activities", {"id": "activities-9", "name": "Zumba"})
+    finally:
+        replica_module.supabase_client, replica_module.get_replica, replica_module._current_user_email = originals
+    if queued or [row["id"] for row in client.inserted] != ["activities-9"] or statuses(replica) != [("agents", "pending")]:
+        return f"la cola de otro usuario retuvo o reenvió escrituras: en cola={queued}, enviadas={client.inserted}, cola={statuses(replica)}"
+    return None
+
+
+def check_sync_error_raises():
+    try:
+        LocalReplica(":memory:").sync(FailingReadClient())
+    except RuntimeError as e:
+        return None if "permission denied" in str(e) else f"mensaje inesperado: {e}"
+    return "la sincronización no lanzó RuntimeError"
+
+
+def main():
+    checks = (
+        ("conflicto_fuera_de_cola", check_conflict_is_dropped),
+        ("ya_aplicada", check_already_applied),
+        ("error_fuera_de_cola", check_other_error_is_dropped),
+        ("sin_conexion", check_offline_keeps_queue),
+        ("escritura_directa", check_direct_write_raises),
+        ("solo_cola_propia", check_replays_only_own_writes),
+        ("cola_ajena_no_retiene", check_other_queue_does_not_block),
+        ("error_al_sincronizar", check_sync_error_raises),
+    )
+    failures = []
+    for name, check in checks:
+        error = check()
+        print(f"{name}: {'OK' if error is None else 'FALLO - ' + error}")
+        if error is not None:
+            failures.append(name)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
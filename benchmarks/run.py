@@ -0,0 +1,113 @@
+# benchmarks/run.py
+"""
+Benchmark de páginas sin red: sustituye el cliente Supabase por FakeSupabase, lo rellena con
+datos sintéticos y ejecuta cada página con AppTest de Streamlit, midiendo tiempo de render,
+número de peticiones y pico de memoria.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.run --scale small
+    python -m benchmarks.run --scale full --pages dashboard gym_booking --json resultados.json
+    python -m benchmarks.run --latency-ms 50   # Con latencia de red simulada por petición
+"""
+import argparse
+import json
+import pathlib
+import time
+import tracemalloc
+from streamlit.testing.v1 import AppTest
+from database import supabase_client as supabase_client_module
+from database.query_cache import query_cache
+from benchmarks.fake_supabase import FAKE_SECRETS, FakeSupabase, fake_session
+from benchmarks.seed import SCALES, seed
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+PAGES = {
+    "dashboard": "pages/dashboard.py",
+    "gym_booking": "pages/gym_booking.py",
+    "agents": "pages/agents.py",
+    "activities": "pages/activities.py",
+    "attendance": "pages/attendance.py",
+    "analytics": "pages/analytics.py",
+}
+APP_TEST_TIMEOUT = 300 # Segundos; a escala completa el backend falso es lento en las consultas sin filtrar
+
+
+def run_page(backend, script, session, trace_memory=False):
+    """Ejecuta una página una vez con la sesión `session` y retorna sus métricas."""
+    app = AppTest.from_file(str(REPO_ROOT / script), default_timeout=APP_TEST_TIMEOUT)
+    for name, value in FAKE_SECRETS.items():
+        app.secrets[name] = value
+    app.session_state["supabase_session"] = session
+    app.session_state["logged_in"] = True
+
+    requests_before = backend.request_count
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    app.run()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    peak_kb = None
+    if trace_memory:
+        peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return {
+        "render_ms": round(elapsed_ms, 1),
+        "requests": backend.request_count - requests_before,
+        "peak_kb": round(peak_kb, 1) if peak_kb is not None else None,
+        "exceptions": [str(e.value) for e in app.exception],
+    }
+
+
+def benchmark(pages, scale, latency_ms=0):
+    """
+    Mide cada página en frío (cache vacía), en caliente (cache llena) y en frío bajo
+    tracemalloc para el pico de memoria (tracemalloc distorsiona los tiempos, por eso va aparte).
+    `latency_ms` simula el tiempo de ida y vuelta de cada petición.
+    """
+    backend = seed(FakeSupabase(), **SCALES[scale])
+    backend.latency_ms = latency_ms # Después de sembrar: la carga de datos no cuenta
+    session = fake_session() # El mismo usuario en todas las ejecuciones: la cache se separa por usuario
+    supabase_client_module.use_client(backend)
+    results = []
+    try:
+        for page in pages:
+            query_cache.clear()
+            cold = run_page(backend, PAGES[page], session)
+            warm = run_page(backend, PAGES[page], session)
+            query_cache.clear()
+            memory = run_page(backend, PAGES[page], session, trace_memory=True)
+            results.append({
+                "page": page,
+                "scale": scale,
+                "cold_render_ms": cold["render_ms"],
+                "cold_requests": cold["requests"],
+                "warm_render_ms": warm["render_ms"],
+                "warm_requests": warm["requests"],
+                "peak_kb": memory["peak_kb"],
+                "exceptions": cold["exceptions"] + warm["exceptions"],
+            })
+    finally:
+        supabase_client_module.use_client(None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de páginas con un backend Supabase falso")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--pages", nargs="+", choices=sorted(PAGES), default=list(PAGES))
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latencia de red simulada por petición")
+    parser.add_argument("--json", help="Fichero donde guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    results = benchmark(args.pages, args.scale, args.latency_ms)
+    print(f"{'Página':<14}{'Frío (ms)':>12}{'Pet.':>6}{'Caliente (ms)':>15}{'Pet.':>6}{'Pico (KB)':>12}")
+    for r in results:
+        print(f"{r['page']:<14}{r['cold_render_ms']:>12}{r['cold_requests']:>6}{r['warm_render_ms']:>15}{r['warm_requests']:>6}{r['peak_kb']:>12}")
+        for exception in r["exceptions"]:
+            print(f"  ! {exception}")
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/seed.py
+"""Datos sintéticos para el backend falso, a escalas realistas."""
+import datetime
+import random
+import uuid
+from utils.constants import ACTIVITIES_LIST, TIME_SLOTS, SECTIONS_LIST, GROUPS_LIST, ARCHIVE_AFTER_MONTHS
+
+# Escalas predefinidas: agentes, reservas y filas de asistencia
+SCALES = {
+    "small": {"agents": 1_000, "reservations": 10_000, "agent_activities": 100_000},
+    "medium": {"agents": 5_000, "reservations": 50_000, "agent_activities": 500_000},
+    "full": {"agents": 10_000, "reservations": 100_000, "agent_activities": 1_000_000},
+}
+MONITOR_RATIO = 0.02 # Proporción de agentes que son monitores
+
+
+def _timestamp(date):
+    return datetime.datetime.combine(date, datetime.time(8), tzinfo=datetime.timezone.utc).isoformat()
+
+
+def seed(backend, agents, reservations, agent_activities, seed_value=42):
+    """
+    Rellena `backend` con datos sintéticos coherentes con el esquema: reservas únicas por
+    (fecha, turno, monitor) repartidas hacia atrás desde dentro de cuatro semanas, y
+    asistencias únicas por (agente, reserva). Las reservas más antiguas que ARCHIVE_AFTER_MONTHS
+    acaban en las tablas de archivo, como en producción.
+    """
+    rng = random.Random(seed_value)
+    today = datetime.date.today()
+
+    activity_rows = [
+        {"id": str(uuid.uuid4()), "name": name, "description": None, "created_at": _timestamp(today - datetime.timedelta(days=3650))}
+        for name in ACTIVITIES_LIST + [f"Actividad {i}" for i in range(1, 9)]
+    ]
+    backend.load("activities", activity_rows)
+    backend.load("sections", [{"name": name, "position": i} for i, name in enumerate(SECTIONS_LIST, start=1)])
+    backend.load("groups", [{"name": name, "position": i} for i, name in enumerate(GROUPS_LIST, start=1)])
+
+    monitor_count = max(1, int(agents * MONITOR_RATIO))
+    agent_rows = []
+    for i in range(agents):
+        agent_rows.append({
+            "id": str(uuid.uuid4()),
+            "nip": f"{100000 + i:06d}",
+            "name": f"Nombre{i}",
+            "surname": f"Apellido{rng.randint(1, 5000)} Apellido{rng.randint(1, 5000)}",
+            "section": rng.choice(SECTIONS_LIST),
+            "grupo": rng.choice(GROUPS_LIST),
+            "email": f"agente{i}@example.com",
+            "phone": None,
+            "is_monitor": i < monitor_count,
+            "created_at": _timestamp(today - datetime.timedelta(days=rng.randint(0, 3650))),
+        })
+    backend.load("agents", agent_rows)
+    monitors = agent_rows[:monitor_count]
+
+    # Combinaciones únicas (fecha, turno, monitor), desde la más reciente hacia atrás
+    reservation_rows = []
+    last_date = today + datetime.timedelta(days=28)
+    day = 0
+    while len(reservation_rows) < reservations:
+        date = last_date - datetime.timedelta(days=day)
+        for slot in TIME_SLOTS:
+            for monitor in rng.sample(monitors, k=min(len(monitors), 3)):
+                reservation_rows.append({
+                    "id": str(uuid.uuid4()),
+                    "activity_id": rng.choice(activity_rows)["id"],
+                    "monitor_id": monitor["id"],
+                    "reservation_date": date.isoformat(),
+                    "time_slot": slot,
+                    "notes": None,
+                    "created_at": _timestamp(date - datetime.timedelta(days=7)),
+                })
+        day += 1
+    del reservation_rows[reservations:]
+    backend.load("gym_reservations", reservation_rows)
+
+    per_reservation = max(1, agent_activities // max(1, reservations))
+    attendance_rows = []
+    for reservation in reservation_rows:
+        for agent in rng.sample(agent_rows, k=min(per_reservation, len(agent_rows))):
+            attendance_rows.append({
+                "id": str(uuid.uuid4()),
+                "agent_id": agent["id"],
+                "gym_reservation_id": reservation["id"],
+                "attended": rng.random() < 0.8,
+                "created_at": reservation["created_at"],
+            })
+            if len(attendance_rows) >= agent_activities:
+                break
+        if len(attendance_rows) >= agent_activities:
+            break
+    backend.load("agent_activities", attendance_rows)
+    backend.rpc("archive_old_reservations", {"older_than_months": ARCHIVE_AFTER_MONTHS}).execute() # Estado tras el archivado mensual
+    return backend
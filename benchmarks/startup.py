@@ -0,0 +1,92 @@
+# benchmarks/startup.py
+"""
+Benchmark de arranque en frío: ejecuta cada página en un intérprete nuevo (como tras reiniciar
+el contenedor) con el backend falso y mide cuánto tarda la primera ejecución, qué módulos
+pesados se han cargado y los hitos de utils/startup_report.py.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --pages streamlit_app gym_booking --json arranque.json
+"""
+import argparse
+import json
+import pathlib
+import subprocess
+import sys
+import time
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+PAGES = {
+    "streamlit_app": "streamlit_app.py",
+    "dashboard": "pages/dashboard.py",
+    "gym_booking": "pages/gym_booking.py",
+    "agents": "pages/agents.py",
+    "attendance": "pages/attendance.py",
+}
+HEAVY_MODULES = ("supabase", "pandas", "pyarrow", "openpyxl") # Deben cargarse solo cuando se usan
+
+
+def measure(page):
+    """Se ejecuta en el proceso hijo: primera ejecución de `page` y estado del arranque."""
+    from benchmarks.fake_supabase import FAKE_SECRETS, FakeSupabase, fake_session
+    from benchmarks.seed import SCALES, seed
+    backend = seed(FakeSupabase(), **SCALES["small"]) # Antes de importar la app: no cuenta como arranque
+
+    started_at = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    from database import supabase_client as supabase_client_module
+    from utils.startup_report import startup_report
+    supabase_client_module.use_client(backend)
+    app = AppTest.from_file(str(REPO_ROOT / PAGES[page]), default_timeout=120)
+    for name, value in FAKE_SECRETS.items():
+        app.secrets[name] = value
+    if page != "streamlit_app": # La portada se mide sin sesión: es la pantalla de login
+        app.session_state["supabase_session"] = fake_session()
+        app.session_state["logged_in"] = True
+    requests_before = backend.request_count
+    run_started_at = time.perf_counter()
+    app.run()
+    return {
+        "page": page,
+        "first_run_ms": round((time.perf_counter() - run_started_at) * 1000, 1),
+        "process_ms": round((time.perf_counter() - started_at) * 1000, 1),
+        "requests": backend.request_count - requests_before,
+        "heavy_modules_loaded": [m for m in HEAVY_MODULES if m in sys.modules],
+        "startup_report": startup_report(),
+        "exceptions": [str(e.value) for e in app.exception],
+    }
+
+
+def run_cold(page):
+    """Mide `page` en un intérprete nuevo y retorna sus métricas."""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", page],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque en frío de las páginas")
+    parser.add_argument("--pages", nargs="+", choices=sorted(PAGES), default=list(PAGES))
+    parser.add_argument("--json", help="Fichero donde guardar los resultados en JSON")
+    parser.add_argument("--child", choices=sorted(PAGES), help=argparse.SUPPRESS) # Uso interno: proceso hijo
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child)))
+        return
+
+    results = [run_cold(page) for page in args.pages]
+    print(f"{'Página':<15}{'1.ª ejecución (ms)':>20}{'Proceso (ms)':>14}{'Pet.':>6}  Módulos pesados cargados")
+    for r in results:
+        print(f"{r['page']:<15}{r['first_run_ms']:>20}{r['process_ms']:>14}{r['requests']:>6}  {', '.join(r['heavy_modules_loaded']) or '-'}")
+        print(f"  Hitos (ms): {r['startup_report']}")
+        for exception in r["exceptions"]:
+            print(f"  ! {exception}")
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# database/agent_import.py
+import csv
+import io
+import re
+from database.supabase_client import supabase_client
+from database.reference_data import get_reference_data
+from utils.constants import SECTIONS_LIST, GROUPS_LIST
+
+IMPORT_COLUMNS = ["nip", "name", "surname", "section", "grupo", "email", "phone", "is_monitor"]
+REQUIRED_COLUMNS = ["nip", "name", "surname"]
+UPSERT_CHUNK_SIZE = 500 # Filas por petición de upsert
+EMAIL_LOOKUP_CHUNK_SIZE = 200 # Emails por consulta al comprobar duplicados en la base de datos
+
+NIP_PATTERN = re.compile(r"^\d{6}$")
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+TRUE_VALUES = {"1", "true", "si", "sí", "s", "x", "yes"}
+
+
+def iter_rows(uploaded_file):
+    """
+    Recorre las filas de un fichero CSV o XLSX subido sin cargarlo entero en memoria.
+    Produce tuplas (número_de_fila, diccionario) con las cabeceras normalizadas a minúsculas.
+    """
+    if uploaded_file.name.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook # Importar aquí: solo se necesita para Excel
+        workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [str(h).strip().lower() if h is not None else "" for h in next(rows, [])]
+        for row_number, values in enumerate(rows, start=2):
+            yield row_number, {h: ("" if v is None else str(v)) for h, v in zip(headers, values)}
+        workbook.close()
+    else:
+        text = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t") # Excel en español suele exportar con ";"
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(text, dialect=dialect)
+        reader.fieldnames = [h.strip().lower() for h in reader.fieldnames or []]
+        for row_number, row in enumerate(reader, start=2):
+            yield row_number, row
+        text.detach() # No cerrar el fichero subido al liberar el envoltorio de texto
+
+
+def _clean(value):
+    value = (value or "").strip()
+    return value if value else None
+
+
+def validate_rows(rows, sections=SECTIONS_LIST, groups=GROUPS_LIST):
+    """
+    Valida todas las filas a la vez: formato del NIP, NIP y email duplicados dentro del
+    fichero y pertenencia de sección y grupo a `sections` / `groups`.
+    Cada agente solo lleva las columnas presentes en la cabecera del fichero: al actualizar un
+    NIP ya registrado, las columnas que no vienen en el fichero conservan su valor.
+    Retorna (agentes_válidos, errores); cada error es un diccionario con fila, NIP y motivo.
+    """
+    valid, errors = [], []
+    seen_nips, seen_emails = {}, {}
+    for row_number, row in rows:
+        agent = {column: _clean(row.get(column)) for column in IMPORT_COLUMNS if column in row} # Todas las filas tienen las claves de la cabecera
+        if "is_monitor" in agent:
+            agent["is_monitor"] = (agent["is_monitor"] or "").lower() in TRUE_VALUES
+        problems = []
+        missing = [column for column in REQUIRED_COLUMNS if not agent.get(column)]
+        if missing:
+            problems.append(f"Faltan campos obligatorios: {', '.join(missing)}")
+        if agent.get("nip") and not NIP_PATTERN.match(agent["nip"]):
+            problems.append("El NIP debe tener 6 dígitos")
+        elif agent.get("nip") in seen_nips:
+            problems.append(f"NIP duplicado (ya aparece en la fila {seen_nips[agent['nip']]})")
+        if agent.get("email"):
+            agent["email"] = agent["email"].lower()
+            if not EMAIL_PATTERN.match(agent["email"]):
+                problems.append("Email con formato no válido")
+            elif agent["email"] in seen_emails:
+                problems.append(f"Email duplicado (ya aparece en la fila {seen_emails[agent['email']]})")
+        if agent.get("section") and agent["section"] not in sections:
+            problems.append(f"Sección desconocida: {agent['section']}")
+        if agent.get("grupo") and agent["grupo"] not in groups:
+            problems.append(f"Grupo desconocido: {agent['grupo']}")
+
+        if problems:
+            errors.append({"Fila": row_number, "NIP": agent.get("nip"), "Error": "; ".join(problems)})
+            continue
+        seen_nips[agent["nip"]] = row_number
+        if agent.get("email"):
+            seen_emails[agent["email"]] = row_number
+        valid.append((row_number, agent))
+    return valid, errors
+
+
+def check_existing_emails(valid):
+    """
+    Descarta las filas cuyo email ya pertenece a otro agente (otro NIP) en la base de datos,
+    consultando los emails en bloques. Retorna (agentes_válidos, errores).
+    """
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    emails = [agent["email"] for _, agent in valid if agent.get("email")]
+    owners = {}
+    for i in range(0, len(emails), EMAIL_LOOKUP_CHUNK_SIZE):
+        try:
+            response = supabase_client.table("agents").select("nip, email").in_("email", emails[i:i + EMAIL_LOOKUP_CHUNK_SIZE]).execute()
+        except APIError as e:
+            raise RuntimeError(e.message) from e
+        owners.update({row["email"]: row["nip"] for row in response.data})
+
+    kept, errors = [], []
+    for row_number, agent in valid:
+        owner = owners.get(agent.get("email"))
+        if owner is not None and owner != agent["nip"]:
+            errors.append({"Fila": row_number, "NIP": agent["nip"], "Error": f"El email ya está registrado para el NIP {owner}"})
+        else:
+            kept.append((row_number, agent))
+    return kept, errors
+
+
+def upsert_agents(valid, chunk_size=UPSERT_CHUNK_SIZE):
+    """
+    Inserta o actualiza los agentes válidos en bloques de `chunk_size`, usando el NIP como clave.
+    Solo se envían las columnas de cada agente, así que un NIP existente conserva las demás.
+    Retorna (número_de_agentes_guardados, errores); si falla un bloque, todas sus filas se reportan.
+    """
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    saved, errors = 0, []
+    for i in range(0, len(valid), chunk_size):
+        chunk = valid[i:i + chunk_size]
+        try:
+            supabase_client.table("agents").upsert([agent for _, agent in chunk], on_conflict="nip").execute()
+            message = None
+        except APIError as e:
+            message = e.message
+        except Exception as e:
+            message = str(e)
+        if message:
+            errors.extend({"Fila": row_number, "NIP": agent["nip"], "Error": f"Error al guardar: {message}"} for row_number, agent in chunk)
+        else:
+            saved += len(chunk)
+    return saved, errors
+
+
+def import_agents(uploaded_file):
+    """
+    Importa agentes desde un CSV/XLSX: valida el fichero completo, comprueba los emails
+    existentes y guarda las filas válidas mediante upserts por bloques.
+    Retorna (número_de_agentes_guardados, errores ordenados por fila).
+    """
+    reference_data = get_reference_data()
+    valid, errors = validate_rows(iter_rows(uploaded_file), reference_data["sections"], reference_data["groups"])
+    valid, email_errors = check_existing_emails(valid)
+    saved, save_errors = upsert_agents(valid)
+    report = sorted(errors + email_errors + save_errors, key=lambda e: e["Fila"])
+    return saved, report
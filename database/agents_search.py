@@ -0,0 +1,75 @@
+# database/agents_search.py
+from database.supabase_client import supabase_client
+from database.query_cache import cached_query
+from database.realtime import get_live_store
+from database.replica import get_replica
+from database.reference_data import get_reference_data
+
+SEARCH_PAGE_SIZE = 25 # Agentes por página en los listados
+TYPEAHEAD_LIMIT = 20 # Sugerencias en los selectores con búsqueda
+NAME_SEARCH_MIN_CHARS = 3 # Con menos caracteres solo se busca el prefijo de NIP: es el mínimo de un trigrama (migración 0009)
+TYPEAHEAD_MIN_CHARS = NAME_SEARCH_MIN_CHARS # Caracteres mínimos antes de consultar
+SEARCH_COLUMNS = ["id", "nip", "name", "surname", "section", "grupo", "email", "is_monitor"]
+
+
+def _search_in_memory(live_store, search_query, section, grupo, only_monitors, page_size, page_offset):
+    """Misma búsqueda que la función SQL `search_agents`, sobre el almacén en tiempo real."""
+    needle = (search_query or "").strip().lower()
+
+    def matches(agent):
+        name_match = len(needle) >= NAME_SEARCH_MIN_CHARS and needle in f"{agent['name']} {agent['surname']}".lower()
+        if needle and not (agent["nip"].startswith(needle) or name_match):
+            return False
+        if section and agent.get("section") != section:
+            return False
+        if grupo and agent.get("grupo") != grupo:
+            return False
+        return not only_monitors or agent.get("is_monitor")
+
+    found = sorted(live_store.rows("agents", matches), key=lambda a: (a["surname"], a["name"], a["id"]))
+    return [{c: a.get(c) for c in SEARCH_COLUMNS} for a in found[page_offset:page_offset + page_size]], len(found)
+
+
+@cached_query("agents", ttl=60)
+def search_agents(search_query="", section=None, grupo=None, only_monitors=False, page=0, page_size=SEARCH_PAGE_SIZE):
+    """
+    Busca agentes por NIP (prefijo), nombre y apellidos (subcadena, a partir de NAME_SEARCH_MIN_CHARS
+    caracteres), sección, grupo y si son monitores.
+    Usa la función `search_agents` de la base de datos, apoyada en índices, y solo trae una
+    página con las columnas del listado. Con el almacén en tiempo real o la réplica local
+    activos, se busca en ellos sin ninguna petición. Retorna (agentes, total_de_coincidencias).
+    """
+    page_offset = page * page_size
+    live_store = get_live_store()
+    if live_store is not None and live_store.is_ready():
+        return _search_in_memory(live_store, search_query, section, grupo, only_monitors, page_size, page_offset)
+    replica = get_replica()
+    if replica is not None and replica.is_ready():
+        return replica.search_agents(search_query, section, grupo, only_monitors, page_size, page_offset)
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    try:
+        response = supabase_client.rpc("search_agents", {
+            "search_query": search_query or None,
+            "agent_section": section or None,
+            "agent_grupo": grupo or None,
+            "only_monitors": only_monitors,
+            "page_size": page_size,
+            "page_offset": page_offset,
+        }).execute()
+    except APIError as e:
+        raise RuntimeError(e.message) from e
+    rows = response.data
+    total = rows[0]["total_count"] if rows else 0
+    return [{c: row[c] for c in SEARCH_COLUMNS} for row in rows], total
+
+
+def search_monitors(search_query=""):
+    """
+    Sugerencias para el selector de monitor. Con menos de TYPEAHEAD_MIN_CHARS caracteres
+    se muestran los primeros monitores por apellido, sacados de los datos de referencia ya cargados.
+    """
+    search_query = (search_query or "").strip()
+    if len(search_query) < TYPEAHEAD_MIN_CHARS:
+        return get_reference_data()["monitors"][:TYPEAHEAD_LIMIT]
+    monitors, _ = search_agents(search_query, only_monitors=True, page_size=TYPEAHEAD_LIMIT)
+    return monitors
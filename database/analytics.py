@@ -0,0 +1,101 @@
+# database/analytics.py
+import csv
+import io
+import tempfile
+from database.supabase_client import supabase_client
+from database.query_cache import cached_query
+
+ANALYTICS_TABLES = ("agents", "activities", "gym_reservations", "agent_activities", "gym_reservations_archive", "agent_activities_archive")
+EXPORT_PAGE_SIZE = 1000 # Filas por petición al exportar (límite por defecto de PostgREST)
+EXPORT_COLUMNS = ["reservation_date", "time_slot", "activity", "monitor", "nip", "name", "surname", "section", "grupo", "attended"]
+
+
+def _call_aggregate(function_name, start_date, end_date, include_history):
+    """Llama a una función de agregado: solo las tablas calientes salvo que se pida el histórico archivado."""
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    params = {"start_date": start_date, "end_date": end_date, "include_history": include_history}
+    try:
+        response = supabase_client.rpc(function_name, params).execute()
+    except APIError as e:
+        raise RuntimeError(e.message) from e
+    return response.data
+
+
+@cached_query(*ANALYTICS_TABLES, ttl=300)
+def get_usage_by_month(start_date, end_date, include_history=False):
+    """Asistencia por mes, sección, grupo y actividad, agregada en el servidor."""
+    return _call_aggregate("get_usage_by_month", start_date, end_date, include_history)
+
+
+@cached_query(*ANALYTICS_TABLES, ttl=300)
+def get_monitor_load(start_date, end_date, include_history=False):
+    """Sesiones, inscritos y asistentes por monitor, agregados en el servidor."""
+    return _call_aggregate("get_monitor_load", start_date, end_date, include_history)
+
+
+@cached_query(*ANALYTICS_TABLES, ttl=300)
+def get_slot_utilisation(start_date, end_date, include_history=False):
+    """Sesiones y asistencia media por día de la semana y turno, agregadas en el servidor."""
+    return _call_aggregate("get_slot_utilisation", start_date, end_date, include_history)
+
+
+def iter_attendance_pages(client, start_date, end_date, include_history=False, page_size=EXPORT_PAGE_SIZE):
+    """
+    Recorre la vista `attendance_export` (o `attendance_export_all`, con el archivo, si
+    `include_history`) en el rango con paginación por clave
+    (reservation_date, attendance_id). Produce una lista de filas por página, así que la
+    memoria usada no depende del tamaño del rango.
+    `client` se pasa explícitamente porque la exportación se ejecuta fuera del hilo del script.
+    """
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    view = "attendance_export_all" if include_history else "attendance_export"
+    cursor = None
+    while True:
+        query = client.table(view).select(", ".join(["attendance_id"] + EXPORT_COLUMNS)).gte(
+            "reservation_date", start_date
+        ).lte("reservation_date", end_date)
+        if cursor:
+            last_date, last_id = cursor
+            query = query.or_(f"reservation_date.gt.{last_date},and(reservation_date.eq.{last_date},attendance_id.gt.{last_id})")
+        try:
+            response = query.order("reservation_date").order("attendance_id").limit(page_size).execute()
+        except APIError as e:
+            raise RuntimeError(e.message) from e
+        rows = response.data
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        cursor = (rows[-1]["reservation_date"], rows[-1]["attendance_id"])
+
+
+def export_attendance_csv(client, start_date, end_date, include_history=False):
+    """Escribe el detalle de asistencia en un CSV temporal página a página y lo retorna abierto para lectura."""
+    export_file = tempfile.TemporaryFile(mode="w+b")
+    text = io.TextIOWrapper(export_file, encoding="utf-8", newline="")
+    writer = csv.DictWriter(text, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for rows in iter_attendance_pages(client, start_date, end_date, include_history):
+        writer.writerows(rows)
+    text.flush()
+    text.detach() # Conservar el fichero binario abierto para la descarga
+    export_file.seek(0)
+    return export_file
+
+
+def export_attendance_parquet(client, start_date, end_date, include_history=False):
+    """Escribe el detalle de asistencia en un Parquet temporal (un row group por página) y lo retorna abierto para lectura."""
+    import pyarrow as pa # Importar aquí: solo se necesita para exportar a Parquet
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("reservation_date", pa.string()), ("time_slot", pa.string()), ("activity", pa.string()),
+        ("monitor", pa.string()), ("nip", pa.string()), ("name", pa.string()), ("surname", pa.string()),
+        ("section", pa.string()), ("grupo", pa.string()), ("attended", pa.bool_()),
+    ])
+    export_file = tempfile.TemporaryFile(mode="w+b")
+    with pq.ParquetWriter(export_file, schema) as writer:
+        for rows in iter_attendance_pages(client, start_date, end_date, include_history):
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    export_file.seek(0)
+    return export_file
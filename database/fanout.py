@@ -0,0 +1,80 @@
+# database/fanout.py
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+QUERY_TIMEOUT = 8 # Segundos por consulta por defecto (por debajo del timeout HTTP del cliente)
+MAX_PARALLEL_QUERIES = 6 # Hilos como máximo por página; el pool HTTP compartido admite 20 conexiones
+
+
+class QueryTimeout(RuntimeError):
+    """Una consulta de `run_concurrently` no terminó dentro de su tiempo límite."""
+
+
+class QueryResults:
+    """
+    Resultados de `run_concurrently` por nombre. Acceder a una consulta que falló (o que
+    superó su tiempo límite) relanza su excepción, así que cada página la trata en su propio
+    bloque try/except como si la consulta se hubiera ejecutado en ese punto.
+    """
+
+    def __init__(self, values, errors, elapsed_ms):
+        self._values = values
+        self._errors = errors
+        self.elapsed_ms = elapsed_ms # Tiempo total de la tanda (≈ la consulta más lenta)
+
+    def __getitem__(self, name):
+        if name in self._errors:
+            raise self._errors[name]
+        return self._values[name]
+
+    def failed(self):
+        """Nombres de las consultas que fallaron o superaron su tiempo límite."""
+        return list(self._errors)
+
+
+def run_concurrently(queries, timeout=QUERY_TIMEOUT):
+    """
+    Ejecuta en paralelo las consultas que necesita una página y espera a todas.
+    `queries` es un diccionario nombre -> función sin argumentos, o nombre -> (función, timeout)
+    para un límite propio. La latencia de la tanda pasa a ser la de la consulta más lenta en
+    lugar de la suma de todas.
+    Los hilos heredan el contexto del script, de modo que el cliente de la sesión, la cache
+    de consultas y el panel de depuración funcionan igual que en el hilo principal. Las
+    funciones no deben dibujar nada con `st.*`: los errores se devuelven en `QueryResults`.
+    Una consulta que supera su tiempo límite se abandona (su hilo termina por su cuenta,
+    acotado por el timeout HTTP) y se notifica como QueryTimeout. Ese hilo sigue con el
+    contexto del script aunque el rerun ya haya terminado: puede escribir en la cache o en el
+    registro de consultas de una ejecución pasada, pero no debe dibujar nada.
+    """
+    started_at = time.perf_counter()
+    values, errors = {}, {}
+    specs = {name: spec if isinstance(spec, tuple) else (spec, timeout) for name, spec in queries.items()}
+    if len(specs) <= 1: # Una sola consulta: sin hilos
+        for name, (func, _) in specs.items():
+            try:
+                values[name] = func()
+            except Exception as e:
+                errors[name] = e
+        return QueryResults(values, errors, (time.perf_counter() - started_at) * 1000)
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    executor = ThreadPoolExecutor(
+        max_workers=min(len(specs), MAX_PARALLEL_QUERIES),
+        thread_name_prefix="query-fanout",
+        initializer=(lambda: add_script_run_ctx(ctx=ctx)) if ctx is not None else None,
+    )
+    try:
+        futures = {name: executor.submit(func) for name, (func, _) in specs.items()}
+        for name, future in futures.items():
+            remaining = specs[name][1] - (time.perf_counter() - started_at) # Los límites cuentan desde el inicio de la tanda
+            try:
+                values[name] = future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                future.cancel()
+                errors[name] = QueryTimeout(f"La consulta '{name}' superó {specs[name][1]} s")
+            except Exception as e:
+                errors[name] = e
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True) # No bloquear la página por consultas abandonadas
+    return QueryResults(values, errors, (time.perf_counter() - started_at) * 1000)
@@ -0,0 +1,249 @@
+# database/instrumentation.py
+import collections
+import datetime
+import json
+import os
+import threading
+import time
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.startup_report import mark, startup_report
+
+MAX_RERUNS_PER_SESSION = 20 # Reruns que se conservan por sesión para el panel de depuración
+MAX_SESSIONS = 200 # Sesiones que se conservan; se descartan las usadas hace más tiempo (las cerradas no avisan)
+
+def is_enabled():
+    """La instrumentación se activa con `query_debug = true` en secrets o GYMAPP_QUERY_DEBUG=1."""
+    return os.environ.get("GYMAPP_QUERY_DEBUG") == "1" or bool(st.secrets.get("query_debug", False))
+
+
+class QueryRecorder:
+    """
+    Registro de peticiones a Supabase agrupadas por sesión de navegador y por rerun.
+    Es compartido por todo el proceso; las peticiones de hilos sin contexto de Streamlit
+    se agrupan bajo la sesión "background". Solo se conservan las `max_sessions` sesiones
+    usadas más recientemente, así que la memoria no crece con las sesiones ya cerradas.
+    """
+
+    def __init__(self, log_path=None, max_sessions=MAX_SESSIONS):
+        self.log_path = log_path
+        self.max_sessions = max_sessions
+        self._sessions = collections.OrderedDict() # id de sesión -> deque de reruns; orden LRU
+        self._lock = threading.Lock()
+
+    def _session_id(self):
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx is not None else "background"
+
+    def _session_reruns(self, session_id):
+        """Reruns de la sesión (creándola si no existe), marcada como la más reciente. Llamar con el lock."""
+        reruns = self._sessions.get(session_id)
+        if reruns is None:
+            reruns = self._sessions[session_id] = collections.deque(maxlen=MAX_RERUNS_PER_SESSION)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return reruns
+
+    def begin_rerun(self, page):
+        """Abre un nuevo grupo de peticiones para el rerun actual de `page`."""
+        session_id = self._session_id()
+        with self._lock:
+            reruns = self._session_reruns(session_id)
+            number = reruns[-1]["rerun"] + 1 if reruns else 1
+            rerun = {"rerun": number, "page": page, "started_at": time.time(), "records": []}
+            reruns.append(rerun)
+        return rerun
+
+    def current_rerun(self):
+        """Último rerun abierto de la sesión actual, o None."""
+        with self._lock:
+            reruns = self._sessions.get(self._session_id())
+            return reruns[-1] if reruns else None
+
+    def reruns(self):
+        """Copia de los reruns registrados para la sesión actual (el más reciente al final)."""
+        with self._lock:
+            return list(self._sessions.get(self._session_id(), ()))
+
+    def record(self, **fields):
+        """Añade un registro al rerun actual de la sesión y, si está configurado, al fichero JSON lines."""
+        session_id = self._session_id()
+        with self._lock:
+            reruns = self._session_reruns(session_id)
+            if not reruns:
+                reruns.append({"rerun": 1, "page": None, "started_at": time.time(), "records": []})
+            rerun = reruns[-1]
+            entry = {
+                "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+                "session": session_id,
+                "rerun": rerun["rerun"],
+                "page": rerun["page"],
+                **fields,
+            }
+            rerun["records"].append(entry)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as log_file:
+                    log_file.write(json.dumps(entry, default=str) + "\n")
+        return entry
+
+
+@st.cache_resource # Un único registro por proceso
+def get_recorder() -> QueryRecorder:
+    return QueryRecorder(log_path=os.environ.get("GYMAPP_QUERY_LOG") or st.secrets.get("query_log_path"))
+
+
+def _describe_call(name, args, kwargs):
+    parts = [repr(a) for a in args] + [f"{k}={v!r}" for k, v in kwargs.items()]
+    return f"{name}({', '.join(parts)})"
+
+
+class InstrumentedQuery:
+    """
+    Envuelve un query builder de Supabase: anota cada llamada encadenada (select, eq, order...)
+    y, al ejecutar, registra la tabla, los filtros, la latencia y el tamaño de la respuesta.
+    """
+
+    def __init__(self, builder, target, kind, calls=()):
+        self._builder = builder
+        self._target = target
+        self._kind = kind
+        self._calls = list(calls)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._builder, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return InstrumentedQuery(result, self._target, self._kind, self._calls + [_describe_call(name, args, kwargs)])
+            return result
+        return call
+
+    def execute(self):
+        started = time.perf_counter()
+        response, error = None, None
+        try:
+            response = self._builder.execute()
+            return response
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            data = getattr(response, "data", None)
+            get_recorder().record(
+                kind=self._kind,
+                table=self._target,
+                operation=self._calls[0].split("(", 1)[0] if self._calls else self._kind,
+                filters=self._calls[1:] if self._kind == "table" else self._calls,
+                latency_ms=round(latency_ms, 2),
+                bytes=len(json.dumps(data, default=str).encode()) if data is not None else 0,
+                rows=len(data) if isinstance(data, list) else None,
+                cache=None,
+                error=error,
+            )
+
+
+class InstrumentedClient:
+    """Envuelve un cliente Supabase para instrumentar `table`, `from_` y `rpc`; el resto pasa sin cambios."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return InstrumentedQuery(self._client.table(name), name, "table")
+
+    def from_(self, name):
+        return InstrumentedQuery(self._client.from_(name), name, "table")
+
+    def rpc(self, fn, params=None, *args, **kwargs):
+        builder = self._client.rpc(fn, params or {}, *args, **kwargs)
+        return InstrumentedQuery(builder, fn, "rpc", [_describe_call("rpc", (params or {},), {})])
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def record_cache_event(func_name, tables, hit):
+    """Registra un acierto o fallo de `query_cache` en el rerun actual."""
+    if is_enabled():
+        get_recorder().record(
+            kind="cache", table=",".join(tables), operation=func_name, filters=[],
+            latency_ms=None, bytes=None, rows=None, cache="hit" if hit else "miss", error=None,
+        )
+
+
+def begin_rerun(page):
+    """
+    Marca el inicio de un rerun de `page` para agrupar sus peticiones y, si la
+    instrumentación está activa, muestra el panel de depuración en la barra lateral.
+    Llamar justo después de st.set_page_config.
+    """
+    mark("primer rerun") # Fin de los imports de la app: a partir de aquí la página ya se dibuja
+    if not is_enabled():
+        return
+    recorder = get_recorder()
+    previous = recorder.current_rerun()
+    recorder.begin_rerun(page)
+    render_debug_panel(previous)
+
+
+def summarize(rerun):
+    """Resumen de un rerun: número de peticiones, latencia total, bytes, aciertos de cache y consultas repetidas."""
+    queries = [r for r in rerun["records"] if r["kind"] != "cache"]
+    cache_events = [r for r in rerun["records"] if r["kind"] == "cache"]
+    shapes = collections.Counter((q["table"], q["operation"], tuple(f.split("(", 1)[0] for f in q["filters"])) for q in queries)
+    return {
+        "requests": len(queries),
+        "latency_ms": round(sum(q["latency_ms"] for q in queries), 2),
+        "bytes": sum(q["bytes"] for q in queries),
+        "cache_hits": sum(1 for c in cache_events if c["cache"] == "hit"),
+        "cache_misses": sum(1 for c in cache_events if c["cache"] == "miss"),
+        "repeated": {f"{table}.{operation}": count for (table, operation, _), count in shapes.items() if count > 1},
+    }
+
+
+def render_debug_panel(previous_rerun):
+    """
+    Panel de depuración en la barra lateral. Se dibuja al empezar el rerun, así que
+    muestra el rerun anterior completo y el historial de la sesión.
+    """
+    from database.query_cache import query_cache # Importar aquí para evitar un import circular
+
+    reruns = get_recorder().reruns()
+    with st.sidebar.expander("🔍 Depuración de consultas", expanded=False):
+        if previous_rerun is None:
+            st.caption("Aún no hay reruns registrados en esta sesión.")
+        else:
+            summary = summarize(previous_rerun)
+            st.caption(f"Rerun #{previous_rerun['rerun']} · {previous_rerun['page']}")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Peticiones", summary["requests"])
+            col2.metric("Latencia (ms)", summary["latency_ms"])
+            col3.metric("KB", round(summary["bytes"] / 1024, 1))
+            st.caption(f"Cache: {summary['cache_hits']} aciertos · {summary['cache_misses']} fallos")
+            if summary["repeated"]:
+                st.warning(f"Consultas repetidas (posible N+1): {summary['repeated']}")
+            st.dataframe(
+                [{k: r[k] for k in ("kind", "table", "operation", "latency_ms", "bytes", "rows", "cache", "error")} for r in previous_rerun["records"]],
+                hide_index=True,
+            )
+        if reruns:
+            by_page = collections.defaultdict(list)
+            for rerun in reruns:
+                by_page[rerun["page"]].append(summarize(rerun)["requests"])
+            st.dataframe(
+                [{"Página": page, "Reruns": len(counts), "Peticiones/rerun": round(sum(counts) / len(counts), 1)} for page, counts in by_page.items()],
+                hide_index=True,
+            )
+        st.caption(f"Cache global: {query_cache.stats()}")
+        st.caption(f"Arranque en frío (ms): {startup_report()}")
+        st.download_button(
+            "Exportar JSON lines",
+            data="\n".join(json.dumps(r, default=str) for rerun in reruns for r in rerun["records"]),
+            file_name="query_log.jsonl",
+            mime="application/jsonl",
+        )
@@ -1,4 +1,5 @@
--- database/database_schema.sql
+-- database/migrations/0001_initial_schema.sql
+-- Tablas de la app y actividades iniciales.
 
 CREATE TABLE agents (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
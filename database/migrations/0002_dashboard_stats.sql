@@ -0,0 +1,40 @@
+-- database/migrations/0002_dashboard_stats.sql
+
+-- Estadísticas del panel de control en una sola llamada (supabase_client.rpc("get_dashboard_stats"))
+-- Retorna los conteos, la ocupación de la semana actual por turno y las últimas reservas ya aplanadas.
+CREATE OR REPLACE FUNCTION get_dashboard_stats(latest_limit INTEGER DEFAULT 5)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'activities_count', (SELECT count(*) FROM activities),
+        'agents_count', (SELECT count(*) FROM agents),
+        'week_start', date_trunc('week', current_date)::date,
+        'week_occupancy', (
+            SELECT coalesce(json_agg(json_build_object(
+                'time_slot', time_slot,
+                'reservations', reservations,
+                'days_booked', days_booked
+            )), '[]'::json)
+            FROM (
+                SELECT time_slot, count(*) AS reservations, count(DISTINCT reservation_date) AS days_booked
+                FROM gym_reservations
+                WHERE reservation_date >= date_trunc('week', current_date)::date
+                  AND reservation_date < date_trunc('week', current_date)::date + 7
+                GROUP BY time_slot
+            ) occupancy
+        ),
+        'latest_reservations', (
+            SELECT coalesce(json_agg(latest), '[]'::json)
+            FROM (
+                SELECT r.reservation_date, r.time_slot, a.name AS activity, ag.name || ' ' || ag.surname AS monitor
+                FROM gym_reservations r
+                JOIN activities a ON a.id = r.activity_id
+                JOIN agents ag ON ag.id = r.monitor_id
+                ORDER BY r.created_at DESC
+                LIMIT latest_limit
+            ) latest
+        )
+    );
+$$;
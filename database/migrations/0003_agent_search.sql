@@ -0,0 +1,36 @@
+-- database/migrations/0003_agent_search.sql
+
+-- Búsqueda de agentes en el servidor (supabase_client.rpc("search_agents"))
+-- Índices: prefijo de NIP, trigramas sobre "nombre apellidos" y filtros por sección/grupo/monitor.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS agents_nip_prefix_idx ON agents (nip text_pattern_ops);
+CREATE INDEX IF NOT EXISTS agents_full_name_trgm_idx ON agents USING gin (lower(name || ' ' || surname) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS agents_section_grupo_idx ON agents (section, grupo);
+
+-- Retorna una página de agentes proyectada a las columnas de listado, más el total de coincidencias.
+CREATE OR REPLACE FUNCTION search_agents(
+    search_query TEXT DEFAULT NULL,
+    agent_section TEXT DEFAULT NULL,
+    agent_grupo TEXT DEFAULT NULL,
+    only_monitors BOOLEAN DEFAULT FALSE,
+    page_size INTEGER DEFAULT 25,
+    page_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+    id UUID, nip VARCHAR, name VARCHAR, surname VARCHAR, section VARCHAR, grupo VARCHAR,
+    email VARCHAR, is_monitor BOOLEAN, total_count BIGINT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT a.id, a.nip, a.name, a.surname, a.section, a.grupo, a.email, a.is_monitor, count(*) OVER () AS total_count
+    FROM agents a
+    WHERE (coalesce(search_query, '') = ''
+           OR a.nip LIKE search_query || '%'
+           OR lower(a.name || ' ' || a.surname) LIKE '%' || lower(search_query) || '%')
+      AND (agent_section IS NULL OR a.section = agent_section)
+      AND (agent_grupo IS NULL OR a.grupo = agent_grupo)
+      AND (NOT only_monitors OR a.is_monitor)
+    ORDER BY a.surname, a.name, a.id
+    LIMIT page_size OFFSET page_offset;
+$$;
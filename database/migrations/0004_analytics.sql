@@ -0,0 +1,64 @@
+-- database/migrations/0004_analytics.sql
+
+-- Analítica de uso del gimnasio: agregados calculados en el servidor para un rango de fechas.
+-- Asistencia por mes, sección, grupo y actividad.
+CREATE OR REPLACE FUNCTION get_usage_by_month(start_date DATE, end_date DATE)
+RETURNS TABLE (
+    month DATE, section VARCHAR, grupo VARCHAR, activity VARCHAR,
+    sessions BIGINT, enrolled BIGINT, attended BIGINT, attendance_rate NUMERIC
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT date_trunc('month', r.reservation_date)::date, ag.section, ag.grupo, act.name,
+           count(DISTINCT r.id), count(*), count(*) FILTER (WHERE aa.attended),
+           round(100.0 * count(*) FILTER (WHERE aa.attended) / nullif(count(*), 0), 1)
+    FROM agent_activities aa
+    JOIN gym_reservations r ON r.id = aa.gym_reservation_id
+    JOIN agents ag ON ag.id = aa.agent_id
+    JOIN activities act ON act.id = r.activity_id
+    WHERE r.reservation_date BETWEEN start_date AND end_date
+    GROUP BY 1, 2, 3, 4
+    ORDER BY 1, 2, 3, 4;
+$$;
+
+-- Carga de cada monitor: sesiones impartidas, inscritos y asistentes.
+CREATE OR REPLACE FUNCTION get_monitor_load(start_date DATE, end_date DATE)
+RETURNS TABLE (monitor_id UUID, monitor VARCHAR, sessions BIGINT, enrolled BIGINT, attended BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT m.id, (m.name || ' ' || m.surname)::varchar, count(DISTINCT r.id), count(aa.id), count(aa.id) FILTER (WHERE aa.attended)
+    FROM gym_reservations r
+    JOIN agents m ON m.id = r.monitor_id
+    LEFT JOIN agent_activities aa ON aa.gym_reservation_id = r.id
+    WHERE r.reservation_date BETWEEN start_date AND end_date
+    GROUP BY m.id, m.name, m.surname
+    ORDER BY 3 DESC, 2;
+$$;
+
+-- Utilización de cada turno por día de la semana (1 = lunes ... 7 = domingo).
+CREATE OR REPLACE FUNCTION get_slot_utilisation(start_date DATE, end_date DATE)
+RETURNS TABLE (weekday INTEGER, time_slot VARCHAR, sessions BIGINT, attended BIGINT, avg_attended NUMERIC)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT extract(isodow FROM r.reservation_date)::int, r.time_slot, count(DISTINCT r.id),
+           count(aa.id) FILTER (WHERE aa.attended),
+           round(count(aa.id) FILTER (WHERE aa.attended)::numeric / nullif(count(DISTINCT r.id), 0), 1)
+    FROM gym_reservations r
+    LEFT JOIN agent_activities aa ON aa.gym_reservation_id = r.id
+    WHERE r.reservation_date BETWEEN start_date AND end_date
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+$$;
+
+-- Detalle de asistencia aplanado para la exportación paginada (clave: reservation_date, attendance_id).
+CREATE OR REPLACE VIEW attendance_export AS
+SELECT aa.id AS attendance_id, r.reservation_date, r.time_slot, act.name AS activity,
+       m.name || ' ' || m.surname AS monitor, ag.nip, ag.name, ag.surname, ag.section, ag.grupo, aa.attended
+FROM agent_activities aa
+JOIN gym_reservations r ON r.id = aa.gym_reservation_id
+JOIN activities act ON act.id = r.activity_id
+JOIN agents m ON m.id = r.monitor_id
+JOIN agents ag ON ag.id = aa.agent_id;
@@ -0,0 +1,21 @@
+-- database/migrations/0005_hot_query_indexes.sql
+-- Índices para las columnas por las que filtran y ordenan las páginas.
+-- benchmarks/explain_check.py comprueba que las consultas de la app los usan.
+
+-- Listado paginado, calendario y analítica: rango de fechas con el orden de la paginación
+-- por clave (reservation_date, time_slot, id).
+CREATE INDEX IF NOT EXISTS gym_reservations_date_slot_idx ON gym_reservations (reservation_date, time_slot, id);
+
+-- Disponibilidad de un monitor: sus reservas en un rango de fechas.
+CREATE INDEX IF NOT EXISTS gym_reservations_monitor_date_idx ON gym_reservations (monitor_id, reservation_date);
+
+-- Últimas reservas del panel de control.
+CREATE INDEX IF NOT EXISTS gym_reservations_created_at_idx ON gym_reservations (created_at DESC);
+
+-- Asistentes de una reserva (lista de asistencia, conteos embebidos, agregados y exportación).
+-- La restricción UNIQUE (agent_id, gym_reservation_id) no sirve aquí porque empieza por agent_id.
+CREATE INDEX IF NOT EXISTS agent_activities_reservation_idx ON agent_activities (gym_reservation_id);
+
+-- Selectores de monitor: muy pocos agentes son monitores, así que basta un índice parcial
+-- en el orden de los listados.
+CREATE INDEX IF NOT EXISTS agents_monitors_idx ON agents (surname, name, id) WHERE is_monitor;
@@ -0,0 +1,49 @@
+-- database/migrations/0006_change_tracking.sql
+-- Marcas de cambio para la réplica local (database/replica.py). Cada fila guarda cuándo se
+-- modificó por última vez y los borrados quedan registrados, así la réplica se sincroniza
+-- de forma incremental con un cursor (updated_at, id) en lugar de releer las tablas.
+
+ALTER TABLE activities ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE agents ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE gym_reservations ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+CREATE INDEX IF NOT EXISTS activities_updated_at_idx ON activities (updated_at, id);
+CREATE INDEX IF NOT EXISTS agents_updated_at_idx ON agents (updated_at, id);
+CREATE INDEX IF NOT EXISTS gym_reservations_updated_at_idx ON gym_reservations (updated_at, id);
+
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER activities_touch_updated_at BEFORE UPDATE ON activities FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER agents_touch_updated_at BEFORE UPDATE ON agents FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER gym_reservations_touch_updated_at BEFORE UPDATE ON gym_reservations FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- Borrados de las tablas replicadas (la réplica los aplica con su propio cursor (deleted_at, id))
+CREATE TABLE IF NOT EXISTS row_deletions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    table_name TEXT NOT NULL,
+    row_id UUID NOT NULL,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS row_deletions_deleted_at_idx ON row_deletions (deleted_at, id);
+
+CREATE OR REPLACE FUNCTION record_row_deletion()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO row_deletions (table_name, row_id) VALUES (TG_TABLE_NAME, OLD.id);
+    RETURN OLD;
+END;
+$$;
+
+CREATE TRIGGER activities_record_deletion AFTER DELETE ON activities FOR EACH ROW EXECUTE FUNCTION record_row_deletion();
+CREATE TRIGGER agents_record_deletion AFTER DELETE ON agents FOR EACH ROW EXECUTE FUNCTION record_row_deletion();
+CREATE TRIGGER gym_reservations_record_deletion AFTER DELETE ON gym_reservations FOR EACH ROW EXECUTE FUNCTION record_row_deletion();
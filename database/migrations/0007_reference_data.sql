@@ -0,0 +1,40 @@
+-- database/migrations/0007_reference_data.sql
+-- Secciones y grupos pasan a la base de datos (utils/constants.py queda como respaldo) y los
+-- datos de referencia de los formularios se cargan en una sola llamada al arrancar.
+
+CREATE TABLE IF NOT EXISTS sections (
+    name VARCHAR(255) PRIMARY KEY,
+    position INTEGER NOT NULL DEFAULT 0 -- Orden en los selectores
+);
+
+CREATE TABLE IF NOT EXISTS groups (
+    name VARCHAR(10) PRIMARY KEY,
+    position INTEGER NOT NULL DEFAULT 0 -- Orden en los selectores
+);
+
+INSERT INTO sections (name, position) VALUES ('Motorista', 1), ('Patrullas', 2), ('GOA', 3), ('Atestados', 4)
+ON CONFLICT (name) DO NOTHING;
+INSERT INTO groups (name, position) VALUES ('G-1', 1), ('G-2', 2), ('G-3', 3)
+ON CONFLICT (name) DO NOTHING;
+
+-- Datos de referencia en una sola llamada (supabase_client.rpc("get_reference_data")):
+-- actividades, monitores, secciones y grupos, ya ordenados para los selectores.
+CREATE OR REPLACE FUNCTION get_reference_data()
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'activities', (
+            SELECT coalesce(json_agg(json_build_object('id', id, 'name', name) ORDER BY name), '[]'::json)
+            FROM activities
+        ),
+        'monitors', (
+            SELECT coalesce(json_agg(json_build_object('id', id, 'nip', nip, 'name', name, 'surname', surname) ORDER BY surname, name, id), '[]'::json)
+            FROM agents
+            WHERE is_monitor
+        ),
+        'sections', (SELECT coalesce(json_agg(name ORDER BY position, name), '[]'::json) FROM sections),
+        'groups', (SELECT coalesce(json_agg(name ORDER BY position, name), '[]'::json) FROM groups)
+    );
+$$;
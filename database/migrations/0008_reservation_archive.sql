@@ -0,0 +1,253 @@
+-- database/migrations/0008_reservation_archive.sql
+-- Reservas antiguas (y su asistencia) en tablas de archivo: las tablas "calientes" solo guardan
+-- los últimos meses, así que listados, conteos y joins no crecen con el histórico. Un trabajo
+-- mensual de pg_cron mueve los meses que salen de la ventana. Los informes pueden incluir el
+-- histórico de forma explícita (parámetro include_history y vistas *_all).
+
+-- Mismas columnas y en el mismo orden que las tablas calientes (un ALTER TABLE futuro debe aplicarse a ambas),
+-- con las mismas claves: la UNIQUE de cada tabla se mantiene en el archivo
+CREATE TABLE IF NOT EXISTS gym_reservations_archive (LIKE gym_reservations INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+ALTER TABLE gym_reservations_archive ADD PRIMARY KEY (id);
+ALTER TABLE gym_reservations_archive ADD UNIQUE (reservation_date, time_slot, monitor_id);
+ALTER TABLE gym_reservations_archive ADD FOREIGN KEY (activity_id) REFERENCES activities(id);
+ALTER TABLE gym_reservations_archive ADD FOREIGN KEY (monitor_id) REFERENCES agents(id);
+CREATE INDEX IF NOT EXISTS gym_reservations_archive_date_idx ON gym_reservations_archive (reservation_date, time_slot, id);
+
+CREATE TABLE IF NOT EXISTS agent_activities_archive (LIKE agent_activities INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+ALTER TABLE agent_activities_archive ADD PRIMARY KEY (id);
+ALTER TABLE agent_activities_archive ADD UNIQUE (agent_id, gym_reservation_id);
+ALTER TABLE agent_activities_archive ADD FOREIGN KEY (agent_id) REFERENCES agents(id);
+ALTER TABLE agent_activities_archive ADD FOREIGN KEY (gym_reservation_id) REFERENCES gym_reservations_archive(id);
+CREATE INDEX IF NOT EXISTS agent_activities_archive_reservation_idx ON agent_activities_archive (gym_reservation_id);
+
+-- El archivo solo lo escribe archive_old_reservations (como propietario, sin RLS). Los clientes lo
+-- leen con las mismas políticas de lectura que las tablas calientes; si estas no tienen RLS, el
+-- archivo es legible para los mismos roles pero nunca escribible.
+ALTER TABLE gym_reservations_archive ENABLE ROW LEVEL SECURITY;
+ALTER TABLE agent_activities_archive ENABLE ROW LEVEL SECURITY;
+DO $$
+DECLARE
+    hot_table TEXT;
+    policy RECORD;
+BEGIN
+    FOREACH hot_table IN ARRAY ARRAY['gym_reservations', 'agent_activities'] LOOP
+        IF (SELECT relrowsecurity FROM pg_class WHERE oid = ('public.' || hot_table)::regclass) THEN
+            FOR policy IN
+                SELECT policyname, roles, qual FROM pg_policies
+                WHERE schemaname = 'public' AND tablename = hot_table AND cmd IN ('SELECT', 'ALL') AND permissive = 'PERMISSIVE'
+            LOOP
+                EXECUTE format('CREATE POLICY %I ON %I FOR SELECT TO %s USING (%s)',
+                               policy.policyname, hot_table || '_archive',
+                               (SELECT string_agg(quote_ident(r), ', ') FROM unnest(policy.roles) r),
+                               coalesce(policy.qual, 'true'));
+            END LOOP;
+        ELSE
+            EXECUTE format('CREATE POLICY %I ON %I FOR SELECT USING (true)', hot_table || '_archive_read', hot_table || '_archive');
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- Una reserva nueva en caliente no puede repetir la clave (fecha, turno, monitor) de una archivada.
+-- SECURITY DEFINER: la comprobación ve el archivo aunque las políticas de quien reserva no lo permitan.
+CREATE OR REPLACE FUNCTION reject_archived_duplicate()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM gym_reservations_archive a
+        WHERE a.reservation_date = NEW.reservation_date AND a.time_slot = NEW.time_slot AND a.monitor_id = NEW.monitor_id
+    ) THEN
+        RAISE EXCEPTION 'duplicate key value violates unique constraint on gym_reservations_archive (reservation_date, time_slot, monitor_id)'
+            USING ERRCODE = 'unique_violation';
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS gym_reservations_reject_archived_duplicate ON gym_reservations;
+CREATE TRIGGER gym_reservations_reject_archived_duplicate
+BEFORE INSERT OR UPDATE OF reservation_date, time_slot, monitor_id ON gym_reservations
+FOR EACH ROW EXECUTE FUNCTION reject_archived_duplicate();
+
+-- Todo el histórico (caliente + archivo), para los informes que lo piden explícitamente.
+-- security_invoker: la vista aplica las políticas RLS de quien consulta, no las de su propietario.
+CREATE OR REPLACE VIEW gym_reservations_all WITH (security_invoker = true) AS
+SELECT * FROM gym_reservations
+UNION ALL
+SELECT * FROM gym_reservations_archive;
+
+CREATE OR REPLACE VIEW agent_activities_all WITH (security_invoker = true) AS
+SELECT * FROM agent_activities
+UNION ALL
+SELECT * FROM agent_activities_archive;
+
+-- Los borrados del archivado no se anotan en row_deletions: quedan fuera de la ventana de la réplica local
+CREATE OR REPLACE FUNCTION record_row_deletion()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF current_setting('gymapp.archiving', true) = 'on' THEN
+        RETURN OLD;
+    END IF;
+    INSERT INTO row_deletions (table_name, row_id) VALUES (TG_TABLE_NAME, OLD.id);
+    RETURN OLD;
+END;
+$$;
+
+-- Mueve al archivo las reservas anteriores al mes de hace `older_than_months` meses, con su
+-- asistencia, en una sola transacción. Solo se borran de las tablas calientes las filas que se
+-- han insertado en el archivo: una reserva que no se puede archivar (clave ya archivada) se queda
+-- en caliente con toda su asistencia. Retorna el número de reservas movidas.
+-- utils/constants.py (ARCHIVE_AFTER_MONTHS) debe coincidir con el valor programado abajo.
+CREATE OR REPLACE FUNCTION archive_old_reservations(older_than_months INTEGER DEFAULT 12)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    cutoff DATE := (date_trunc('month', current_date) - make_interval(months => older_than_months))::date;
+    archived_ids UUID[]; -- Reservas insertadas en el archivo
+    attendance_ids UUID[]; -- Asistencia insertada en el archivo
+    incomplete_ids UUID[]; -- Reservas con asistencia que no se pudo archivar
+    moved INTEGER;
+BEGIN
+    PERFORM set_config('gymapp.archiving', 'on', true); -- Solo para esta transacción
+
+    WITH inserted AS (
+        INSERT INTO gym_reservations_archive
+        SELECT * FROM gym_reservations WHERE reservation_date < cutoff
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    )
+    SELECT coalesce(array_agg(id), '{}') INTO archived_ids FROM inserted;
+
+    WITH inserted AS (
+        INSERT INTO agent_activities_archive
+        SELECT * FROM agent_activities WHERE gym_reservation_id = ANY(archived_ids)
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    )
+    SELECT coalesce(array_agg(id), '{}') INTO attendance_ids FROM inserted;
+
+    -- Una reserva solo sale de las tablas calientes si toda su asistencia se ha archivado
+    SELECT coalesce(array_agg(DISTINCT gym_reservation_id), '{}') INTO incomplete_ids
+    FROM agent_activities WHERE gym_reservation_id = ANY(archived_ids) AND NOT id = ANY(attendance_ids);
+    IF cardinality(incomplete_ids) > 0 THEN
+        DELETE FROM agent_activities_archive WHERE gym_reservation_id = ANY(incomplete_ids);
+        DELETE FROM gym_reservations_archive WHERE id = ANY(incomplete_ids);
+    END IF;
+
+    DELETE FROM agent_activities WHERE id = ANY(attendance_ids) AND NOT gym_reservation_id = ANY(incomplete_ids);
+    DELETE FROM gym_reservations WHERE id = ANY(archived_ids) AND NOT id = ANY(incomplete_ids);
+    GET DIAGNOSTICS moved = ROW_COUNT;
+    RETURN moved;
+END;
+$$;
+
+-- Trabajo mensual (día 1, 03:30) si pg_cron está disponible (en Supabase: Database -> Extensions).
+-- Sin pg_cron, programar `SELECT archive_old_reservations();` por otros medios.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_cron') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_cron;
+        PERFORM cron.schedule('archive-old-reservations', '30 3 1 * *', 'SELECT archive_old_reservations(12)');
+    ELSE
+        RAISE NOTICE 'pg_cron no está disponible: archive_old_reservations() no queda programado';
+    END IF;
+END;
+$$;
+
+-- Analítica: por defecto solo las tablas calientes; include_history añade el archivo.
+-- Se eliminan las versiones de dos parámetros para que PostgREST no vea sobrecargas ambiguas.
+DROP FUNCTION IF EXISTS get_usage_by_month(DATE, DATE);
+DROP FUNCTION IF EXISTS get_monitor_load(DATE, DATE);
+DROP FUNCTION IF EXISTS get_slot_utilisation(DATE, DATE);
+
+-- La asistencia caliente se une a las reservas calientes y la archivada a las archivadas, cada
+-- una filtrada por fecha con su índice: con include_history el archivo solo se lee en el rango.
+CREATE OR REPLACE FUNCTION get_usage_by_month(start_date DATE, end_date DATE, include_history BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (
+    month DATE, section VARCHAR, grupo VARCHAR, activity VARCHAR,
+    sessions BIGINT, enrolled BIGINT, attended BIGINT, attendance_rate NUMERIC
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT date_trunc('month', x.reservation_date)::date, ag.section, ag.grupo, act.name,
+           count(DISTINCT x.reservation_id), count(*), count(*) FILTER (WHERE x.attended),
+           round(100.0 * count(*) FILTER (WHERE x.attended) / nullif(count(*), 0), 1)
+    FROM (
+        SELECT r.id AS reservation_id, r.reservation_date, r.activity_id, aa.agent_id, aa.attended
+        FROM gym_reservations r
+        JOIN agent_activities aa ON aa.gym_reservation_id = r.id
+        WHERE r.reservation_date BETWEEN start_date AND end_date
+        UNION ALL
+        SELECT r.id, r.reservation_date, r.activity_id, aa.agent_id, aa.attended
+        FROM gym_reservations_archive r
+        JOIN agent_activities_archive aa ON aa.gym_reservation_id = r.id
+        WHERE include_history AND r.reservation_date BETWEEN start_date AND end_date
+    ) x
+    JOIN agents ag ON ag.id = x.agent_id
+    JOIN activities act ON act.id = x.activity_id
+    GROUP BY 1, 2, 3, 4
+    ORDER BY 1, 2, 3, 4;
+$$;
+
+CREATE OR REPLACE FUNCTION get_monitor_load(start_date DATE, end_date DATE, include_history BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (monitor_id UUID, monitor VARCHAR, sessions BIGINT, enrolled BIGINT, attended BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT m.id, (m.name || ' ' || m.surname)::varchar, count(DISTINCT x.reservation_id), count(x.attendance_id), count(x.attendance_id) FILTER (WHERE x.attended)
+    FROM (
+        SELECT r.id AS reservation_id, r.monitor_id, aa.id AS attendance_id, aa.attended
+        FROM gym_reservations r
+        LEFT JOIN agent_activities aa ON aa.gym_reservation_id = r.id
+        WHERE r.reservation_date BETWEEN start_date AND end_date
+        UNION ALL
+        SELECT r.id, r.monitor_id, aa.id, aa.attended
+        FROM gym_reservations_archive r
+        LEFT JOIN agent_activities_archive aa ON aa.gym_reservation_id = r.id
+        WHERE include_history AND r.reservation_date BETWEEN start_date AND end_date
+    ) x
+    JOIN agents m ON m.id = x.monitor_id
+    GROUP BY m.id, m.name, m.surname
+    ORDER BY 3 DESC, 2;
+$$;
+
+CREATE OR REPLACE FUNCTION get_slot_utilisation(start_date DATE, end_date DATE, include_history BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (weekday INTEGER, time_slot VARCHAR, sessions BIGINT, attended BIGINT, avg_attended NUMERIC)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT extract(isodow FROM x.reservation_date)::int, x.time_slot, count(DISTINCT x.reservation_id),
+           count(x.attendance_id) FILTER (WHERE x.attended),
+           round(count(x.attendance_id) FILTER (WHERE x.attended)::numeric / nullif(count(DISTINCT x.reservation_id), 0), 1)
+    FROM (
+        SELECT r.id AS reservation_id, r.reservation_date, r.time_slot, aa.id AS attendance_id, aa.attended
+        FROM gym_reservations r
+        LEFT JOIN agent_activities aa ON aa.gym_reservation_id = r.id
+        WHERE r.reservation_date BETWEEN start_date AND end_date
+        UNION ALL
+        SELECT r.id, r.reservation_date, r.time_slot, aa.id, aa.attended
+        FROM gym_reservations_archive r
+        LEFT JOIN agent_activities_archive aa ON aa.gym_reservation_id = r.id
+        WHERE include_history AND r.reservation_date BETWEEN start_date AND end_date
+    ) x
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+$$;
+
+-- Exportación con histórico: misma forma que attendance_export (que sigue leyendo solo las tablas calientes).
+CREATE OR REPLACE VIEW attendance_export_all WITH (security_invoker = true) AS
+SELECT aa.id AS attendance_id, r.reservation_date, r.time_slot, act.name AS activity,
+       m.name || ' ' || m.surname AS monitor, ag.nip, ag.name, ag.surname, ag.section, ag.grupo, aa.attended
+FROM agent_activities_all aa
+JOIN gym_reservations_all r ON r.id = aa.gym_reservation_id
+JOIN activities act ON act.id = r.activity_id
+JOIN agents m ON m.id = r.monitor_id
+JOIN agents ag ON ag.id = aa.agent_id;
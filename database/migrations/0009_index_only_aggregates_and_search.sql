@@ -0,0 +1,148 @@
+-- database/migrations/0009_index_only_aggregates_and_search.sql
+-- Los agregados de analítica dejaban que el planificador uniera toda la asistencia caliente con
+-- las reservas del periodo (Seq Scan de agent_activities, que crece con la ventana caliente).
+-- Ahora cuentan la asistencia de cada reserva del periodo en una subconsulta LATERAL que se lee
+-- solo desde un índice que la cubre, así que el coste depende del periodo y no de la tabla.
+-- Y la búsqueda de agentes separa la consulta sin texto de la que filtra por NIP o nombre.
+
+-- Asistentes de una reserva con las columnas de los agregados y la exportación. Empieza por la
+-- misma columna que agent_activities_reservation_idx (0005), así que lo sustituye.
+CREATE INDEX IF NOT EXISTS agent_activities_reservation_covering_idx ON agent_activities (gym_reservation_id) INCLUDE (agent_id, attended, id);
+DROP INDEX IF EXISTS agent_activities_reservation_idx;
+
+-- Mismas firmas y resultados que en 0008. Cada reserva aporta una fila con sus conteos (una por
+-- sección y grupo en el uso mensual), así que las sesiones son count(*) en lugar de count(DISTINCT).
+CREATE OR REPLACE FUNCTION get_usage_by_month(start_date DATE, end_date DATE, include_history BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (
+    month DATE, section VARCHAR, grupo VARCHAR, activity VARCHAR,
+    sessions BIGINT, enrolled BIGINT, attended BIGINT, attendance_rate NUMERIC
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT date_trunc('month', x.reservation_date)::date, x.section, x.grupo, act.name,
+           count(*), sum(x.enrolled)::bigint, sum(x.attended)::bigint,
+           round(100.0 * sum(x.attended) / nullif(sum(x.enrolled), 0), 1)
+    FROM (
+        SELECT r.reservation_date, r.activity_id, c.section, c.grupo, c.enrolled, c.attended
+        FROM gym_reservations r
+        CROSS JOIN LATERAL (
+            SELECT ag.section, ag.grupo, count(*) AS enrolled, count(*) FILTER (WHERE aa.attended) AS attended
+            FROM agent_activities aa
+            JOIN agents ag ON ag.id = aa.agent_id
+            WHERE aa.gym_reservation_id = r.id
+            GROUP BY ag.section, ag.grupo
+        ) c
+        WHERE r.reservation_date BETWEEN start_date AND end_date
+        UNION ALL
+        SELECT r.reservation_date, r.activity_id, c.section, c.grupo, c.enrolled, c.attended
+        FROM gym_reservations_archive r
+        CROSS JOIN LATERAL (
+            SELECT ag.section, ag.grupo, count(*) AS enrolled, count(*) FILTER (WHERE aa.attended) AS attended
+            FROM agent_activities_archive aa
+            JOIN agents ag ON ag.id = aa.agent_id
+            WHERE aa.gym_reservation_id = r.id
+            GROUP BY ag.section, ag.grupo
+        ) c
+        WHERE include_history AND r.reservation_date BETWEEN start_date AND end_date
+    ) x
+    JOIN activities act ON act.id = x.activity_id
+    GROUP BY 1, 2, 3, 4
+    ORDER BY 1, 2, 3, 4;
+$$;
+
+-- Sin GROUP BY, la subconsulta da una fila también para las reservas sin inscritos (como el LEFT JOIN de 0008)
+CREATE OR REPLACE FUNCTION get_monitor_load(start_date DATE, end_date DATE, include_history BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (monitor_id UUID, monitor VARCHAR, sessions BIGINT, enrolled BIGINT, attended BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT m.id, (m.name || ' ' || m.surname)::varchar, count(*), sum(x.enrolled)::bigint, sum(x.attended)::bigint
+    FROM (
+        SELECT r.monitor_id, c.enrolled, c.attended
+        FROM gym_reservations r
+        CROSS JOIN LATERAL (
+            SELECT count(*) AS enrolled, count(*) FILTER (WHERE aa.attended) AS attended
+            FROM agent_activities aa WHERE aa.gym_reservation_id = r.id
+        ) c
+        WHERE r.reservation_date BETWEEN start_date AND end_date
+        UNION ALL
+        SELECT r.monitor_id, c.enrolled, c.attended
+        FROM gym_reservations_archive r
+        CROSS JOIN LATERAL (
+            SELECT count(*) AS enrolled, count(*) FILTER (WHERE aa.attended) AS attended
+            FROM agent_activities_archive aa WHERE aa.gym_reservation_id = r.id
+        ) c
+        WHERE include_history AND r.reservation_date BETWEEN start_date AND end_date
+    ) x
+    JOIN agents m ON m.id = x.monitor_id
+    GROUP BY m.id, m.name, m.surname
+    ORDER BY 3 DESC, 2;
+$$;
+
+CREATE OR REPLACE FUNCTION get_slot_utilisation(start_date DATE, end_date DATE, include_history BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (weekday INTEGER, time_slot VARCHAR, sessions BIGINT, attended BIGINT, avg_attended NUMERIC)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT extract(isodow FROM x.reservation_date)::int, x.time_slot, count(*), sum(x.attended)::bigint,
+           round(sum(x.attended)::numeric / nullif(count(*), 0), 1)
+    FROM (
+        SELECT r.reservation_date, r.time_slot, c.attended
+        FROM gym_reservations r
+        CROSS JOIN LATERAL (
+            SELECT count(*) FILTER (WHERE aa.attended) AS attended
+            FROM agent_activities aa WHERE aa.gym_reservation_id = r.id
+        ) c
+        WHERE r.reservation_date BETWEEN start_date AND end_date
+        UNION ALL
+        SELECT r.reservation_date, r.time_slot, c.attended
+        FROM gym_reservations_archive r
+        CROSS JOIN LATERAL (
+            SELECT count(*) FILTER (WHERE aa.attended) AS attended
+            FROM agent_activities_archive aa WHERE aa.gym_reservation_id = r.id
+        ) c
+        WHERE include_history AND r.reservation_date BETWEEN start_date AND end_date
+    ) x
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+$$;
+
+-- Misma firma y resultado que en 0003, salvo que los nombres solo se buscan a partir de 3
+-- caracteres (el mínimo de un trigrama de pg_trgm): con menos, solo se busca el prefijo de NIP.
+-- Cada rama tiene un predicado que puede usar su índice, en lugar de un único OR con
+-- coalesce(search_query, '') = '' que obliga a recorrer la tabla entera.
+CREATE OR REPLACE FUNCTION search_agents(
+    search_query TEXT DEFAULT NULL,
+    agent_section TEXT DEFAULT NULL,
+    agent_grupo TEXT DEFAULT NULL,
+    only_monitors BOOLEAN DEFAULT FALSE,
+    page_size INTEGER DEFAULT 25,
+    page_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+    id UUID, nip VARCHAR, name VARCHAR, surname VARCHAR, section VARCHAR, grupo VARCHAR,
+    email VARCHAR, is_monitor BOOLEAN, total_count BIGINT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT a.id, a.nip, a.name, a.surname, a.section, a.grupo, a.email, a.is_monitor, count(*) OVER () AS total_count
+    FROM (
+        -- Sin texto: solo los filtros
+        SELECT * FROM agents WHERE coalesce(search_query, '') = ''
+        UNION ALL
+        -- 1 o 2 caracteres: prefijo de NIP (agents_nip_prefix_idx)
+        SELECT * FROM agents WHERE length(search_query) BETWEEN 1 AND 2 AND agents.nip LIKE search_query || '%'
+        UNION ALL
+        -- 3 o más: prefijo de NIP o subcadena de "nombre apellidos" (agents_full_name_trgm_idx)
+        SELECT * FROM agents WHERE length(search_query) >= 3
+           AND (agents.nip LIKE search_query || '%'
+                OR lower(agents.name || ' ' || agents.surname) LIKE '%' || lower(search_query) || '%')
+    ) a
+    WHERE (agent_section IS NULL OR a.section = agent_section)
+      AND (agent_grupo IS NULL OR a.grupo = agent_grupo)
+      AND (NOT only_monitors OR a.is_monitor)
+    ORDER BY a.surname, a.name, a.id
+    LIMIT page_size OFFSET page_offset;
+$$;
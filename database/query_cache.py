@@ -0,0 +1,151 @@
+# database/query_cache.py
+import functools
+import threading
+import time
+from collections import OrderedDict
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from database.instrumentation import record_cache_event
+
+
+class QueryCache:
+    """
+    Cache de consultas compartida por todo el proceso.
+    Cada entrada se indexa por la función y sus parámetros, y recuerda la versión de
+    cada tabla de la que depende. Una escritura incrementa la versión de las tablas
+    afectadas, de modo que solo se descartan las entradas que dependen de ellas.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # clave -> (versiones, expira, valor); orden LRU
+        self._versions = {} # tabla -> contador de versión
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._event_source_alive = None # Función: mientras retorne True, las entradas de `_event_tables` solo caducan por cambios
+        self._event_tables = frozenset() # Tablas cuyos cambios llegan en tiempo real
+
+    def _snapshot(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def get(self, key, tables):
+        """Retorna (True, valor) si hay una entrada vigente para `key`, o (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                versions, expires_at, value = entry
+                if versions == self._snapshot(tables) and (self._is_event_driven(tables) or expires_at is None or expires_at > time.monotonic()):
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return True, value
+                del self._entries[key] # Entrada obsoleta (tabla modificada o TTL vencido)
+                self._stats["evictions"] += 1
+            self._stats["misses"] += 1
+            return False, None
+
+    def set(self, key, tables, value, ttl=None, versions=None):
+        """
+        Guarda `value` para `key`. `versions` son las versiones de las tablas leídas antes
+        de ejecutar la consulta: si una escritura ocurrió entretanto, la entrada nace obsoleta.
+        """
+        with self._lock:
+            if versions is None:
+                versions = self._snapshot(tables)
+            expires_at = time.monotonic() + ttl if ttl else None
+            self._entries[key] = (versions, expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def versions(self, tables):
+        """Versiones actuales de las tablas indicadas."""
+        with self._lock:
+            return self._snapshot(tables)
+
+    def invalidate(self, *tables):
+        """Marca como obsoletas todas las entradas que dependen de alguna de las tablas."""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def set_event_driven(self, source_alive, tables=()):
+        """
+        Activa el modo dirigido por eventos para `tables`: con una fuente de cambios en tiempo
+        real que las invalida, el TTL deja de aplicarse a las entradas que solo dependen de
+        ellas. Las que leen alguna otra tabla (sin eventos) siguen caducando por TTL.
+        `source_alive` es una función que indica si la fuente sigue viva: en cuanto retorna
+        False vuelve a aplicarse el TTL. None desactiva el modo.
+        """
+        with self._lock:
+            self._event_source_alive = source_alive
+            self._event_tables = frozenset(tables)
+
+    def _is_event_driven(self, tables):
+        return (
+            self._event_source_alive is not None
+            and self._event_tables.issuperset(tables)
+            and self._event_source_alive()
+        )
+
+    def clear(self):
+        """Vacía la cache por completo (no reinicia las estadísticas)."""
+        with self._lock:
+            self._stats["evictions"] += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """Retorna un diccionario con aciertos, fallos, descartes y entradas actuales."""
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "versions": dict(self._versions)}
+
+
+query_cache = QueryCache() # Instancia global compartida por todas las sesiones
+
+
+def _cache_scope():
+    """
+    Usuario de la sesión actual, para separar en la cache los resultados filtrados por RLS:
+    cada sesión consulta con el JWT de su usuario. Sin sesión se usa "anon"; los hilos sin
+    contexto de Streamlit (sincronización, tiempo real) usan "background".
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return "background"
+    session = st.session_state.get("supabase_session")
+    user = getattr(session, "user", None)
+    return getattr(user, "id", None) or "anon"
+
+
+def cached_query(*tables, ttl=60, shared=False):
+    """
+    Decorador que cachea el resultado de una función de consulta en `query_cache`.
+    `tables` son las tablas de las que depende el resultado; la clave incluye el
+    fichero y nombre de la función, así que dos páginas con funciones homónimas no
+    comparten entradas. Los argumentos deben ser hashables.
+    Por defecto la clave incluye el usuario de la sesión, porque las políticas RLS pueden
+    devolver filas distintas a cada uno. `shared=True` comparte la entrada entre todas las
+    sesiones: solo para datos que cualquier usuario puede leer (p. ej. los de referencia).
+    """
+    def decorator(func):
+        func_id = (func.__code__.co_filename, func.__qualname__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            scope = None if shared else _cache_scope()
+            key = (func_id, scope, args, tuple(sorted(kwargs.items())))
+            found, value = query_cache.get(key, tables)
+            record_cache_event(func.__qualname__, tables, found)
+            if found:
+                return value
+            versions = query_cache.versions(tables)
+            value = func(*args, **kwargs)
+            query_cache.set(key, tables, value, ttl=ttl, versions=versions)
+            return value
+
+        return wrapper
+    return decorator
+
+
+def invalidate_tables(*tables):
+    """Invalida las consultas cacheadas que dependen de las tablas modificadas."""
+    query_cache.invalidate(*tables)
@@ -0,0 +1,352 @@
+# database/realtime.py
+import asyncio
+import datetime
+import logging
+import queue
+import threading
+import time
+import streamlit as st
+from database.query_cache import query_cache, invalidate_tables
+from database.supabase_client import get_service_client
+
+LIVE_TABLES = ("activities", "agents", "gym_reservations", "agent_activities")
+HOT_WINDOW_DAYS = 35 # Días hacia atrás de reservas (y su asistencia) que se mantienen en memoria
+SNAPSHOT_PAGE_SIZE = 1000 # Filas por petición al cargar la instantánea inicial (límite por defecto de PostgREST)
+RETRY_AFTER_SECONDS = 60 # Tras un fallo al arrancar (o si la suscripción se cae), espera antes de reintentar
+SUBSCRIBE_TIMEOUT = 10 # Segundos de espera a que el canal de Realtime quede suscrito
+
+logger = logging.getLogger(__name__)
+
+
+class LiveStore:
+    """
+    Copia en memoria de las tablas de la app, compartida por todo el proceso y actualizada
+    fila a fila con los cambios de Postgres (INSERT/UPDATE/DELETE).
+    Solo guarda las reservas desde `hot_since` y la asistencia de esas reservas.
+    Cada cambio aplicado invalida en `query_cache` las consultas de la tabla afectada.
+    """
+
+    def __init__(self, hot_since):
+        self.hot_since = hot_since # Fecha YYYY-MM-DD
+        self.events_applied = 0
+        self.last_event_at = None
+        self._tables = {table: {} for table in LIVE_TABLES}
+        self._attendance = {} # id de reserva -> ids de agent_activities
+        self._pending = [] # Cambios recibidos antes de terminar la instantánea inicial
+        self._ready = threading.Event()
+        self._source = None # Fuente de cambios: sin ella viva, los datos en memoria dejan de estar al día
+        self._lock = threading.RLock()
+
+    # --- Carga inicial y aplicación de cambios ---
+    def load_snapshot(self, client):
+        """Carga la instantánea inicial paginando cada tabla y aplica los cambios recibidos mientras tanto."""
+        from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+        snapshot = {}
+        for table in LIVE_TABLES:
+            query_columns, filter_column = "*", None
+            if table == "gym_reservations":
+                filter_column = "reservation_date"
+            elif table == "agent_activities":
+                query_columns, filter_column = "*, gym_reservations!inner(reservation_date)", "gym_reservations.reservation_date"
+            snapshot[table] = []
+            start = 0
+            while True:
+                query = client.table(table).select(query_columns)
+                if filter_column:
+                    query = query.gte(filter_column, self.hot_since)
+                try:
+                    response = query.order("id").range(start, start + SNAPSHOT_PAGE_SIZE - 1).execute()
+                except APIError as e:
+                    raise RuntimeError(f"Error al cargar {table}: {e.message}") from e
+                for row in response.data:
+                    row.pop("gym_reservations", None)
+                    snapshot[table].append(row)
+                if len(response.data) < SNAPSHOT_PAGE_SIZE:
+                    break
+                start += SNAPSHOT_PAGE_SIZE
+
+        with self._lock:
+            for table, rows in snapshot.items():
+                for row in rows:
+                    self._upsert(table, row)
+            for event in self._pending:
+                self._apply(event)
+            self._pending.clear()
+            self._ready.set()
+
+    def handle_event(self, event):
+        """
+        Recibe un cambio normalizado {"table", "type", "new", "old"} desde la fuente de eventos.
+        Antes de tener la instantánea inicial, los cambios se guardan para aplicarlos después.
+        """
+        with self._lock:
+            if not self._ready.is_set():
+                self._pending.append(event)
+                return
+            self._apply(event)
+        invalidate_tables(event["table"])
+
+    def attach_source(self, source):
+        self._source = source
+
+    def handle_source_exit(self):
+        """La fuente de cambios ha terminado: las lecturas vuelven a la base de datos."""
+        logger.warning("La suscripción en tiempo real ha terminado; se vuelve a leer de la base de datos")
+        invalidate_tables(*LIVE_TABLES) # Lo cacheado mientras no había TTL puede estar desfasado
+
+    def _apply(self, event):
+        table = event["table"]
+        if table not in self._tables:
+            return
+        if event["type"] == "DELETE":
+            self._remove(table, (event.get("old") or {}).get("id"))
+        else:
+            self._upsert(table, event["new"])
+        self.events_applied += 1
+        self.last_event_at = time.time()
+
+    def _upsert(self, table, row):
+        if table == "gym_reservations" and row["reservation_date"] < self.hot_since:
+            self._remove(table, row["id"]) # La reserva sale de la ventana en memoria
+            return
+        if table == "agent_activities":
+            if row["gym_reservation_id"] not in self._tables["gym_reservations"]:
+                return # Asistencia de una reserva fuera de la ventana
+            previous = self._tables[table].get(row["id"])
+            if previous is not None:
+                self._attendance.get(previous["gym_reservation_id"], set()).discard(row["id"])
+            self._attendance.setdefault(row["gym_reservation_id"], set()).add(row["id"])
+        self._tables[table][row["id"]] = dict(row)
+
+    def _remove(self, table, row_id):
+        row = self._tables[table].pop(row_id, None) # Se busca por id: los DELETE solo traen la clave primaria
+        if row is not None and table == "agent_activities":
+            self._attendance.get(row["gym_reservation_id"], set()).discard(row_id)
+
+    # --- Lecturas ---
+    def is_ready(self):
+        """Instantánea cargada y fuente de cambios viva (si no, la copia en memoria puede estar desfasada)."""
+        return self._ready.is_set() and (self._source is None or self._source.is_alive())
+
+    def covers(self, start_date):
+        """Indica si las reservas desde `start_date` (YYYY-MM-DD) están en memoria."""
+        return self.is_ready() and start_date >= self.hot_since
+
+    def rows(self, table, predicate=None):
+        """Copia de las filas de `table` que cumplen `predicate`."""
+        with self._lock:
+            return [dict(row) for row in self._tables[table].values() if predicate is None or predicate(row)]
+
+    def reservations_in_range(self, start_date, end_date):
+        """
+        Reservas en [start_date, end_date] con la misma forma que la consulta
+        "..., activities(name), agents(name, surname), agent_activities(count)".
+        """
+        with self._lock:
+            activities, agents = self._tables["activities"], self._tables["agents"]
+            result = []
+            for row in self._tables["gym_reservations"].values():
+                if not start_date <= row["reservation_date"] <= end_date:
+                    continue
+                activity = activities.get(row["activity_id"])
+                monitor = agents.get(row["monitor_id"])
+                result.append({
+                    "id": row["id"],
+                    "reservation_date": row["reservation_date"],
+                    "time_slot": row["time_slot"],
+                    "notes": row.get("notes"),
+                    "activities": {"name": activity["name"]} if activity else None,
+                    "agents": {"name": monitor["name"], "surname": monitor["surname"]} if monitor else None,
+                    "agent_activities": [{"count": len(self._attendance.get(row["id"], ()))}],
+                })
+        result.sort(key=lambda r: (r["reservation_date"], r["time_slot"]))
+        return result
+
+
+class SupabaseRealtimeSource:
+    """
+    Fuente de cambios de Supabase Realtime (Postgres changes) sobre LIVE_TABLES.
+    Se ejecuta en un hilo propio con su bucle asyncio. Las tablas deben estar en la
+    publicación `supabase_realtime`, y `key` debe poder leerlas con RLS (la clave de servicio).
+    Si el canal deja de estar suscrito (websocket caído, error del canal) la fuente termina:
+    los cambios perdidos mientras tanto obligan a cargar una instantánea nueva.
+    """
+
+    def __init__(self, url, key, tables=LIVE_TABLES):
+        self.url = url
+        self.key = key
+        self.tables = tables
+        self._callback = None
+        self._thread = None
+        self._channel = None
+        self._subscribed = threading.Event()
+        self._stop = threading.Event()
+
+    def start(self, callback, on_exit=None):
+        """Se suscribe en segundo plano; `on_exit` se llama cuando el hilo termina (por error o por `stop`)."""
+        self._callback = callback
+
+        def run():
+            try:
+                asyncio.run(self._listen())
+            except Exception as e:
+                logger.warning("Error en la suscripción en tiempo real: %s", e)
+            finally:
+                if on_exit is not None:
+                    on_exit()
+
+        self._thread = threading.Thread(target=run, name="supabase-realtime", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def wait_subscribed(self, timeout=SUBSCRIBE_TIMEOUT):
+        """Espera a que el canal quede suscrito, para no perder los cambios hechos durante la instantánea."""
+        return self._subscribed.wait(timeout)
+
+    def is_alive(self):
+        """Hilo en marcha y canal suscrito con el websocket conectado (el hilo solo no basta)."""
+        channel = self._channel
+        return (
+            self._thread is not None and self._thread.is_alive()
+            and channel is not None and channel.is_joined and channel.socket.is_connected
+        )
+
+    async def _listen(self):
+        from supabase import acreate_client # Importar aquí: solo se necesita el cliente asíncrono para Realtime
+        client = await acreate_client(self.url, self.key)
+        channel = client.channel("gymapp-live-store")
+        for table in self.tables:
+            channel.on_postgres_changes("*", schema="public", table=table, callback=self._on_change)
+        await channel.subscribe()
+        self._channel = channel
+        try:
+            while not self._stop.is_set(): # Mantener viva la suscripción hasta `stop`
+                joined = channel.is_joined and channel.socket.is_connected
+                if joined:
+                    self._subscribed.set()
+                elif self._subscribed.is_set():
+                    raise RuntimeError(f"El canal de Realtime ha dejado de estar suscrito ({channel.state})")
+                await asyncio.sleep(1)
+        finally:
+            await channel.unsubscribe()
+
+    def _on_change(self, payload):
+        data = payload["data"]
+        self._callback({
+            "table": data["table"],
+            "type": data["type"],
+            "new": data.get("record") or {},
+            "old": data.get("old_record") or {},
+        })
+
+
+class QueueEventSource:
+    """
+    Fuente de cambios local, sustituta de Realtime para pruebas y benchmarks.
+    Los cambios se encolan con `push` y un hilo los entrega en orden al callback.
+    """
+
+    _STOP = object() # Marca en la cola para terminar el hilo
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self, callback, on_exit=None):
+        def deliver():
+            try:
+                while True:
+                    event = self._queue.get()
+                    try:
+                        if event is self._STOP:
+                            return
+                        callback(event)
+                    finally:
+                        self._queue.task_done()
+            finally:
+                if on_exit is not None:
+                    on_exit()
+        self._thread = threading.Thread(target=deliver, name="queue-event-source", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._queue.put(self._STOP)
+
+    def wait_subscribed(self, timeout=None):
+        return self.is_alive() # Los cambios se encolan desde el principio
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def push(self, table, event_type, new=None, old=None):
+        self._queue.put({"table": table, "type": event_type, "new": new or {}, "old": old or {}})
+
+    def join(self):
+        """Espera a que se hayan entregado todos los cambios encolados."""
+        self._queue.join()
+
+
+def start_live_store(store, source, client, on_exit=None):
+    """
+    Arranca el almacén: se suscribe, espera a que la suscripción esté activa (los cambios se
+    guardan hasta tener la instantánea) y carga la instantánea. Si algo falla, la suscripción
+    se detiene antes de relanzar el error, para no dejar hilos huérfanos. Mientras la fuente
+    siga viva, las consultas cacheadas que solo leen LIVE_TABLES se invalidan solo por
+    cambios; las demás tablas no reciben eventos y siguen caducando por TTL.
+    """
+    def source_exited():
+        store.handle_source_exit()
+        if on_exit is not None:
+            on_exit()
+
+    store.attach_source(source)
+    source.start(store.handle_event, on_exit=source_exited)
+    try:
+        if not source.wait_subscribed():
+            raise RuntimeError("La suscripción en tiempo real no se ha completado a tiempo")
+        store.load_snapshot(client)
+    except Exception:
+        source.stop()
+        raise
+    query_cache.set_event_driven(source.is_alive, LIVE_TABLES)
+    return store
+
+
+_failed_at = None # time.monotonic() del último fallo del almacén (arranque o suscripción caída)
+
+
+def _mark_failed():
+    global _failed_at
+    _failed_at = time.monotonic()
+    _live_store_resource.clear() # El próximo get_live_store (pasado RETRY_AFTER_SECONDS) crea uno nuevo
+
+
+@st.cache_resource # Un único almacén y una única suscripción por proceso
+def _live_store_resource():
+    client = get_service_client() # Compartido por todas las sesiones: sin JWT de usuario, la clave anónima no ve nada con RLS
+    if client is None:
+        raise RuntimeError("El almacén en tiempo real necesita `supabase_service_role_key` en secrets")
+    hot_since = (datetime.date.today() - datetime.timedelta(days=HOT_WINDOW_DAYS)).strftime("%Y-%m-%d")
+    source = SupabaseRealtimeSource(st.secrets["supabase_url"], st.secrets["supabase_service_role_key"])
+    return start_live_store(LiveStore(hot_since), source, client, on_exit=_mark_failed)
+
+
+def get_live_store():
+    """
+    Devuelve el almacén en memoria si `realtime_enabled = true` en secrets, o None. Requiere
+    también `supabase_service_role_key`: el almacén lo comparten todas las sesiones.
+    Si no se puede arrancar, retorna None (las páginas leen de la base de datos) y no se
+    reintenta hasta pasados RETRY_AFTER_SECONDS.
+    """
+    if not st.secrets.get("realtime_enabled", False):
+        return None
+    if _failed_at is not None and time.monotonic() - _failed_at < RETRY_AFTER_SECONDS:
+        return None
+    try:
+        return _live_store_resource()
+    except Exception as e:
+        logger.warning("No se pudo arrancar el almacén en tiempo real: %s", e)
+        _mark_failed()
+        return None
@@ -0,0 +1,63 @@
+# database/reference_data.py
+import streamlit as st
+from database.supabase_client import supabase_client
+from database.query_cache import cached_query
+from database.replica import get_replica
+from utils.constants import SECTIONS_LIST, GROUPS_LIST
+from utils.startup_report import startup_phase
+
+REFERENCE_TABLES = ("activities", "agents", "sections", "groups")
+
+
+def _fallback_reference_data():
+    """
+    Datos de referencia sin la función `get_reference_data` (esquema anterior a la migración
+    0007 o sin conexión): de la réplica local si está lista, o con una consulta por tabla.
+    Secciones y grupos salen de utils/constants.py. Lanza RuntimeError si una consulta falla:
+    unos datos incompletos quedarían en la cache compartida.
+    """
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    replica = get_replica()
+    if replica is not None and replica.is_ready():
+        activities = [{"id": a["id"], "name": a["name"]} for a in replica.activities()]
+        monitors = replica.monitors()
+    else:
+        try:
+            activities = supabase_client.table("activities").select("id, name").order("name").execute().data
+            monitors = supabase_client.table("agents").select("id, nip, name, surname").eq("is_monitor", True).order("surname").order("name").order("id").execute().data
+        except APIError as e:
+            raise RuntimeError(e.message) from e
+    return {"activities": activities, "monitors": monitors, "sections": SECTIONS_LIST, "groups": GROUPS_LIST}
+
+
+@cached_query(*REFERENCE_TABLES, ttl=300, shared=True) # Catálogos que cualquier usuario puede leer
+def get_reference_data():
+    """
+    Carga en una sola llamada los datos de referencia de los formularios: actividades y
+    monitores ordenados para los selectores, y las listas de secciones y grupos.
+    Se cachea en la cache del proceso, así que todas las sesiones comparten la misma copia.
+    Retorna un diccionario con las claves activities, monitors, sections y groups.
+    Lanza RuntimeError si no se pueden cargar por ninguna de las dos vías.
+    """
+    with startup_phase("datos de referencia"):
+        try:
+            data = supabase_client.rpc("get_reference_data").execute().data
+            if data:
+                # Tablas de secciones o grupos vacías: se mantienen las listas de utils/constants.py
+                return {**data, "sections": data["sections"] or SECTIONS_LIST, "groups": data["groups"] or GROUPS_LIST}
+        except Exception: # APIError (función no disponible) o sin conexión: se cargan por separado
+            pass
+        return _fallback_reference_data()
+
+
+def get_reference_data_or_empty():
+    """
+    Datos de referencia para páginas que deben dibujarse aunque no se puedan cargar: si fallan,
+    muestra un aviso y retorna listas vacías de actividades y monitores, con las secciones y
+    grupos de utils/constants.py. Usa st.warning: llamar solo desde el hilo del script.
+    """
+    try:
+        return get_reference_data()
+    except Exception as e:
+        st.warning(f"No se han podido cargar los datos de referencia: {e}")
+        return {"activities": [], "monitors": [], "sections": SECTIONS_LIST, "groups": GROUPS_LIST}
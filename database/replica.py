@@ -0,0 +1,468 @@
+# database/replica.py
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+import httpx
+import streamlit as st
+from database.query_cache import invalidate_tables
+from database.supabase_client import supabase_client, get_service_client
+
+logger = logging.getLogger(__name__)
+
+# Tablas replicadas y sus columnas (las mismas que en Postgres)
+REPLICA_TABLES = {
+    "activities": ["id", "name", "description", "created_at", "updated_at"],
+    "agents": ["id", "nip", "name", "surname", "section", "grupo", "email", "phone", "is_monitor", "created_at", "updated_at"],
+    "gym_reservations": ["id", "activity_id", "monitor_id", "reservation_date", "time_slot", "notes", "created_at", "updated_at"],
+}
+DELETIONS_FEED = "row_deletions"
+REPLICA_WINDOW_DAYS = 35 # Días hacia atrás de reservas que se replican (las futuras se replican todas)
+SYNC_INTERVAL = 30 # Segundos entre sincronizaciones
+SYNC_PAGE_SIZE = 1000 # Filas por petición (límite por defecto de PostgREST)
+SYNC_OVERLAP = datetime.timedelta(seconds=60) # Margen que se relee: transacciones que confirman tarde con un updated_at anterior al cursor
+UNIQUE_VIOLATION = "23505" # Código de Postgres para las restricciones UNIQUE
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    id TEXT PRIMARY KEY, name TEXT, description TEXT, created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS agents (
+    id TEXT PRIMARY KEY, nip TEXT, name TEXT, surname TEXT, section TEXT, grupo TEXT,
+    email TEXT, phone TEXT, is_monitor INTEGER, created_at TEXT, updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS agents_surname_idx ON agents (surname, name, id);
+CREATE TABLE IF NOT EXISTS gym_reservations (
+    id TEXT PRIMARY KEY, activity_id TEXT, monitor_id TEXT, reservation_date TEXT, time_slot TEXT,
+    notes TEXT, created_at TEXT, updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS gym_reservations_date_idx ON gym_reservations (reservation_date, time_slot, id);
+CREATE INDEX IF NOT EXISTS gym_reservations_monitor_idx ON gym_reservations (monitor_id, reservation_date);
+CREATE TABLE IF NOT EXISTS sync_state (
+    feed TEXT PRIMARY KEY, cursor_at TEXT, cursor_id TEXT, synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS pending_writes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    rows TEXT NOT NULL,
+    queued_by TEXT,
+    queued_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending', -- pending, conflict o error
+    error TEXT
+);
+"""
+
+
+def _hot_since():
+    return (datetime.date.today() - datetime.timedelta(days=REPLICA_WINDOW_DAYS)).strftime("%Y-%m-%d")
+
+
+def _now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class LocalReplica:
+    """
+    Réplica local en SQLite de `activities`, `agents` y las reservas recientes, compartida por
+    todo el proceso y guardada en disco, así que sigue disponible tras un reinicio sin conexión.
+    Se sincroniza de forma incremental con un cursor (updated_at, id) por tabla y otro
+    (deleted_at, id) sobre `row_deletions` (migración 0006).
+    Las escrituras hechas sin conexión se guardan en `pending_writes` y se aplican ya en la
+    réplica, para que se vean en las lecturas hasta que se reenvían al servidor.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hot_since = _hot_since() # Fecha YYYY-MM-DD
+        self.online = True
+        self.last_error = None
+        self._sync_requested = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # lower() de SQLite solo entiende ASCII: se usa el de Python para los nombres con tildes y eñes
+        self._conn.create_function("py_lower", 1, lambda value: value.lower() if value else value, deterministic=True)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    # --- Sincronización ---
+    def is_ready(self):
+        """Indica si la réplica se ha sincronizado completa al menos una vez (en esta ejecución o en una anterior)."""
+        with self._lock:
+            synced = self._conn.execute("SELECT count(*) FROM sync_state WHERE synced_at IS NOT NULL").fetchone()[0]
+        return synced == len(REPLICA_TABLES) + 1
+
+    def covers(self, start_date):
+        """Indica si las reservas desde `start_date` (YYYY-MM-DD) están en la réplica."""
+        return self.is_ready() and start_date >= self.hot_since
+
+    def last_synced_at(self):
+        with self._lock:
+            return self._conn.execute("SELECT min(synced_at) FROM sync_state").fetchone()[0]
+
+    def request_sync(self):
+        """Adelanta la próxima sincronización (p. ej. después de una escritura que no pasa por la réplica)."""
+        self._sync_requested.set()
+
+    def wait_for_sync_request(self, timeout):
+        requested = self._sync_requested.wait(timeout)
+        self._sync_requested.clear()
+        return requested
+
+    def set_online(self, online, error=None):
+        self.online = online
+        self.last_error = error
+
+    def sync(self, client):
+        """Trae los cambios de cada tabla y los borrados desde el último cursor. Invalida en cache las tablas modificadas."""
+        self.hot_since = _hot_since()
+        changed = set()
+        for table, columns in REPLICA_TABLES.items():
+            changed |= self._pull(client, table, columns, "updated_at", self.apply_rows)
+        changed |= self._pull(client, DELETIONS_FEED, ["id", "table_name", "row_id", "deleted_at"], "deleted_at", self._apply_deletions)
+        with self._lock, self._conn:
+            if self._conn.execute("DELETE FROM gym_reservations WHERE reservation_date < ?", (self.hot_since,)).rowcount:
+                changed.add("gym_reservations") # Reservas que han salido de la ventana replicada
+        self.set_online(True)
+        if changed:
+            invalidate_tables(*changed)
+
+    def _pull(self, client, feed, columns, ts_column, apply):
+        """
+        Recorre los cambios de `feed` desde su cursor con paginación por clave (ts_column, id) y
+        los aplica página a página, guardando el cursor en la misma transacción.
+        La primera página relee SYNC_OVERLAP antes del cursor; aplicar un cambio dos veces no tiene efecto.
+        Retorna el conjunto de tablas modificadas.
+        """
+        from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+        with self._lock:
+            state = self._conn.execute("SELECT cursor_at, cursor_id FROM sync_state WHERE feed = ?", (feed,)).fetchone()
+        cursor = (state["cursor_at"], state["cursor_id"]) if state and state["cursor_at"] else None
+        changed = set()
+        first_page = True
+        while True:
+            query = client.table(feed).select(", ".join(columns))
+            if feed == "gym_reservations":
+                query = query.gte("reservation_date", self.hot_since)
+            elif feed == DELETIONS_FEED:
+                query = query.in_("table_name", list(REPLICA_TABLES))
+            if cursor and first_page:
+                query = query.gte(ts_column, (datetime.datetime.fromisoformat(cursor[0]) - SYNC_OVERLAP).isoformat())
+            elif cursor:
+                last_at, last_id = cursor
+                query = query.or_(f'{ts_column}.gt."{last_at}",and({ts_column}.eq."{last_at}",id.gt.{last_id})')
+            try:
+                rows = query.order(ts_column).order("id").limit(SYNC_PAGE_SIZE).execute().data
+            except APIError as e:
+                raise RuntimeError(f"Error al sincronizar {feed}: {e.message}") from e
+            with self._lock, self._conn:
+                changed |= apply(feed, rows, commit=False)
+                if rows:
+                    cursor = (rows[-1][ts_column], rows[-1]["id"])
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (feed, cursor_at, cursor_id, synced_at) VALUES (?, ?, ?, ?)",
+                    (feed, cursor[0] if cursor else None, cursor[1] if cursor else None, time.time()),
+                )
+            if len(rows) < SYNC_PAGE_SIZE:
+                return changed
+            first_page = False
+
+    def apply_rows(self, table, rows, commit=True):
+        """Inserta o reemplaza `rows` (filas tal como las devuelve Supabase) en la tabla local. Retorna las tablas modificadas."""
+        if not rows:
+            return set()
+        columns = REPLICA_TABLES[table]
+        sql = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        values = [tuple(row.get(column) for column in columns) for row in rows]
+        if commit:
+            with self._lock, self._conn:
+                self._conn.executemany(sql, values)
+        else:
+            self._conn.executemany(sql, values)
+        return {table}
+
+    def _apply_deletions(self, feed, rows, commit=False):
+        changed = set()
+        for row in rows:
+            if row["table_name"] in REPLICA_TABLES and self._conn.execute(f"DELETE FROM {row['table_name']} WHERE id = ?", (row["row_id"],)).rowcount:
+                changed.add(row["table_name"])
+        return changed
+
+    # --- Lecturas (mismas formas que las consultas a Supabase) ---
+    def activities(self):
+        return self._query("SELECT id, name, description, created_at FROM activities ORDER BY name")
+
+    def monitors(self):
+        return self._query("SELECT id, nip, name, surname FROM agents WHERE is_monitor ORDER BY surname, name, id")
+
+    def search_agents(self, search_query, section, grupo, only_monitors, page_size, page_offset):
+        """
+        Misma búsqueda que la función SQL `search_agents`: los nombres solo a partir de 3 caracteres.
+        Retorna (agentes, total_de_coincidencias).
+        """
+        needle = (search_query or "").strip()
+        where = """
+            (? = '' OR nip LIKE ? || '%' OR (length(?) >= 3 AND py_lower(name || ' ' || surname) LIKE '%' || ? || '%'))
+            AND (? IS NULL OR section = ?) AND (? IS NULL OR grupo = ?) AND (? = 0 OR is_monitor)
+        """
+        params = (needle, needle, needle, needle.lower(), section, section, grupo, grupo, int(bool(only_monitors)))
+        rows = self._query(
+            f"SELECT id, nip, name, surname, section, grupo, email, is_monitor FROM agents WHERE {where} "
+            "ORDER BY surname, name, id LIMIT ? OFFSET ?",
+            params + (page_size, page_offset),
+        )
+        total = self._query(f"SELECT count(*) AS total FROM agents WHERE {where}", params)[0]["total"]
+        for row in rows:
+            row["is_monitor"] = bool(row["is_monitor"])
+        return rows, total
+
+    def reservations_page(self, start_date, end_date, cursor=None, limit=None):
+        """
+        Reservas en [start_date, end_date] posteriores a `cursor` (reservation_date, time_slot, id),
+        con la forma de "id, reservation_date, time_slot, notes, activities(name), agents(name, surname)".
+        """
+        sql = """
+            SELECT r.id, r.reservation_date, r.time_slot, r.notes, a.name AS activity, m.name AS monitor_name, m.surname AS monitor_surname
+            FROM gym_reservations r
+            LEFT JOIN activities a ON a.id = r.activity_id
+            LEFT JOIN agents m ON m.id = r.monitor_id
+            WHERE r.reservation_date BETWEEN ? AND ?
+        """
+        params = [start_date, end_date]
+        if cursor:
+            sql += " AND (r.reservation_date, r.time_slot, r.id) > (?, ?, ?)"
+            params += list(cursor)
+        sql += " ORDER BY r.reservation_date, r.time_slot, r.id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [
+            {
+                "id": row["id"], "reservation_date": row["reservation_date"], "time_slot": row["time_slot"], "notes": row["notes"],
+                "activities": {"name": row["activity"]} if row["activity"] is not None else None,
+                "agents": {"name": row["monitor_name"], "surname": row["monitor_surname"]} if row["monitor_name"] is not None else None,
+            }
+            for row in self._query(sql, params)
+        ]
+
+    def booked_slots(self, start_date, end_date, monitor_id=None):
+        """Conjunto de (reservation_date, time_slot, monitor_id) reservados en el rango, como `fetch_booked_slots`."""
+        sql = "SELECT reservation_date, time_slot, monitor_id FROM gym_reservations WHERE reservation_date BETWEEN ? AND ?"
+        params = [start_date, end_date]
+        if monitor_id is not None:
+            sql += " AND monitor_id = ?"
+            params.append(monitor_id)
+        return {(row["reservation_date"], row["time_slot"], row["monitor_id"]) for row in self._query(sql, params)}
+
+    # --- Escrituras en cola ---
+    def enqueue(self, table, rows, queued_by=None):
+        """
+        Guarda una inserción para reenviarla más tarde y la aplica ya en la réplica. Las filas
+        reciben aquí su id, el mismo que tendrán en el servidor. Retorna las filas encoladas.
+        """
+        now = _now_iso()
+        rows = [{**row, "id": row.get("id") or str(uuid.uuid4())} for row in rows]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO pending_writes (table_name, rows, queued_by, queued_at) VALUES (?, ?, ?, ?)",
+                (table, json.dumps(rows), queued_by, time.time()),
+            )
+            if table in REPLICA_TABLES:
+                self.apply_rows(table, [{"created_at": now, "updated_at": now, **row} for row in rows], commit=False)
+        invalidate_tables(table)
+        return rows
+
+    def pending_writes(self, statuses=("pending",), queued_by=None):
+        """Escrituras en cola con el estado indicado, en el orden en que se encolaron."""
+        sql = f"SELECT * FROM pending_writes WHERE status IN ({', '.join('?' * len(statuses))})"
+        params = list(statuses)
+        if queued_by is not None:
+            sql += " AND queued_by = ?"
+            params.append(queued_by)
+        writes = self._query(sql + " ORDER BY id", params)
+        for write in writes:
+            write["rows"] = json.loads(write["rows"])
+        return writes
+
+    def complete_write(self, write_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pending_writes WHERE id = ?", (write_id,))
+
+    def fail_write(self, write, status, error):
+        """Marca la escritura como rechazada (para mostrarla al usuario) y retira sus filas de la réplica."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE pending_writes SET status = ?, error = ? WHERE id = ?", (status, error, write["id"]))
+            if write["table_name"] in REPLICA_TABLES:
+                self._conn.executemany(f"DELETE FROM {write['table_name']} WHERE id = ?", [(row["id"],) for row in write["rows"]])
+        invalidate_tables(write["table_name"])
+
+    def dismiss_write(self, write_id):
+        """Descarta una escritura rechazada una vez que el usuario la ha visto."""
+        self.complete_write(write_id)
+
+
+def _current_user_email():
+    session = st.session_state.get("supabase_session")
+    user = getattr(session, "user", None)
+    return getattr(user, "email", None)
+
+
+class WriteRejected(RuntimeError):
+    """Supabase rechazó una escritura (restricción, RLS...). `code` es el código de error de Postgres."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def _insert(client, table, rows):
+    """
+    Inserta `rows` en `table` y retorna las filas creadas. Lanza WriteRejected si Supabase la
+    rechaza; los fallos de conexión (httpx.TransportError) se propagan.
+    """
+    from postgrest import APIError # Importar aquí: solo se necesita al escribir
+    try:
+        response = client.table(table).insert(rows).execute()
+    except APIError as e: # postgrest lanza los errores del servidor al ejecutar
+        raise WriteRejected(e.message, e.code) from e
+    return response.data
+
+
+def _already_applied(client, write):
+    """Indica si todas las filas de la escritura ya están en el servidor (la respuesta se perdió tras confirmarse)."""
+    from postgrest import APIError # Importar aquí: solo se necesita al reenviar la cola
+    ids = [row["id"] for row in write["rows"]]
+    try:
+        response = client.table(write["table_name"]).select("id").in_("id", ids).execute()
+    except APIError:
+        return False
+    return len(response.data) == len(ids)
+
+
+def replay_pending_writes(replica, client, queued_by=None):
+    """
+    Reenvía en orden las escrituras en cola de `queued_by` (todas si es None) con `client`, que
+    debe ser el de ese usuario: las políticas RLS se aplican a quien encoló la escritura.
+    Se detiene en el primer fallo de conexión para no alterar el orden. Las rechazadas por el servidor salen de la cola (las de una restricción
+    UNIQUE como conflicto y el resto como error) para mostrárselas a quien las encoló.
+    Retorna el número de escrituras aplicadas.
+    """
+    applied = 0
+    for write in replica.pending_writes(queued_by=queued_by):
+        try:
+            try:
+                data = _insert(client, write["table_name"], write["rows"])
+            except WriteRejected as e:
+                is_conflict = e.code == UNIQUE_VIOLATION
+                if not (is_conflict and _already_applied(client, write)):
+                    replica.fail_write(write, "conflict" if is_conflict else "error", str(e))
+                    continue
+                data = write["rows"]
+        except httpx.TransportError as e:
+            replica.set_online(False, str(e))
+            break
+        replica.complete_write(write["id"])
+        if write["table_name"] in REPLICA_TABLES:
+            replica.apply_rows(write["table_name"], data)
+        invalidate_tables(write["table_name"])
+        applied += 1
+    return applied
+
+
+def write_or_queue(table, rows):
+    """
+    Inserta `rows` (una fila o una lista) en Supabase y las copia en la réplica. Si el servidor no
+    responde y la réplica está activa, la inserción se encola para reenviarla al recuperar la
+    conexión. El orden se respeta por usuario: antes se reenvía su propia cola, con su cliente.
+    Retorna (filas, en_cola). Lanza WriteRejected si Supabase rechaza la inserción.
+    """
+    rows = rows if isinstance(rows, list) else [rows]
+    replica = get_replica()
+    if replica is None:
+        return _insert(supabase_client, table, rows), False
+    user = _current_user_email() # Sin usuario (queued_by=None) se verían las colas de todos
+    if user is not None and replica.pending_writes(queued_by=user):
+        replay_pending_writes(replica, supabase_client, queued_by=user) # Respetar el orden: primero lo que ya estaba en cola
+    if user is not None and replica.pending_writes(queued_by=user): # Sigue sin conexión: se encola detrás de las anteriores
+        return replica.enqueue(table, rows, queued_by=user), True
+    try:
+        data = _insert(supabase_client, table, rows)
+    except httpx.TransportError as e:
+        replica.set_online(False, str(e))
+        return replica.enqueue(table, rows, queued_by=user), True
+    if table in REPLICA_TABLES:
+        replica.apply_rows(table, data)
+    return data, False
+
+
+def start_replica_sync(replica, client, interval=SYNC_INTERVAL):
+    """Sincroniza la réplica en un hilo propio cada `interval` segundos (o antes si se pide con `request_sync`)."""
+    def loop():
+        while True:
+            try:
+                replica.sync(client)
+            except httpx.TransportError as e: # Sin conexión: se sigue leyendo la copia local
+                replica.set_online(False, str(e))
+            except Exception as e: # Error del servidor: se reintenta en la próxima sincronización
+                replica.last_error = str(e)
+            replica.wait_for_sync_request(interval)
+    threading.Thread(target=loop, name="replica-sync", daemon=True).start()
+    return replica
+
+
+@st.cache_resource # Una única réplica y un único hilo de sincronización por proceso
+def get_replica():
+    """
+    Devuelve la réplica local si `replica_path` está configurado en secrets (ruta del fichero
+    SQLite), o None. Requiere también `supabase_service_role_key`: la sincronización es compartida
+    y, con la clave anónima, RLS le devolvería las tablas vacías y la réplica parecería al día.
+    """
+    path = st.secrets.get("replica_path")
+    if not path:
+        return None
+    client = get_service_client()
+    if client is None:
+        logger.warning("La réplica local necesita `supabase_service_role_key` en secrets; queda desactivada")
+        return None
+    return start_replica_sync(LocalReplica(path), client)
+
+
+def render_replica_status():
+    """
+    Estado de la réplica en la barra lateral: modo sin conexión, escrituras en cola y las
+    rechazadas al reenviarlas. Si hay conexión, reenvía antes la cola del usuario con el cliente
+    de su sesión (las de otros usuarios se reenvían en sus sesiones). Llamar en cada página
+    después de comprobar el login.
+    """
+    replica = get_replica()
+    if replica is None:
+        return
+    user = _current_user_email()
+    if user is None: # Sin sesión no hay cola propia que reenviar ni mostrar
+        return
+    if replica.online and replica.pending_writes(queued_by=user):
+        try:
+            replay_pending_writes(replica, supabase_client, queued_by=user)
+        except Exception as e: # La página se dibuja igualmente; la cola se reintenta en el próximo rerun
+            replica.last_error = str(e)
+    with st.sidebar:
+        if not replica.online:
+            synced_at = replica.last_synced_at()
+            since = f" (datos locales de las {datetime.datetime.fromtimestamp(synced_at):%H:%M})" if synced_at else ""
+            st.warning(f"📴 Sin conexión con el servidor{since}. Las reservas, agentes y actividades nuevos se guardarán al recuperarla.")
+        pending = replica.pending_writes(queued_by=user)
+        if pending:
+            st.info(f"⏳ {len(pending)} escritura(s) en cola pendientes de enviar.")
+        for write in replica.pending_writes(("conflict", "error"), queued_by=user):
+            kind = "Conflicto" if write["status"] == "conflict" else "Error"
+            st.error(f"{kind} al guardar {len(write['rows'])} fila(s) en {write['table_name']} encoladas sin conexión: {write['error']}")
+            if st.button("Descartar", key=f"replica_dismiss_{write['id']}"):
+                replica.dismiss_write(write["id"])
+                st.rerun()
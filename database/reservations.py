@@ -0,0 +1,126 @@
+# database/reservations.py
+import datetime
+from database.supabase_client import supabase_client
+from database.query_cache import cached_query
+from database.realtime import get_live_store
+from database.replica import UNIQUE_VIOLATION, WriteRejected, get_replica, write_or_queue
+from utils.availability import SlotBitmap
+
+AVAILABILITY_DAYS = 90 # Días de ocupación que se precargan para el formulario de reservas
+
+
+class ReservationConflict(RuntimeError):
+    """Algún turno se ocupó entre la comprobación y la inserción (restricción UNIQUE); no se insertó nada."""
+
+
+def expand_weekly(start_date, until_date, interval_weeks=1):
+    """
+    Expande una reserva semanal: retorna las fechas desde `start_date` hasta `until_date`
+    (ambas incluidas) separadas `interval_weeks` semanas.
+    """
+    step = datetime.timedelta(weeks=interval_weeks)
+    dates = []
+    current = start_date
+    while current <= until_date:
+        dates.append(current)
+        current += step
+    return dates
+
+
+def get_reservations_in_range(start_date, end_date):
+    """
+    Obtiene las reservas visibles en [start_date, end_date] (fechas YYYY-MM-DD) con la
+    actividad, el monitor y el número de inscritos, para las vistas de horario.
+    Si el almacén en tiempo real cubre el rango, se lee de memoria sin ninguna petición.
+    """
+    live_store = get_live_store()
+    if live_store is not None and live_store.covers(start_date):
+        return live_store.reservations_in_range(start_date, end_date)
+    return _fetch_reservations_in_range(start_date, end_date)
+
+
+@cached_query("gym_reservations", "activities", "agents", "agent_activities", ttl=60)
+def _fetch_reservations_in_range(start_date, end_date):
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    try:
+        response = supabase_client.table("gym_reservations").select(
+            "id, reservation_date, time_slot, notes, activities(name), agents(name, surname), agent_activities(count)"
+        ).gte("reservation_date", start_date).lte("reservation_date", end_date).order("reservation_date").order("time_slot").execute()
+    except APIError as e:
+        raise RuntimeError(e.message) from e
+    return response.data
+
+
+def fetch_booked_slots(start_date, end_date, monitor_id=None):
+    """
+    Construye un índice en memoria de las reservas existentes en el rango con una sola consulta.
+    Retorna un conjunto de tuplas (reservation_date, time_slot, monitor_id), la misma
+    clave que la restricción UNIQUE de `gym_reservations`.
+    Si la réplica local cubre el rango, se lee de ella sin ninguna petición.
+    """
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    replica = get_replica()
+    if replica is not None and replica.covers(start_date.strftime("%Y-%m-%d")):
+        return replica.booked_slots(start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), monitor_id)
+    query = supabase_client.table("gym_reservations").select(
+        "reservation_date, time_slot, monitor_id"
+    ).gte("reservation_date", start_date.strftime("%Y-%m-%d")).lte("reservation_date", end_date.strftime("%Y-%m-%d"))
+    if monitor_id is not None:
+        query = query.eq("monitor_id", monitor_id)
+    try:
+        response = query.execute()
+    except APIError as e:
+        raise RuntimeError(e.message) from e
+    return {(row["reservation_date"], row["time_slot"], row["monitor_id"]) for row in response.data}
+
+
+@cached_query("gym_reservations", ttl=60)
+def get_monitor_availability(monitor_id, start_date, days=AVAILABILITY_DAYS):
+    """
+    Precarga con una sola consulta la ocupación de un monitor durante `days` días desde
+    `start_date` y la retorna como SlotBitmap. Se cachea por monitor y rango, así que
+    cambiar de fecha o turno en el formulario no hace más peticiones.
+    """
+    end_date = start_date + datetime.timedelta(days=days - 1)
+    booked = fetch_booked_slots(start_date, end_date, monitor_id)
+    return SlotBitmap.from_booked(start_date, end_date, ((date, slot) for date, slot, _ in booked))
+
+
+def plan_reservations(dates, time_slot, activity_id, monitor_id, notes=None):
+    """
+    Comprueba cada fecha contra las reservas existentes, consultadas en el momento, antes de
+    escribir nada. La ocupación cacheada (get_monitor_availability) solo sirve para rellenar
+    el formulario: puede tener hasta un minuto de antigüedad.
+    Retorna (reservas_a_insertar, fechas_en_conflicto).
+    """
+    booked = fetch_booked_slots(min(dates), max(dates), monitor_id)
+    is_booked = lambda date: (date.strftime("%Y-%m-%d"), time_slot, monitor_id) in booked
+    new_reservations, conflicts = [], []
+    for date in dates:
+        date_str = date.strftime("%Y-%m-%d") # Formato YYYY-MM-DD para Supabase
+        if is_booked(date):
+            conflicts.append(date)
+            continue
+        new_reservations.append({
+            "activity_id": activity_id,
+            "monitor_id": monitor_id,
+            "reservation_date": date_str,
+            "time_slot": time_slot,
+            "notes": notes,
+        })
+    return new_reservations, conflicts
+
+
+def insert_reservations(new_reservations):
+    """
+    Inserta todas las reservas en una sola petición. Sin conexión y con la réplica local activa,
+    se encolan para enviarlas más tarde. Retorna (reservas, en_cola).
+    Lanza ReservationConflict si algún turno ya está reservado (la inserción es atómica: no se
+    crea ninguna) y RuntimeError si Supabase devuelve otro error.
+    """
+    try:
+        return write_or_queue("gym_reservations", new_reservations)
+    except WriteRejected as e:
+        if e.code == UNIQUE_VIOLATION:
+            raise ReservationConflict(str(e)) from e
+        raise
@@ -1,15 +1,100 @@
 # database/supabase_client.py
+from typing import TYPE_CHECKING
+import httpx
 import streamlit as st
-from supabase import create_client, Client
+from database.instrumentation import InstrumentedClient, is_enabled as instrumentation_enabled
+from utils.startup_report import startup_phase
 
-@st.cache_resource  # Cache para inicializar el cliente una sola vez
-def get_supabase_client() -> Client:
+if TYPE_CHECKING:
+    from supabase import Client
+
+# Límites del pool de conexiones HTTP compartido por todas las sesiones
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+HTTP_KEEPALIVE_EXPIRY = 30 # Segundos que una conexión ociosa se mantiene abierta
+HTTP_TIMEOUT = 10 # Segundos por petición
+
+@st.cache_resource # Un único pool por proceso
+def get_http_transport() -> httpx.HTTPTransport:
+    """
+    Devuelve el transporte HTTP compartido. Contiene el pool de conexiones keep-alive,
+    así que todos los clientes reutilizan las conexiones TLS ya abiertas.
     """
-    Inicializa y devuelve el cliente Supabase.
+    return httpx.HTTPTransport(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        retries=1,
+    )
+
+def create_supabase_client(key=None) -> "Client":
+    """
+    Crea un cliente Supabase ligero e independiente, con la clave anónima o con `key`.
+    Cada cliente tiene su propio httpx.Client (cabeceras y estado de autenticación propios)
+    pero todos comparten el pool de conexiones de `get_http_transport()`.
     Utiliza st.secrets para obtener las credenciales de forma segura.
+    El SDK de Supabase se importa aquí, con el primer cliente: tarda casi medio segundo en
+    cargarse y la pantalla de login se dibuja sin él.
     """
+    with startup_phase("import supabase"):
+        from supabase import create_client, ClientOptions
     url: str = st.secrets["supabase_url"]
-    key: str = st.secrets["supabase_anon_key"] # ¡Clave ANON para el frontend!
-    return create_client(url, key)
+    key: str = key or st.secrets["supabase_anon_key"] # ¡Clave ANON para el frontend!
+    http_client = httpx.Client(transport=get_http_transport(), timeout=HTTP_TIMEOUT)
+    options = ClientOptions(httpx_client=http_client, auto_refresh_token=False, persist_session=False)
+    return create_client(url, key, options=options)
+
+@st.cache_resource  # Cache para inicializar el cliente anónimo una sola vez
+def get_supabase_client() -> "Client":
+    """
+    Devuelve el cliente anónimo compartido, usado cuando no hay sesión iniciada.
+    Nunca se inicia sesión sobre este cliente.
+    """
+    return create_supabase_client()
+
+@st.cache_resource # Un único cliente de servicio por proceso
+def get_service_client() -> "Client | None":
+    """
+    Devuelve el cliente con `supabase_service_role_key` de secrets, o None si no está configurada.
+    Solo para los procesos de fondo compartidos por todas las sesiones (réplica local y almacén
+    en tiempo real): no tienen JWT de usuario y, con la clave anónima, las políticas RLS les
+    devolverían las tablas vacías. Nunca se usa para las consultas de las páginas.
+    """
+    service_key = st.secrets.get("supabase_service_role_key")
+    return create_supabase_client(service_key) if service_key else None
+
+_client_override = None # Cliente sustituto (p. ej. el backend falso de los benchmarks)
+
+def use_client(client):
+    """
+    Sustituye el cliente de todas las sesiones por `client` (None restaura el comportamiento normal).
+    Pensado para benchmarks y pruebas sin red.
+    """
+    global _client_override
+    _client_override = client
+
+def get_session_client() -> "Client":
+    """
+    Devuelve el cliente de la sesión del navegador actual: el creado al hacer login, ligado
+    al JWT de ese usuario. Si no hay sesión iniciada, devuelve el cliente anónimo compartido.
+    """
+    if _client_override is not None:
+        return _client_override
+    client = st.session_state.get("supabase_session_client")
+    return client if client is not None else get_supabase_client()
+
+class _SessionClientProxy:
+    """
+    Delega cada acceso en el cliente de la sesión actual, para poder importarlo a nivel de módulo.
+    Si la instrumentación está activa, las peticiones pasan por InstrumentedClient.
+    """
+
+    def __getattr__(self, name):
+        client = get_session_client()
+        if instrumentation_enabled():
+            client = InstrumentedClient(client)
+        return getattr(client, name)
 
-supabase_client = get_supabase_client() # Instancia global del cliente para usar en toda la app
+supabase_client = _SessionClientProxy() # Instancia global para usar en toda la app (resuelve el cliente por sesión)
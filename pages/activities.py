@@ -1,39 +1,53 @@
 # pages/activities.py
 import streamlit as st
+from auth.auth_controller import require_login
 from database.supabase_client import supabase_client
+from database.instrumentation import begin_rerun
+from database.query_cache import cached_query, invalidate_tables
+from database.realtime import get_live_store
+from database.replica import get_replica, render_replica_status, write_or_queue
 
 st.set_page_config(page_title="Gestión de Actividades", page_icon="🏋️")
+begin_rerun("activities") # Agrupa las peticiones de este rerun para el panel de depuración
 
-# --- Verificar si el usuario está logueado ---
-if 'supabase_session' not in st.session_state or not st.session_state.supabase_session:
-    st.error("Debes iniciar sesión para acceder a esta página.")
-    st.stop()
+# --- Verificar si el usuario está logueado (y renovar el token antes de consultar) ---
+require_login()
+render_replica_status() # Modo sin conexión y escrituras en cola (si la réplica local está activa)
 
 st.title("🏋️ Gestión de Actividades del Gimnasio")
 
+live_store = get_live_store() # None si el almacén en tiempo real no está activado
+replica = get_replica() # None si la réplica local no está activada
+
 # --- Función para obtener las actividades desde Supabase ---
-@st.cache_data(ttl=60)  # Cachear por 60 segundos para no sobrecargar la DB en cada rerun
+@cached_query("activities", ttl=60)  # Cachear por 60 segundos para no sobrecargar la DB en cada rerun
 def get_activities_from_supabase():
     """
     Obtiene todas las actividades de la tabla 'activities' desde Supabase.
     Retorna una lista de diccionarios con la información de las actividades.
+    Lanza RuntimeError si la consulta falla (una lista vacía quedaría cacheada).
     """
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    if live_store is not None and live_store.is_ready():
+        return live_store.rows("activities") # Lectura de memoria: el almacén se mantiene al día con los cambios
+    if replica is not None and replica.is_ready():
+        return replica.activities() # Lectura local: la réplica se sincroniza en segundo plano
     try:
         response = supabase_client.table("activities").select("*").execute()
-        if response.error:
-            st.error(f"Error al obtener actividades: {response.error.message}")
-            return []
-        return response.data
-    except Exception as e:
-        st.error(f"Error inesperado al obtener actividades: {e}")
-        return []
+    except APIError as e:
+        raise RuntimeError(e.message) from e
+    return response.data
 
 # --- Mostrar actividades existentes ---
 st.subheader("Actividades Existentes")
-activities = get_activities_from_supabase()
+try:
+    activities = get_activities_from_supabase()
+except Exception as e:
+    st.error(f"Error inesperado al obtener actividades: {e}")
+    activities = None
 if activities:
     st.dataframe(activities, hide_index=True) # Muestra las actividades en una tabla Streamlit
-else:
+elif activities is not None:
     st.info("No hay actividades registradas aún.")
 
 st.markdown("---")
@@ -49,13 +63,15 @@ with st.form("add_activity_form"):
         if new_activity_name:
             try:
                 # Insertar la nueva actividad en la tabla 'activities'
-                response = supabase_client.table("activities").insert({"name": new_activity_name, "description": new_activity_description}).execute()
-                if response.error:
-                    st.error(f"Error al añadir actividad: {response.error.message}")
+                _, queued = write_or_queue("activities", {"name": new_activity_name, "description": new_activity_description})
+                invalidate_tables("activities") # Invalidar solo las consultas que dependen de actividades
+                if queued:
+                    st.warning(f"Sin conexión: la actividad '{new_activity_name}' se ha guardado en cola y se enviará al recuperar la conexión.")
                 else:
                     st.success(f"Actividad '{new_activity_name}' añadida correctamente!")
-                    st.cache_data.clear() # Limpiar el cache para que se recarguen las actividades
                     st.rerun() # Recargar la página para mostrar la nueva actividad en la tabla
+            except RuntimeError as e:
+                st.error(f"Error al añadir actividad: {e}")
             except Exception as e:
                 st.error(f"Error inesperado al añadir actividad: {e}")
         else:
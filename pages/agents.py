@@ -1,55 +1,108 @@
 # pages/agents.py
 import streamlit as st
-from database.supabase_client import supabase_client
-from utils.constants import SECTIONS_LIST, GROUPS_LIST
+from auth.auth_controller import require_login
+from database.instrumentation import begin_rerun
+from database.query_cache import invalidate_tables
+from database.agents_search import NAME_SEARCH_MIN_CHARS, SEARCH_PAGE_SIZE, search_agents
+from database.agent_import import IMPORT_COLUMNS, NIP_PATTERN, import_agents
+from database.replica import get_replica, render_replica_status, write_or_queue
+from database.reference_data import get_reference_data_or_empty
 
 st.set_page_config(page_title="Gestión de Agentes", page_icon="👮")
+begin_rerun("agents") # Agrupa las peticiones de este rerun para el panel de depuración
 
-# --- Verificar si el usuario está logueado ---
-if 'supabase_session' not in st.session_state or not st.session_state.supabase_session:
-    st.error("Debes iniciar sesión para acceder a esta página.")
-    st.stop()
+# --- Verificar si el usuario está logueado (y renovar el token antes de consultar) ---
+require_login()
+render_replica_status() # Modo sin conexión y escrituras en cola (si la réplica local está activa)
 
 st.title("👮 Gestión de Agentes")
 
-# --- Función para obtener los agentes desde Supabase ---
-@st.cache_data(ttl=60)
-def get_agents_from_supabase():
-    """
-    Obtiene todos los agentes de la tabla 'agents' desde Supabase.
-    Retorna una lista de diccionarios con la información de los agentes.
-    """
-    try:
-        response = supabase_client.table("agents").select("*").execute()
-        if response.error:
-            st.error(f"Error al obtener agentes: {response.error.message}")
-            return []
-        return response.data
-    except Exception as e:
-        st.error(f"Error inesperado al obtener agentes: {e}")
-        return []
+reference_data = get_reference_data_or_empty() # Secciones y grupos (compartidos por todas las sesiones)
 
-# --- Mostrar agentes existentes ---
+# --- Buscar agentes registrados (búsqueda en el servidor, paginada) ---
 st.subheader("Agentes Registrados")
-agents = get_agents_from_supabase()
+search_col, section_col, group_col, monitor_col = st.columns([3, 2, 1, 1])
+with search_col:
+    search_query = st.text_input(
+        "Buscar", placeholder="NIP, nombre o apellidos", key="agents_search_query",
+        help=f"Los nombres y apellidos se buscan a partir de {NAME_SEARCH_MIN_CHARS} caracteres; con menos, solo el NIP",
+    )
+with section_col:
+    search_section = st.selectbox("Sección", options=[""] + reference_data["sections"], key="agents_search_section")
+with group_col:
+    search_group = st.selectbox("Grupo", options=[""] + reference_data["groups"], key="agents_search_group")
+with monitor_col:
+    search_monitors_only = st.checkbox("Solo monitores", key="agents_search_monitors")
+
+# La página se reinicia al cambiar cualquier criterio de búsqueda
+search_key = (search_query.strip(), search_section, search_group, search_monitors_only)
+if st.session_state.get("agents_search_key") != search_key:
+    st.session_state.agents_search_key = search_key
+    st.session_state.agents_search_page = 0
+search_page = st.session_state.agents_search_page
+
+try:
+    agents, total_agents = search_agents(
+        search_query.strip(), search_section or None, search_group or None, search_monitors_only, search_page
+    )
+except Exception as e:
+    st.error(f"Error inesperado al buscar agentes: {e}")
+    agents, total_agents = [], 0
+
 if agents:
     st.dataframe(agents, hide_index=True)
+    page_count = (total_agents + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+    nav_prev, nav_page, nav_next = st.columns([1, 2, 1])
+    with nav_prev:
+        if st.button("← Anterior", disabled=search_page == 0, use_container_width=True):
+            st.session_state.agents_search_page -= 1
+            st.rerun()
+    with nav_page:
+        st.caption(f"Página {search_page + 1} de {page_count} · {total_agents} agentes")
+    with nav_next:
+        if st.button("Siguiente →", disabled=search_page + 1 >= page_count, use_container_width=True):
+            st.session_state.agents_search_page += 1
+            st.rerun()
+elif any(search_key):
+    st.info("Ningún agente coincide con la búsqueda.")
 else:
     st.info("No hay agentes registrados aún.")
 
 st.markdown("---")
 
+# --- Importación masiva de agentes desde CSV/Excel ---
+st.subheader("Importar Agentes desde Fichero")
+st.caption(f"Columnas admitidas: {', '.join(IMPORT_COLUMNS)}. Los agentes con un NIP ya registrado se actualizan (solo las columnas incluidas en el fichero).")
+uploaded_file = st.file_uploader("Fichero CSV o Excel", type=["csv", "xlsx"], key="agents_import_file")
+if uploaded_file is not None and st.button("Importar Agentes"):
+    try:
+        with st.spinner("Importando agentes..."):
+            saved, import_errors = import_agents(uploaded_file)
+        if saved:
+            invalidate_tables("agents") # Una sola invalidación para toda la importación
+            replica = get_replica()
+            if replica is not None:
+                replica.request_sync() # La importación no pasa por la réplica: traer los cambios ya
+            st.success(f"{saved} agentes importados correctamente.")
+        if import_errors:
+            st.warning(f"{len(import_errors)} filas no se han importado:")
+            st.dataframe(import_errors, hide_index=True)
+    except Exception as e:
+        st.error(f"Error inesperado al importar agentes: {e}")
+
+st.markdown("---")
+
 # --- Formulario para registrar un nuevo agente ---
 st.subheader("Registrar Nuevo Agente")
 with st.form("register_agent_form"):
     col1, col2 = st.columns(2) # Dividir el formulario en 2 columnas para mejor layout
 
     with col1:
-        agent_nip = st.text_input("NIP (6 dígitos)", max_chars=6, min_chars=6, required=True, help="Número de Identificación Profesional (6 dígitos)")
+        agent_nip = st.text_input("NIP (6 dígitos)", max_chars=6, required=True, help="Número de Identificación Profesional (6 dígitos)")
         agent_name = st.text_input("Nombre", required=True)
         agent_surname = st.text_input("Apellidos", required=True)
-        agent_section = st.selectbox("Sección", options=[""] + SECTIONS_LIST, index=0, help="Sección a la que pertenece el agente (opcional)") # "" para opción vacía inicial
-        agent_group = st.selectbox("Grupo", options=[""] + GROUPS_LIST, index=0, help="Grupo del agente (opcional)") # "" para opción vacía inicial
+        agent_section = st.selectbox("Sección", options=[""] + reference_data["sections"], index=0, help="Sección a la que pertenece el agente (opcional)") # "" para opción vacía inicial
+        agent_group = st.selectbox("Grupo", options=[""] + reference_data["groups"], index=0, help="Grupo del agente (opcional)") # "" para opción vacía inicial
 
     with col2:
         agent_email = st.text_input("Email", type="email", help="Email del agente (opcional)")
@@ -59,7 +112,9 @@ with st.form("register_agent_form"):
     submit_button = st.form_submit_button("Registrar Agente")
 
     if submit_button:
-        if agent_nip and agent_name and agent_surname: # NIP, Nombre y Apellidos son obligatorios
+        if agent_nip and not NIP_PATTERN.match(agent_nip): # text_input solo limita la longitud máxima
+            st.warning("El NIP debe tener 6 dígitos.")
+        elif agent_nip and agent_name and agent_surname: # NIP, Nombre y Apellidos son obligatorios
             try:
                 # Insertar el nuevo agente en la tabla 'agents'
                 new_agent_data = {
@@ -72,13 +127,15 @@ with st.form("register_agent_form"):
                     "phone": agent_phone if agent_phone else None,          # Enviar None si está vacío
                     "is_monitor": is_monitor
                 }
-                response = supabase_client.table("agents").insert(new_agent_data).execute()
-                if response.error:
-                    st.error(f"Error al registrar agente: {response.error.message}")
+                _, queued = write_or_queue("agents", new_agent_data)
+                invalidate_tables("agents") # Invalidar solo las consultas que dependen de agentes
+                if queued:
+                    st.warning(f"Sin conexión: el agente '{agent_name} {agent_surname}' se ha guardado en cola y se enviará al recuperar la conexión.")
                 else:
                     st.success(f"Agente '{agent_name} {agent_surname}' registrado correctamente!")
-                    st.cache_data.clear() # Limpiar el cache para que se recarguen los agentes
                     st.rerun() # Recargar la página para mostrar el nuevo agente en la tabla
+            except RuntimeError as e:
+                st.error(f"Error al registrar agente: {e}")
             except Exception as e:
                 st.error(f"Error inesperado al registrar agente: {e}")
         else:
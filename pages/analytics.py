@@ -0,0 +1,125 @@
+# pages/analytics.py
+import datetime
+import streamlit as st
+from auth.auth_controller import require_login
+from database.supabase_client import get_session_client
+from database.instrumentation import begin_rerun
+from database.replica import render_replica_status
+from database.fanout import run_concurrently
+from database.analytics import (
+    get_usage_by_month, get_monitor_load, get_slot_utilisation, export_attendance_csv, export_attendance_parquet,
+)
+from utils.reservations_frame import WEEKDAY_NAMES, archive_cutoff
+
+st.set_page_config(page_title="Analítica de Uso", page_icon="📈", layout="wide")
+begin_rerun("analytics") # Agrupa las peticiones de este rerun para el panel de depuración
+
+# --- Verificar si el usuario está logueado (y renovar el token antes de consultar) ---
+require_login()
+render_replica_status() # Modo sin conexión y escrituras en cola (si la réplica local está activa)
+
+st.title("📈 Analítica de Uso del Gimnasio")
+
+# --- Rango del informe ---
+today = datetime.date.today()
+date_range = st.date_input("Periodo", value=(today.replace(day=1) - datetime.timedelta(days=180), today), key="analytics_range")
+if len(date_range) != 2: # Mientras se elige el rango (o si se ha borrado) no hay rango completo
+    st.info("Elige la fecha inicial y la final del periodo.")
+    st.stop()
+start_date, end_date = (d.strftime("%Y-%m-%d") for d in date_range)
+history_since = archive_cutoff(today)
+include_history = st.checkbox(
+    "Incluir histórico",
+    value=False,
+    help=f"Las reservas anteriores al {history_since:%d/%m/%Y} están archivadas y solo se consultan si se marca esta opción (más lento)",
+    key="analytics_include_history",
+)
+if date_range[0] < history_since and not include_history:
+    st.info(f"El periodo empieza antes del {history_since:%d/%m/%Y}: marca «Incluir histórico» para contar las reservas archivadas.")
+
+# --- Agregados calculados en el servidor (las tres llamadas en paralelo) ---
+results = run_concurrently({
+    "usage": lambda: get_usage_by_month(start_date, end_date, include_history),
+    "monitor_load": lambda: get_monitor_load(start_date, end_date, include_history),
+    "slot_utilisation": lambda: get_slot_utilisation(start_date, end_date, include_history),
+})
+try:
+    usage = results["usage"]
+    monitor_load = results["monitor_load"]
+    slot_utilisation = results["slot_utilisation"]
+except Exception as e:
+    st.error(f"Error al obtener la analítica: {e}")
+    st.stop()
+
+usage_tab, monitors_tab, slots_tab = st.tabs(["Asistencia", "Carga de monitores", "Utilización de turnos"])
+
+with usage_tab:
+    if usage:
+        enrolled = sum(row["enrolled"] for row in usage)
+        attended = sum(row["attended"] for row in usage)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Inscripciones", enrolled)
+        col2.metric("Asistencias", attended)
+        col3.metric("Tasa de asistencia", f"{100 * attended / enrolled:.1f} %" if enrolled else "—")
+        st.dataframe(
+            [
+                {
+                    "Mes": row["month"][:7], "Sección": row["section"], "Grupo": row["grupo"], "Actividad": row["activity"],
+                    "Sesiones": row["sessions"], "Inscritos": row["enrolled"], "Asistentes": row["attended"],
+                    "Asistencia (%)": row["attendance_rate"],
+                }
+                for row in usage
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+    else:
+        st.info("No hay asistencia registrada en el periodo.")
+
+with monitors_tab:
+    if monitor_load:
+        st.bar_chart(monitor_load, x="monitor", y=["sessions", "attended"], horizontal=True)
+        st.dataframe(
+            [{"Monitor": r["monitor"], "Sesiones": r["sessions"], "Inscritos": r["enrolled"], "Asistentes": r["attended"]} for r in monitor_load],
+            hide_index=True,
+        )
+    else:
+        st.info("No hay sesiones en el periodo.")
+
+with slots_tab:
+    if slot_utilisation:
+        st.dataframe(
+            [
+                {"Día": WEEKDAY_NAMES[r["weekday"] - 1], "Turno": r["time_slot"], "Sesiones": r["sessions"],
+                 "Asistentes": r["attended"], "Asistentes por sesión": r["avg_attended"]}
+                for r in slot_utilisation
+            ],
+            hide_index=True,
+        )
+    else:
+        st.info("No hay sesiones en el periodo.")
+
+st.markdown("---")
+
+# --- Exportación del detalle de asistencia ---
+st.subheader("Exportar Detalle de Asistencia")
+st.caption("El fichero se genera al pulsar el botón, paginando la consulta en el servidor sin cargarla entera en memoria.")
+export_client = get_session_client() # La exportación se ejecuta en otro hilo, sin acceso a st.session_state
+file_stem = f"asistencia_{start_date}_{end_date}" + ("_historico" if include_history else "")
+csv_col, parquet_col = st.columns(2)
+with csv_col:
+    st.download_button(
+        "Descargar CSV",
+        data=lambda: export_attendance_csv(export_client, start_date, end_date, include_history),
+        file_name=f"{file_stem}.csv",
+        mime="text/csv",
+        use_container_width=True,
+    )
+with parquet_col:
+    st.download_button(
+        "Descargar Parquet",
+        data=lambda: export_attendance_parquet(export_client, start_date, end_date, include_history),
+        file_name=f"{file_stem}.parquet",
+        mime="application/vnd.apache.parquet",
+        use_container_width=True,
+    )
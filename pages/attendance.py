@@ -0,0 +1,166 @@
+# pages/attendance.py
+import datetime
+import streamlit as st
+from auth.auth_controller import require_login
+from database.supabase_client import supabase_client
+from database.instrumentation import begin_rerun
+from database.query_cache import cached_query, invalidate_tables
+from database.replica import get_replica, render_replica_status
+from database.agents_search import TYPEAHEAD_MIN_CHARS, search_agents
+from utils.reservations_frame import archive_cutoff
+
+st.set_page_config(page_title="Control de Asistencia", page_icon="✅")
+begin_rerun("attendance") # Agrupa las peticiones de este rerun para el panel de depuración
+
+# --- Verificar si el usuario está logueado (y renovar el token antes de consultar) ---
+require_login()
+render_replica_status() # Modo sin conexión y escrituras en cola (si la réplica local está activa)
+
+st.title("✅ Control de Asistencia")
+
+# --- Funciones para obtener datos desde Supabase ---
+@cached_query("gym_reservations", "activities", "agents", ttl=60)
+def get_reservations_for_date(reservation_date):
+    """
+    Obtiene las reservas de un día para el selector de sesión (de la réplica local si la cubre).
+    Lanza RuntimeError si la consulta falla: una lista vacía quedaría cacheada.
+    """
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    replica = get_replica()
+    if replica is not None and replica.covers(reservation_date):
+        return replica.reservations_page(reservation_date, reservation_date)
+    try:
+        response = supabase_client.table("gym_reservations").select(
+            "id, time_slot, activities(name), agents(name, surname)"
+        ).eq("reservation_date", reservation_date).order("time_slot").execute()
+    except APIError as e:
+        raise RuntimeError(e.message) from e
+    return response.data
+
+@cached_query("agents", "agent_activities", ttl=60)
+def get_enrolled_agents(gym_reservation_id):
+    """
+    Obtiene en una sola consulta los agentes inscritos en la sesión con su asistencia, desde
+    `agent_activities`: solo se leen las inscripciones de la sesión, no la tabla de agentes
+    entera (que PostgREST cortaría en su límite de filas por respuesta).
+    Lanza RuntimeError si la consulta falla: una lista vacía quedaría cacheada.
+    """
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    try:
+        response = supabase_client.table("agent_activities").select(
+            "attended, agents(id, nip, name, surname, section, grupo)"
+        ).eq("gym_reservation_id", gym_reservation_id).execute()
+    except APIError as e:
+        raise RuntimeError(e.message) from e
+    enrolled = [{**row["agents"], "attended": row["attended"]} for row in response.data]
+    return sorted(enrolled, key=lambda agent: (agent["surname"], agent["name"]))
+
+def save_attendance(gym_reservation_id, changes, removed_agent_ids):
+    """
+    Guarda la asistencia con un único upsert sobre (agent_id, gym_reservation_id) y, solo
+    si se ha desinscrito a alguien, un único borrado. Lanza RuntimeError si Supabase devuelve un error.
+    """
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    try:
+        if changes:
+            supabase_client.table("agent_activities").upsert(
+                [{"agent_id": agent_id, "gym_reservation_id": gym_reservation_id, "attended": attended} for agent_id, attended in changes],
+                on_conflict="agent_id,gym_reservation_id",
+            ).execute()
+        if removed_agent_ids:
+            supabase_client.table("agent_activities").delete().eq(
+                "gym_reservation_id", gym_reservation_id
+            ).in_("agent_id", removed_agent_ids).execute()
+    except APIError as e:
+        raise RuntimeError(e.message) from e
+
+# --- Selección de la sesión ---
+session_date = st.date_input("Fecha de la sesión", value=datetime.date.today())
+history_since = archive_cutoff(datetime.date.today())
+if session_date < history_since: # Solo se leen (y editan) las tablas calientes
+    st.info(f"Las sesiones anteriores al {history_since:%d/%m/%Y} están archivadas y su asistencia ya no se puede editar. Consúltala en Analítica con «Incluir histórico».")
+    st.stop()
+try:
+    sessions = get_reservations_for_date(session_date.strftime("%Y-%m-%d"))
+except Exception as e:
+    st.error(f"Error al obtener las reservas: {e}")
+    st.stop()
+if not sessions:
+    st.info("No hay reservas de gimnasio para esta fecha.")
+    st.stop()
+
+session = st.selectbox(
+    "Sesión",
+    options=sessions,
+    format_func=lambda x: f"{x['time_slot']} · {x['activities']['name']} · {x['agents']['name']} {x['agents']['surname']}",
+)
+
+# --- Inscritos en la sesión y, para inscribir a más, una página de resultados de búsqueda ---
+try:
+    enrolled = get_enrolled_agents(session["id"])
+except Exception as e:
+    st.error(f"Error al obtener los agentes inscritos: {e}")
+    st.stop()
+
+agent_search = st.text_input(
+    "Inscribir agentes",
+    placeholder="NIP, nombre o apellidos",
+    help=f"Escribe al menos {TYPEAHEAD_MIN_CHARS} caracteres y pulsa Intro",
+    key="attendance_agent_search",
+).strip()
+candidates = []
+if len(agent_search) >= TYPEAHEAD_MIN_CHARS:
+    try:
+        found, total_found = search_agents(agent_search)
+    except Exception as e:
+        st.error(f"Error inesperado al buscar agentes: {e}")
+        found, total_found = [], 0
+    enrolled_ids = {agent["id"] for agent in enrolled}
+    candidates = [agent for agent in found if agent["id"] not in enrolled_ids]
+    if total_found > len(found):
+        st.caption(f"Se muestran {len(found)} de {total_found} coincidencias: afina la búsqueda para ver el resto.")
+
+rows = [
+    {
+        "id": agent["id"],
+        "Inscrito": "attended" in agent, # Los candidatos de la búsqueda no traen asistencia
+        "Asistió": bool(agent.get("attended")),
+        "NIP": agent["nip"],
+        "Nombre": f"{agent['name']} {agent['surname']}",
+        "Sección": agent["section"],
+        "Grupo": agent["grupo"],
+    }
+    for agent in enrolled + candidates
+]
+if not rows:
+    st.info("No hay agentes inscritos en esta sesión. Búscalos arriba para inscribirlos.")
+    st.stop()
+
+with st.form("attendance_form"):
+    edited_rows = st.data_editor(
+        rows,
+        hide_index=True,
+        column_order=["Inscrito", "Asistió", "NIP", "Nombre", "Sección", "Grupo"],
+        disabled=["NIP", "Nombre", "Sección", "Grupo"],
+        key=f"attendance_editor_{session['id']}_{agent_search}", # Las filas cambian con la búsqueda
+    )
+    submit_button = st.form_submit_button("Guardar Asistencia")
+
+    if submit_button:
+        changes, removed_agent_ids = [], []
+        for original, edited in zip(rows, edited_rows):
+            enrolled = edited["Inscrito"] or edited["Asistió"] # Marcar asistencia implica inscripción
+            if enrolled and (not original["Inscrito"] or original["Asistió"] != edited["Asistió"]):
+                changes.append((edited["id"], edited["Asistió"]))
+            elif not enrolled and original["Inscrito"]:
+                removed_agent_ids.append(edited["id"])
+        if not changes and not removed_agent_ids:
+            st.info("No hay cambios que guardar.")
+        else:
+            try:
+                save_attendance(session["id"], changes, removed_agent_ids)
+                st.success("Asistencia guardada correctamente!")
+                invalidate_tables("agent_activities") # Invalidar solo las consultas que dependen de la asistencia
+                st.rerun() # Recargar para mostrar la asistencia guardada
+            except Exception as e:
+                st.error(f"Error inesperado al guardar la asistencia: {e}")
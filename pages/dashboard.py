@@ -1,62 +1,99 @@
 # pages/dashboard.py
+import datetime
 import streamlit as st
+from auth.auth_controller import require_login
 from database.supabase_client import supabase_client
+from database.instrumentation import begin_rerun
+from database.fanout import run_concurrently
+from database.query_cache import cached_query
+from database.reservations import get_reservations_in_range
+from database.replica import render_replica_status
+from utils.constants import TIME_SLOTS, ARCHIVE_AFTER_MONTHS
+from utils.reservations_frame import build_reservations_frame, build_timetable, week_range
 
 st.set_page_config(page_title="Panel de Control", page_icon="📊")
+begin_rerun("dashboard") # Agrupa las peticiones de este rerun para el panel de depuración
 
-# --- Verificar si el usuario está logueado ---
-if 'supabase_session' not in st.session_state or not st.session_state.supabase_session:
-    st.error("Debes iniciar sesión para acceder a esta página.")
-    st.stop()
+# --- Verificar si el usuario está logueado (y renovar el token antes de consultar) ---
+user = require_login()
+render_replica_status() # Modo sin conexión y escrituras en cola (si la réplica local está activa)
 
 st.title("📊 Panel de Control del Gimnasio")
 
-# --- Obtener información del usuario autenticado ---
-user = st.session_state.supabase_session.user
-if user:
-    st.write(f"¡Bienvenido/a, **{user.email}**!") # Saludo personalizado con el email del usuario
-else:
-    st.warning("No se pudo obtener la información del usuario.")
+st.write(f"¡Bienvenido/a, **{user.email}**!") # Saludo personalizado con el email del usuario
 
 st.markdown("---")
 
-# --- Métricas clave (Ejemplo: conteo de actividades y agentes) ---
+# --- Estadísticas agregadas en el servidor (una sola llamada) ---
+@cached_query("activities", "agents", "gym_reservations", ttl=15) # TTL corto: el panel es la página de entrada
+def get_dashboard_stats():
+    """
+    Obtiene conteos, ocupación semanal por turno y últimas reservas mediante la
+    función `get_dashboard_stats` de la base de datos.
+    Retorna un diccionario; lanza RuntimeError si la consulta falla.
+    """
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    try:
+        response = supabase_client.rpc("get_dashboard_stats", {"latest_limit": 5}).execute()
+    except APIError as e:
+        raise RuntimeError(e.message) from e
+    return response.data
+
+# --- Consultas de la página en paralelo: la espera es la de la más lenta ---
+week_start, week_end = week_range(datetime.date.today())
+results = run_concurrently({
+    "stats": get_dashboard_stats,
+    "week_rows": lambda: get_reservations_in_range(week_start.strftime("%Y-%m-%d"), week_end.strftime("%Y-%m-%d")),
+})
+try:
+    stats = results["stats"]
+except Exception as e:
+    st.error(f"Error al obtener las estadísticas: {e}")
+    st.stop()
+if not stats:
+    st.stop()
+
+# --- Métricas clave ---
 col1, col2 = st.columns(2)
 
 with col1:
-    activities_count = supabase_client.table("activities").select("*", count="exact").execute().count
-    st.metric(label="Actividades Registradas", value=activities_count)
+    st.metric(label="Actividades Registradas", value=stats["activities_count"])
 
 with col2:
-    agents_count = supabase_client.table("agents").select("*", count="exact").execute().count
-    st.metric(label="Agentes Registrados", value=agents_count)
+    st.metric(label="Agentes Registrados", value=stats["agents_count"])
 
-st.markdown("---")
+# --- Ocupación de la semana actual por turno ---
+st.subheader("Ocupación de esta semana")
+occupancy = {row["time_slot"]: row for row in stats["week_occupancy"]}
+slot_columns = st.columns(len(TIME_SLOTS))
+for slot_column, slot in zip(slot_columns, TIME_SLOTS):
+    slot_stats = occupancy.get(slot, {"reservations": 0, "days_booked": 0})
+    with slot_column:
+        st.metric(label=slot, value=f"{slot_stats['days_booked']}/7 días", help=f"{slot_stats['reservations']} reservas en el turno")
 
-# --- Últimas Reservas de Gimnasio (Ejemplo) ---
-st.subheader("Últimas Reservas de Gimnasio")
+# --- Horario de la semana actual (mismo constructor que la página de reservas) ---
 try:
-    response = supabase_client.table("gym_reservations").select(
-        "id, reservation_date, time_slot, activities(name), agents(name, surname)", order_by="created_at", ascending=False, limit=5 # Ordenar por fecha de creación descendente y limitar a 5
-    ).execute()
-    reservations = response.data
-    if reservations:
-        import pandas as pd # Importar pandas aquí para no cargarlo al inicio si no es necesario
-        df_reservations = pd.DataFrame(reservations)
-        df_reservations.rename(columns={
-            'reservation_date': 'Fecha',
-            'time_slot': 'Turno',
-            'activities': 'Actividad',
-            'agents': 'Monitor'
-        }, inplace=True)
-        df_reservations['Actividad'] = df_reservations['Actividad'].apply(lambda x: x['name'])
-        df_reservations['Monitor'] = df_reservations['Monitor'].apply(lambda x: f"{x['name']} {x['surname']}")
-        df_reservations = df_reservations[['Fecha', 'Turno', 'Actividad', 'Monitor']]
-        st.dataframe(df_reservations, hide_index=True)
-    else:
-        st.info("No hay reservas de gimnasio recientes.")
+    week_rows = results["week_rows"]
+    st.dataframe(build_timetable(build_reservations_frame(week_rows), week_start, week_end), use_container_width=True)
 except Exception as e:
-    st.error(f"Error al obtener las últimas reservas: {e}")
+    st.error(f"Error al obtener el horario de la semana: {e}")
+
+st.markdown("---")
+
+# --- Últimas Reservas de Gimnasio ---
+st.subheader("Últimas Reservas de Gimnasio")
+st.caption(f"Las reservas del panel son de los últimos {ARCHIVE_AFTER_MONTHS} meses; las anteriores están archivadas (Analítica → «Incluir histórico»).")
+latest_reservations = stats["latest_reservations"]
+if latest_reservations:
+    st.dataframe(
+        [
+            {"Fecha": r["reservation_date"], "Turno": r["time_slot"], "Actividad": r["activity"], "Monitor": r["monitor"]}
+            for r in latest_reservations
+        ],
+        hide_index=True,
+    )
+else:
+    st.info("No hay reservas de gimnasio recientes.")
 
 st.markdown("---")
 
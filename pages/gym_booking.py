@@ -1,101 +1,302 @@
 # pages/gym_booking.py
+import datetime
 import streamlit as st
+from auth.auth_controller import require_login
 from database.supabase_client import supabase_client
-from utils.constants import TIME_SLOTS
-import pandas as pd # Importamos pandas para formatear la tabla de reservas
+from database.instrumentation import begin_rerun
+from database.fanout import run_concurrently
+from database.query_cache import cached_query, invalidate_tables
+from database.realtime import get_live_store
+from database.replica import get_replica, render_replica_status
+from database.agents_search import TYPEAHEAD_MIN_CHARS, search_monitors
+from database.reference_data import get_reference_data
+from database.reservations import expand_weekly, plan_reservations, insert_reservations, get_reservations_in_range, get_monitor_availability, ReservationConflict
+from utils.constants import TIME_SLOTS, RESERVATIONS_PAGE_SIZE
+from utils.reservations_frame import WEEKDAY_NAMES, archive_cutoff, build_reservations_frame, build_timetable, week_range, month_range
 
 st.set_page_config(page_title="Reservas del Gimnasio", page_icon="🗓️")
+begin_rerun("gym_booking") # Agrupa las peticiones de este rerun para el panel de depuración
 
-# --- Verificar si el usuario está logueado ---
-if 'supabase_session' not in st.session_state or not st.session_state.supabase_session:
-    st.error("Debes iniciar sesión para acceder a esta página.")
-    st.stop()
+# --- Verificar si el usuario está logueado (y renovar el token antes de consultar) ---
+require_login()
+render_replica_status() # Modo sin conexión y escrituras en cola (si la réplica local está activa)
 
 st.title("🗓️ Reservas del Gimnasio")
 
+live_store = get_live_store() # None si el almacén en tiempo real no está activado
+replica = get_replica() # None si la réplica local no está activada
+
 # --- Funciones para obtener datos desde Supabase ---
-@st.cache_data(ttl=60)
-def get_activities_from_supabase():
-    """Obtiene todas las actividades para el selector."""
-    response = supabase_client.table("activities").select("id, name").execute()
-    return response.data if not response.error else []
-
-@st.cache_data(ttl=60)
-def get_monitors_from_supabase():
-    """Obtiene todos los monitores (agentes con is_monitor=True) para el selector."""
-    response = supabase_client.table("agents").select("id, name, surname").eq("is_monitor", True).execute()
-    return response.data if not response.error else []
-
-@st.cache_data(ttl=60)
-def get_gym_reservations_from_supabase():
-    """Obtiene todas las reservas de gimnasio para mostrar en la tabla."""
-    response = supabase_client.table("gym_reservations").select(
-        "id, reservation_date, time_slot, notes, activities(name), agents(name, surname)"
-    ).execute()
-    return response.data if not response.error else []
+@cached_query("gym_reservations", "activities", "agents", ttl=60)
+def get_gym_reservations_page(start_date, end_date, cursor=None, page_size=RESERVATIONS_PAGE_SIZE):
+    """
+    Obtiene una página de reservas dentro del rango de fechas [start_date, end_date].
+    Usa paginación por clave (keyset) sobre (reservation_date, time_slot, id): `cursor`
+    es la clave de la última fila de la página anterior, o None para la primera página.
+    Cada combinación de rango y cursor se cachea por separado.
+    Retorna una tupla (filas, cursor_siguiente); cursor_siguiente es None si no hay más páginas.
+    """
+    from postgrest import APIError # Importar aquí: el SDK se carga con el primer cliente
+    if replica is not None and replica.covers(start_date):
+        rows = replica.reservations_page(start_date, end_date, cursor, page_size + 1)
+    else:
+        query = supabase_client.table("gym_reservations").select(
+            "id, reservation_date, time_slot, notes, activities(name), agents(name, surname)"
+        ).gte("reservation_date", start_date).lte("reservation_date", end_date)
+        if cursor:
+            last_date, last_slot, last_id = cursor
+            # Filas estrictamente posteriores a la clave (fecha, turno, id) del cursor
+            query = query.or_(
+                f'reservation_date.gt.{last_date},'
+                f'and(reservation_date.eq.{last_date},time_slot.gt."{last_slot}"),'
+                f'and(reservation_date.eq.{last_date},time_slot.eq."{last_slot}",id.gt.{last_id})'
+            )
+        try:
+            response = query.order("reservation_date").order("time_slot").order("id").limit(page_size + 1).execute() # Una fila extra para saber si hay página siguiente
+        except APIError as e: # Se lanza en lugar de retornar una página vacía, que quedaría cacheada
+            raise RuntimeError(e.message) from e
+        rows = response.data
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        return rows, (last["reservation_date"], last["time_slot"], last["id"])
+    return rows, None
 
 # --- Mostrar reservas existentes ---
 st.subheader("Reservas de Gimnasio Existentes")
-reservations = get_gym_reservations_from_supabase()
-if reservations:
-    # Formatear los datos para pandas DataFrame para mejor visualización
-    df_reservations = pd.DataFrame(reservations)
-    df_reservations.rename(columns={
-        'reservation_date': 'Fecha',
-        'time_slot': 'Turno',
-        'notes': 'Notas',
-        'activities': 'Actividad',
-        'agents': 'Monitor'
-    }, inplace=True)
-    # Extraer nombre de actividad y nombre completo del monitor de los diccionarios anidados
-    df_reservations['Actividad'] = df_reservations['Actividad'].apply(lambda x: x['name'])
-    df_reservations['Monitor'] = df_reservations['Monitor'].apply(lambda x: f"{x['name']} {x['surname']}")
-    df_reservations = df_reservations[['Fecha', 'Turno', 'Actividad', 'Monitor', 'Notas']] # Reordenar columnas
-    st.dataframe(df_reservations, hide_index=True)
+today = datetime.date.today()
+view = st.radio("Vista", ["Lista", "Semana", "Mes"], horizontal=True, key="reservations_view")
+
+if view == "Lista":
+    date_range = st.date_input(
+        "Rango de fechas",
+        value=(today - datetime.timedelta(days=7), today + datetime.timedelta(days=28)),
+        help="Solo se cargan las reservas dentro de este rango",
+        key="reservations_date_range",
+    )
+    if len(date_range) != 2: # Mientras se elige el rango (o si se ha borrado) no hay rango completo
+        st.info("Elige la fecha inicial y la final del rango para ver las reservas.")
+        view_query = None
+    else:
+        range_start, range_end = (d.strftime("%Y-%m-%d") for d in date_range)
+        history_since = archive_cutoff(today)
+        if date_range[0] < history_since: # El listado solo lee las tablas calientes
+            st.caption(f"Las reservas anteriores al {history_since:%d/%m/%Y} están archivadas: consúltalas en Analítica con «Incluir histórico».")
+
+        # Pila de cursores por página; se reinicia al cambiar el rango de fechas
+        if st.session_state.get("reservations_range") != (range_start, range_end):
+            st.session_state.reservations_range = (range_start, range_end)
+            st.session_state.reservations_cursors = [None]
+        cursors = st.session_state.reservations_cursors
+        page_number = len(cursors)
+        view_query = lambda: get_gym_reservations_page(range_start, range_end, cursors[-1])
 else:
-    st.info("No hay reservas de gimnasio registradas aún.")
+    # --- Horario semanal o mensual: solo se carga el rango visible ---
+    reference_date = st.date_input("Mostrar a partir de", value=today, key="timetable_reference_date")
+    start_date, end_date = week_range(reference_date) if view == "Semana" else month_range(reference_date)
+    view_query = lambda: get_reservations_in_range(start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+
+# --- Consultas de la página en paralelo: reservas visibles, datos de referencia y búsqueda de monitor ---
+# El cuadro de búsqueda se dibuja más abajo, pero su valor ya está en el estado de la sesión
+monitor_search = st.session_state.get("monitor_search", "")
+page_queries = {"reference_data": get_reference_data}
+if view_query is not None:
+    page_queries["view"] = view_query
+if len(monitor_search.strip()) >= TYPEAHEAD_MIN_CHARS: # Sin búsqueda, los monitores salen de los datos de referencia
+    page_queries["monitors"] = lambda: search_monitors(monitor_search)
+results = run_concurrently(page_queries)
+
+if view == "Lista" and view_query is not None:
+    try:
+        reservations, next_cursor = results["view"]
+    except Exception as e: # Incluye QueryTimeout: la página sigue con el formulario
+        st.error(f"Error al obtener las reservas: {e}")
+        reservations, next_cursor = [], None
+    if reservations:
+        df_reservations = build_reservations_frame(reservations)
+        st.dataframe(df_reservations[['Fecha', 'Turno', 'Actividad', 'Monitor', 'Notas']], hide_index=True)
+    elif page_number == 1 and "view" not in results.failed():
+        st.info("No hay reservas de gimnasio en el rango seleccionado.")
+
+    # --- Navegación entre páginas ---
+    nav_prev, nav_page, nav_next = st.columns([1, 2, 1])
+    with nav_prev:
+        if st.button("← Anterior", disabled=page_number == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with nav_page:
+        st.caption(f"Página {page_number}")
+    with nav_next:
+        if st.button("Siguiente →", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
+elif view != "Lista":
+    # Con el almacén en tiempo real, el horario se redibuja cada segundo leyendo de memoria
+    @st.fragment(run_every=1 if live_store is not None else None)
+    def show_timetable():
+        try:
+            rows = view_query() # En el rerun completo ya está en la cache: la consulta se ha lanzado arriba
+            st.caption(f"Del {start_date:%d/%m/%Y} al {end_date:%d/%m/%Y} · {len(rows)} reservas · entre paréntesis, agentes inscritos")
+            st.dataframe(build_timetable(build_reservations_frame(rows), start_date, end_date), use_container_width=True)
+        except Exception as e:
+            st.error(f"Error al obtener el horario: {e}")
+
+    show_timetable()
 
 st.markdown("---")
 
 # --- Formulario para crear una nueva reserva ---
 st.subheader("Crear Nueva Reserva de Gimnasio")
-with st.form("create_reservation_form"):
-    activity_options = get_activities_from_supabase()
-    monitor_options = get_monitors_from_supabase()
+try:
+    activity_options = results["reference_data"]["activities"] # Datos de referencia compartidos por todas las sesiones
+except Exception as e:
+    st.error(f"Error al obtener las actividades: {e}")
+    st.stop() # Sin actividades no se puede reservar
+if not activity_options:
+    st.error("No hay actividades disponibles. Regístrelas primero en su página.")
+    st.stop() # Detener si no hay actividades
+
+# Monitor, fecha y turno van fuera del formulario para que los turnos libres se actualicen al cambiarlos
+monitor_search = st.text_input(
+    "Buscar monitor",
+    placeholder="NIP, nombre o apellidos",
+    help=f"Escribe al menos {TYPEAHEAD_MIN_CHARS} caracteres y pulsa Intro",
+    key="monitor_search",
+)
+try:
+    monitor_options = results["monitors"] if "monitors" in page_queries else search_monitors(monitor_search)
+except Exception as e:
+    st.error(f"Error al buscar monitores: {e}")
+    st.stop()
+if not monitor_options:
+    st.error("Ningún monitor coincide con la búsqueda (o no hay monitores registrados).")
+    st.stop() # Detener si no hay monitores que elegir
 
-    if not activity_options or not monitor_options:
-        st.error("No hay actividades o monitores disponibles. Regístrelos primero en sus respectivas páginas.")
-        st.stop() # Detener si no hay actividades o monitores
+col1, col2 = st.columns(2)
+with col1:
+    monitor_id = st.selectbox("Monitor", options=monitor_options, format_func=lambda x: f"{x['name']} {x['surname']}", help="Monitor que imparte la actividad", key="monitor_selector")
+    reservation_date = st.date_input("Fecha de la Reserva", help="Fecha para la reserva del gimnasio", key="reservation_date")
+
+# Ocupación del monitor precargada en una sola consulta (cacheada por monitor y rango); solo para
+# rellenar el formulario: al enviar, plan_reservations comprueba las fechas contra la base de datos
+try:
+    availability = get_monitor_availability(monitor_id['id'], today)
+except Exception as e: # Se puede reservar igualmente: plan_reservations comprueba las fechas al enviar
+    st.warning(f"No se ha podido cargar la disponibilidad del monitor; se muestran todos los turnos: {e}")
+    availability = None
+if availability is not None:
+    free_slots = availability.free_slots(reservation_date) if availability.covers(reservation_date) else TIME_SLOTS
+    next_free = availability.next_free(reservation_date)
+else:
+    free_slots, next_free = TIME_SLOTS, None
+
+with col2:
+    if free_slots:
+        time_slot = st.selectbox("Turno", options=free_slots, help="Solo se muestran los turnos libres del monitor", key="time_slot_selector")
+    else:
+        time_slot = None
+        st.warning("El monitor no tiene turnos libres ese día.")
+    if next_free and (next_free[0] != reservation_date or not free_slots):
+        st.caption(f"Próximo turno libre: {next_free[0]:%d/%m/%Y} · {next_free[1]}")
+
+if availability is not None:
+    with st.expander("Disponibilidad del monitor (próximas 4 semanas)"):
+        st.dataframe(
+            [
+                {"Día": f"{WEEKDAY_NAMES[date.weekday()]} {date:%d/%m}", **{slot: "🟢" if free else "🔴" for slot, free in slots.items()}, "Libres": sum(slots.values())}
+                for date, slots in availability.free_capacity(today, 28)
+            ],
+            hide_index=True,
+        )
+
+def create_reservations(new_reservations):
+    """Inserta las reservas ya comprobadas en una sola petición y recarga la página para mostrarlas."""
+    try:
+        _, queued = insert_reservations(new_reservations) # Una sola inserción para toda la serie
+    except ReservationConflict:
+        invalidate_tables("gym_reservations") # La ocupación precargada estaba desfasada
+        st.error("Alguno de los turnos se ha reservado mientras tanto; no se ha creado ninguna reserva. Revisa la disponibilidad y vuelve a intentarlo.")
+        return
+    invalidate_tables("gym_reservations") # Invalidar solo las consultas que dependen de reservas
+    if queued:
+        st.session_state.reservation_notice = ("warning", f"Sin conexión: {len(new_reservations)} reserva(s) guardada(s) en cola. Se enviarán al recuperar la conexión.")
+    else:
+        st.session_state.reservation_notice = ("success", f"{len(new_reservations)} reserva(s) creada(s) correctamente!")
+    st.rerun() # Recargar para mostrar la nueva reserva (el aviso se muestra tras la recarga)
+
+
+def plan_or_create(dates, time_slot, activity, monitor, notes):
+    """
+    Comprueba las fechas y crea las reservas si todas están libres. Si alguna está ocupada no
+    se escribe nada: el plan se guarda en la sesión hasta que el usuario confirme el resto.
+    """
+    new_reservations, conflicts = plan_reservations(dates, time_slot, activity['id'], monitor['id'], notes)
+    if not new_reservations:
+        st.session_state.pop("pending_reservation_plan", None)
+        st.error("No se ha creado ninguna reserva: todas las fechas están ocupadas.")
+    elif conflicts:
+        st.session_state.pending_reservation_plan = {
+            "dates": [d for d in dates if d not in conflicts],
+            "conflicts": conflicts,
+            "time_slot": time_slot,
+            "activity": activity,
+            "monitor": monitor,
+            "notes": notes,
+        }
+        st.rerun() # Mostrar la confirmación
+    else:
+        st.session_state.pop("pending_reservation_plan", None)
+        create_reservations(new_reservations)
 
-    col1, col2 = st.columns(2)
 
-    with col1:
-        activity_id = st.selectbox("Actividad", options=activity_options, format_func=lambda x: x['name'], help="Actividad a realizar", key="activity_selector", required=True)
-        monitor_id = st.selectbox("Monitor", options=monitor_options, format_func=lambda x: f"{x['name']} {x['surname']}", help="Monitor que imparte la actividad", key="monitor_selector", required=True)
-        reservation_date = st.date_input("Fecha de la Reserva", help="Fecha para la reserva del gimnasio", required=True)
+notice = st.session_state.pop("reservation_notice", None) # Resultado de la última inserción, antes de la recarga
+if notice:
+    getattr(st, notice[0])(notice[1])
 
-    with col2:
-        time_slot = st.selectbox("Turno", options=TIME_SLOTS, help="Turno de la reserva", required=True)
+with st.form("create_reservation_form"):
+    col3, col4 = st.columns(2)
+
+    with col3:
+        activity_id = st.selectbox("Actividad", options=activity_options, format_func=lambda x: x['name'], help="Actividad a realizar", key="activity_selector")
         notes = st.text_area("Notas (Opcional)", help="Notas adicionales para la reserva", height=80)
 
-    submit_button = st.form_submit_button("Crear Reserva")
+    with col4:
+        repeat_weekly = st.checkbox("Repetir semanalmente", value=False, help="Crear la misma reserva cada semana hasta la fecha indicada")
+        repeat_until = st.date_input("Repetir hasta", value=None, help="Última fecha de la serie (solo si se repite semanalmente)")
+
+    submit_button = st.form_submit_button("Crear Reserva", disabled=time_slot is None)
 
     if submit_button:
+        st.session_state.pop("pending_reservation_plan", None) # Un envío nuevo sustituye a la confirmación pendiente
+        if repeat_weekly and (repeat_until is None or repeat_until < reservation_date):
+            st.warning("Indica una fecha 'Repetir hasta' igual o posterior a la fecha de la reserva.")
+            st.stop()
+        try:
+            dates = expand_weekly(reservation_date, repeat_until) if repeat_weekly else [reservation_date]
+            plan_or_create(dates, time_slot, activity_id, monitor_id, notes if notes else None)
+        except Exception as e:
+            st.error(f"Error inesperado al crear reserva: {e}")
+
+# --- Confirmación de una serie con fechas ocupadas: nada se escribe sin el visto bueno del usuario ---
+pending_plan = st.session_state.get("pending_reservation_plan")
+if pending_plan:
+    st.warning(
+        f"{pending_plan['monitor']['name']} {pending_plan['monitor']['surname']} ya tiene reserva en el turno "
+        f"{pending_plan['time_slot']} en {len(pending_plan['conflicts'])} fecha(s), que se omitirán: "
+        + ", ".join(d.strftime("%d/%m/%Y") for d in pending_plan["conflicts"])
+    )
+    confirm_col, cancel_col = st.columns(2)
+    with confirm_col:
+        confirm_button = st.button(f"Reservar las {len(pending_plan['dates'])} restantes", type="primary", use_container_width=True)
+    with cancel_col:
+        cancel_button = st.button("Cancelar", use_container_width=True)
+    if cancel_button:
+        st.session_state.pop("pending_reservation_plan", None)
+        st.rerun()
+    if confirm_button:
+        st.session_state.pop("pending_reservation_plan", None)
         try:
-            # Insertar la nueva reserva en la tabla 'gym_reservations'
-            new_reservation_data = {
-                "activity_id": activity_id['id'],
-                "monitor_id": monitor_id['id'],
-                "reservation_date": reservation_date.strftime("%Y-%m-%d"), # Formatear fecha a YYYY-MM-DD para Supabase
-                "time_slot": time_slot,
-                "notes": notes if notes else None,
-            }
-            response = supabase_client.table("gym_reservations").insert(new_reservation_data).execute()
-            if response.error:
-                st.error(f"Error al crear reserva: {response.error.message}")
-            else:
-                st.success("Reserva creada correctamente!")
-                st.cache_data.clear() # Limpiar cache para recargar reservas
-                st.rerun() # Recargar para mostrar la nueva reserva
+            # Se vuelven a comprobar las fechas: si alguna se ha ocupado entretanto, se pide otra confirmación
+            plan_or_create(pending_plan["dates"], pending_plan["time_slot"], pending_plan["activity"], pending_plan["monitor"], pending_plan["notes"])
         except Exception as e:
             st.error(f"Error inesperado al crear reserva: {e}")
@@ -1,7 +1,8 @@
 # streamlit_app.py
 import streamlit as st
 from auth import auth_ui, auth_controller
-from database.supabase_client import supabase_client # Importa para asegurar inicialización
+from database.instrumentation import begin_rerun
+from database.reference_data import get_reference_data
 from utils import constants # Importa para tener acceso a constantes
 
 # --- Configuración de la página ---
@@ -11,6 +12,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded",
 )
+begin_rerun("streamlit_app") # Agrupa las peticiones de este rerun para el panel de depuración
 
 # --- Inicialización del estado de la sesión ---
 if 'supabase_session' not in st.session_state:
@@ -39,15 +41,11 @@ def main():
         else:
             st.warning("No se pudo obtener la información del usuario.")
 
-        # ---  Ejemplo básico de acceso a datos (¡reemplaza con tu lógica!) ---
+        # --- Actividades disponibles (de los datos de referencia compartidos) ---
         try:
-            response = supabase_client.table("activities").select("*").execute()
-            if response.error:
-                st.error(f"Error al obtener actividades: {response.error.message}")
-            else:
-                activities_data = response.data
-                st.subheader("Actividades Disponibles")
-                st.dataframe(activities_data) # Muestra las actividades en una tabla
+            activities_data = get_reference_data()["activities"]
+            st.subheader("Actividades Disponibles")
+            st.dataframe(activities_data) # Muestra las actividades en una tabla
         except Exception as e:
             st.error(f"Error al consultar la base de datos: {e}")
 
@@ -0,0 +1,72 @@
+# utils/availability.py
+import datetime
+from utils.constants import TIME_SLOTS
+
+
+class SlotBitmap:
+    """
+    Ocupación de un monitor como mapa de bits días × turnos: el bit (día, turno) vale 1 si
+    el turno está reservado. 90 días con 3 turnos ocupan 34 bytes.
+    """
+
+    def __init__(self, start_date, days, slots=TIME_SLOTS):
+        self.start_date = start_date
+        self.days = days
+        self.slots = list(slots)
+        self._bits = bytearray((days * len(self.slots) + 7) // 8)
+
+    @classmethod
+    def from_booked(cls, start_date, end_date, booked, slots=TIME_SLOTS):
+        """Construye el mapa para [start_date, end_date] a partir de pares (fecha YYYY-MM-DD, turno) reservados."""
+        bitmap = cls(start_date, (end_date - start_date).days + 1, slots)
+        for date_str, slot in booked:
+            bitmap.set_busy(datetime.date.fromisoformat(date_str), slot)
+        return bitmap
+
+    @property
+    def end_date(self):
+        return self.start_date + datetime.timedelta(days=self.days - 1)
+
+    def covers(self, date):
+        return self.start_date <= date <= self.end_date
+
+    def _position(self, date, slot):
+        return (date - self.start_date).days * len(self.slots) + self.slots.index(slot)
+
+    def set_busy(self, date, slot):
+        if self.covers(date) and slot in self.slots:
+            position = self._position(date, slot)
+            self._bits[position // 8] |= 1 << (position % 8)
+
+    def is_free(self, date, slot):
+        """Indica si el turno está libre. Fuera del rango cargado se desconoce y retorna None."""
+        if not self.covers(date):
+            return None
+        position = self._position(date, slot)
+        return not self._bits[position // 8] & (1 << (position % 8))
+
+    def free_slots(self, date):
+        """Turnos libres de un día, en el orden de TIME_SLOTS."""
+        return [slot for slot in self.slots if self.is_free(date, slot)]
+
+    def next_free(self, from_date, slot=None):
+        """
+        Primer (fecha, turno) libre a partir de `from_date`, opcionalmente solo del turno `slot`.
+        Retorna None si no queda ninguno dentro del rango cargado.
+        """
+        date = max(from_date, self.start_date)
+        while date <= self.end_date:
+            for candidate in ([slot] if slot else self.slots):
+                if self.is_free(date, candidate):
+                    return date, candidate
+            date += datetime.timedelta(days=1)
+        return None
+
+    def free_capacity(self, start_date, days):
+        """Filas {día: turnos libres} para el mapa de calor, de `start_date` a `days` días vista."""
+        rows = []
+        for offset in range(days):
+            date = start_date + datetime.timedelta(days=offset)
+            if self.covers(date):
+                rows.append((date, {slot: self.is_free(date, slot) for slot in self.slots}))
+        return rows
@@ -26,3 +26,6 @@ GROUPS_LIST = [
     "G-3",
     # ... (añade más grupos si es necesario)
 ]
+
+RESERVATIONS_PAGE_SIZE = 50 # Reservas por página en el listado del gimnasio
+ARCHIVE_AFTER_MONTHS = 12 # Meses completos que se quedan en las tablas calientes; lo anterior se archiva (migración 0008)
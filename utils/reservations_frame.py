@@ -0,0 +1,80 @@
+# utils/reservations_frame.py
+import datetime
+from utils.constants import TIME_SLOTS, ARCHIVE_AFTER_MONTHS
+
+WEEKDAY_NAMES = ["lun", "mar", "mié", "jue", "vie", "sáb", "dom"]
+
+
+def week_range(day):
+    """Retorna (lunes, domingo) de la semana que contiene `day`."""
+    start = day - datetime.timedelta(days=day.weekday())
+    return start, start + datetime.timedelta(days=6)
+
+
+def month_range(day):
+    """Retorna (primer día, último día) del mes que contiene `day`."""
+    start = day.replace(day=1)
+    next_month = (start + datetime.timedelta(days=32)).replace(day=1)
+    return start, next_month - datetime.timedelta(days=1)
+
+
+def archive_cutoff(day, months=ARCHIVE_AFTER_MONTHS):
+    """
+    Retorna el primer día que el archivado mensual conserva en las tablas calientes: las
+    reservas anteriores están (o estarán tras la próxima ejecución) en el archivo.
+    """
+    month_index = day.year * 12 + day.month - 1 - months
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def build_reservations_frame(rows):
+    """
+    Convierte las filas de `gym_reservations` con `activities(name)`, `agents(name, surname)`
+    y, opcionalmente, `agent_activities(count)` embebidos en un DataFrame plano.
+    Los diccionarios anidados se aplanan con operaciones por columna (.str.get), sin
+    recorrer las filas en Python.
+    Columnas: id, Fecha, Turno, Actividad, Monitor, Notas, Ocupación.
+    """
+    import pandas as pd # Importar aquí para no cargar pandas al inicio si no es necesario
+
+    frame = pd.DataFrame(rows)
+    if frame.empty:
+        return pd.DataFrame(columns=["id", "Fecha", "Turno", "Actividad", "Monitor", "Notas", "Ocupación"])
+    flat = pd.DataFrame({
+        "id": frame["id"],
+        "Fecha": pd.to_datetime(frame["reservation_date"]).dt.date,
+        "Turno": frame["time_slot"],
+        "Actividad": frame["activities"].str.get("name"),
+        "Monitor": frame["agents"].str.get("name") + " " + frame["agents"].str.get("surname"),
+        "Notas": frame["notes"] if "notes" in frame else None,
+    })
+    if "agent_activities" in frame:
+        flat["Ocupación"] = frame["agent_activities"].str.get(0).str.get("count").fillna(0).astype(int)
+    else:
+        flat["Ocupación"] = None
+    return flat
+
+
+def build_timetable(frame, start_date, end_date):
+    """
+    Construye la cuadrícula del horario: un día por columna y un turno (TIME_SLOTS) por fila.
+    Cada celda lista "Actividad · Monitor (inscritos)" de las reservas de ese día y turno.
+    """
+    import pandas as pd # Importar aquí para no cargar pandas al inicio si no es necesario
+
+    days = pd.date_range(start_date, end_date, freq="D").date
+    if frame.empty:
+        grid = pd.DataFrame("", index=TIME_SLOTS, columns=days)
+    else:
+        cells = frame["Actividad"] + " · " + frame["Monitor"]
+        if frame["Ocupación"].notna().all():
+            cells = cells + " (" + frame["Ocupación"].astype(str) + ")"
+        grid = (
+            frame.assign(Celda=cells)
+            .pivot_table(index="Turno", columns="Fecha", values="Celda", aggfunc="\n".join)
+            .reindex(index=TIME_SLOTS, columns=days)
+            .fillna("")
+        )
+    grid.columns = [f"{WEEKDAY_NAMES[d.weekday()]} {d:%d/%m}" for d in days]
+    grid.index.name = "Turno"
+    return grid
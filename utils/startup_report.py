@@ -0,0 +1,31 @@
+# utils/startup_report.py
+import contextlib
+import threading
+import time
+
+PROCESS_STARTED_AT = time.perf_counter() # Primera importación de la app en el proceso (antes que cualquier página)
+_milestones = {} # nombre -> ms; solo se guarda la primera vez, es decir, el arranque en frío
+_lock = threading.Lock()
+
+
+def mark(name):
+    """Registra un hito como milisegundos desde el arranque del proceso. Solo cuenta la primera vez."""
+    with _lock:
+        _milestones.setdefault(name, round((time.perf_counter() - PROCESS_STARTED_AT) * 1000, 1))
+
+
+@contextlib.contextmanager
+def startup_phase(name):
+    """Mide la duración de una fase (p. ej. un import diferido). Solo cuenta la primera vez."""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _milestones.setdefault(f"{name} (duración)", round((time.perf_counter() - started_at) * 1000, 1))
+
+
+def startup_report():
+    """Hitos y fases del arranque en frío, en milisegundos."""
+    with _lock:
+        return dict(_milestones)